@@ -1,25 +1,94 @@
 #! /usr/bin/env python
 
-from sedclient import sedPlot
-from sedclient import globs
-from sedclient import makeSED
+"""
+    The command line interface of the client. The SEDs of the objects in a
+    target file (a csv with 'name', 'ra' and 'dec' columns) are built in
+    stages which can be run separately, each with its own parallelism:
 
-def main():
+        sedclient.py fetch targets.csv --jobs 8
+        sedclient.py reduce targets.csv --jobs 4
+        sedclient.py render targets.csv --jobs 2
+        sedclient.py export archive.csv
+
+    Only fetch uses the network. A stage skips the objects whose inputs have
+    not changed since it last ran on them unless --force is given, see the
+    stages module. With --profile the reduce and render stages profile each
+    object and write an aggregated report, see the profiling module. With
+    --dedupe the duplicate objects of the target file are built once under
+    one name, see the dedup module.
+"""
+
+import argparse
+import sys
+
+def parseArgs(argv=None):
     """
-        testing function
+        Parses the command line.
     """
-    globs.name = 'red rect'
-    globs.ra = '06 19 58.2'
-    globs.dec = '-10 38 14.69'
-    globs.l = 122.0483
-    globs.b = -4.5325
-    from uncertainties import ufloat
-    globs.ebv = ufloat(0.00,0.01)
+    parser = argparse.ArgumentParser(description="Builds SEDs in separately runnable stages.")
+    sub = parser.add_subparsers(dest='stage')
+    sub.required = True
 
-    makeSED.make()
+    defaults = {'fetch': 8, 'reduce': 2, 'render': 2}
 
-if __name__ == '__main__':
-    main()
+    for stage in ['fetch', 'reduce', 'render']:
+        cmd = sub.add_parser(stage, help="run the {} stage over a target file".format(stage))
+        cmd.add_argument('targets', help="csv file with name, ra and dec columns")
+        cmd.add_argument('--jobs', type=int, default=defaults[stage], help="number of parallel workers (default {})".format(defaults[stage]))
+        cmd.add_argument('--force', action='store_true', help="run even if the inputs are unchanged")
+        cmd.add_argument('--dedupe', action='store_true', help="build the duplicate targets once and record their aliases")
+        if stage != 'fetch':
+            cmd.add_argument('--profile', action='store_true', help="profile each object and report the batch, see the profiling module")
+
+    cmd = sub.add_parser('export', help="export the photometry archive as one table")
+    cmd.add_argument('filename', help="the csv file, or the directory for npy columns")
+    cmd.add_argument('--fmt', choices=['csv', 'npy'], default='csv', help="output format (default csv)")
+    cmd.add_argument('--force', action='store_true', help="export even if the archive is unchanged")
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+        Runs a stage from the command line.
+    """
+    args = parseArgs(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    from sedclient import globs
+    from sedclient import stages
 
-#if __name__ == '__main__':
-#    main.main()
+    if args.stage == 'export':
+        print("export: {}".format(stages.runExport(args.filename, args.fmt, args.force)))
+        return 0
+
+    from sedclient import targets
+
+    table = targets.readTargets(args.targets)
+
+    if args.dedupe:
+        from sedclient import dedup
+        table, aliases = dedup.dedupe(table)
+
+    table = list(targets.iterTargets(table))
+
+    profile = getattr(args, 'profile', False)
+    if profile:
+        globs.profile = True
+
+    failed = 0
+    for result in stages.runStage(args.stage, table, args.jobs, args.force):
+        print("{}: {} {}".format(args.stage, result['name'], result['status']))
+        if 'error' in result:
+            failed += 1
+            print("    {}".format(result['error']))
+
+    if profile:
+        from sedclient import profiling
+        profiling.report(["{} {}".format(target['name'], args.stage) for target in table])
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
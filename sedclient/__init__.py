@@ -1 +1 @@
-All = ['sedPlot', 'load', 'download', 'dataStruct', 'dataSave']
+All = ['sedPlot', 'load', 'download', 'dataStruct', 'dataSave', 'parse', 'deredden', 'fit', 'montecarlo', 'export', 'sheet', 'pipeline', 'journal', 'profiling', 'summary', 'coverage', 'targets', 'isoIndex', 'server', 'resample', 'population', 'scheduler', 'bolometric', 'synphot', 'merged', 'stages', 'dedup', 'outliers']
@@ -0,0 +1,284 @@
+"""
+    This module integrates SEDs into bolometric fluxes. The photometry of
+    many objects is held as ragged arrays, the points of every object one
+    after another with 'offsets' giving where each object starts, so the
+    integration of the whole archive is a handful of NumPy segment
+    operations rather than a loop over objects. Within an object the points
+    of all the sources are sorted by wavelength and integrated with the
+    trapezium rule in ln(lambda), as the integral of F_lambda over lambda is
+    the integral of lambda F_lambda over ln(lambda). The flux beyond the
+    reddest point may be extrapolated with a Rayleigh-Jeans tail and the flux
+    blueward of the bluest point with a Wien tail, whose temperature is taken
+    from the wavelength of the peak of lambda F_lambda. Since the integral is
+    a weighted sum of the fluxes the errors are propagated exactly, assuming
+    independent points.
+"""
+
+import numpy as np
+from . import globs
+
+# lambda F_lambda of a blackbody peaks at hc / (3.92 kT)
+wienPeak = 3.920690
+
+dtype = [('name', 'U64'), ('npts', 'i4'), ('fbol', 'f8'), ('fbol_err', 'f8')]
+
+def segmentIds(offsets):
+    """
+        The index of the object of each point of a ragged array.
+    """
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+def segmentSum(values, offsets):
+    """
+        Sums a ragged array over each object, empty objects sum to 0.
+
+        Parameters
+        ----------
+                values : numpy array
+                The values of every point.
+
+                offsets : numpy array
+                The start of each object and the end of the last.
+
+        Returns
+        ----------
+                sums : numpy array
+                The sum of each object.
+    """
+    sums = np.zeros(len(offsets) - 1)
+    starts = offsets[:-1]
+    full = offsets[1:] > starts
+
+    if full.any():
+        sums[full] = np.add.reduceat(values, starts[full])
+
+    return sums
+
+def merge(wave, flux, err, offsets):
+    """
+        Drops the unusable points of a ragged array and sorts each object by
+        wavelength.
+
+        Parameters
+        ----------
+                wave, flux, err : numpy arrays
+                The wavelengths, lambda F_lambda and errors of every point.
+
+                offsets : numpy array
+                The start of each object and the end of the last.
+
+        Returns
+        ----------
+                wave, flux, err, offsets : numpy arrays
+                The sorted ragged array.
+    """
+    ids = segmentIds(offsets)
+    good = np.isfinite(wave) & np.isfinite(flux) & (wave > 0) & (flux > 0)
+
+    ids, wave, flux = ids[good], wave[good], flux[good]
+    err = np.nan_to_num(err[good])
+
+    order = np.lexsort((wave, ids))
+    counts = np.bincount(ids, minlength=len(offsets) - 1)
+
+    return wave[order], flux[order], err[order], np.concatenate(([0], np.cumsum(counts)))
+
+def weights(wave, flux, offsets, blue=None, red=None):
+    """
+        The weight of each point in the integral of its object, so the
+        bolometric flux is the segment sum of weight * flux.
+
+        Parameters
+        ----------
+                wave, flux : numpy arrays
+                The sorted ragged array, see merge.
+
+                offsets : numpy array
+                The start of each object and the end of the last.
+
+                blue : string, optional
+                'wien' for a Wien tail blueward of the bluest point, 'none'
+                for no tail, defaults to globs.bolBlue.
+
+                red : string, optional
+                'rj' for a Rayleigh-Jeans tail beyond the reddest point,
+                'none' for no tail, defaults to globs.bolRed.
+
+        Returns
+        ----------
+                weight : numpy array
+                The weight of each point.
+    """
+    blue = globs.bolBlue if blue is None else blue
+    red = globs.bolRed if red is None else red
+
+    x = np.log(wave)
+    weight = np.zeros(len(x))
+
+    starts, ends = offsets[:-1], offsets[1:]
+    full = ends > starts
+    first, last = starts[full], ends[full] - 1
+
+    # trapezium rule, half of each interval to the points at either end
+    step = 0.5 * np.diff(x)
+    inside = np.ones(len(step), dtype=bool)
+    inside[last[last < len(step)]] = False
+    step[~inside] = 0.0
+
+    weight[:-1] += step
+    weight[1:] += step
+
+    if red == 'rj':
+        # lambda F_lambda falls as lambda**-3
+        weight[last] += 1.0 / 3.0
+
+    if blue == 'wien':
+        ids = segmentIds(offsets)
+        order = np.lexsort((flux, ids))
+        peak = wave[order[ends[full] - 1]]
+
+        u = wienPeak * peak / wave[first]
+        weight[first] += (u**3 + 3 * u**2 + 6 * u + 6) / u**4
+
+    return weight
+
+def integrate(wave, flux, err, offsets, blue=None, red=None):
+    """
+        Integrates the SEDs of many objects held as a ragged array.
+
+        Parameters
+        ----------
+                wave, flux, err : numpy arrays
+                The wavelengths in microns, lambda F_lambda in erg/s/cm**2
+                and errors of every point, in any order within an object.
+
+                offsets : numpy array
+                The start of each object and the end of the last.
+
+                blue, red : string, optional
+                The tails, see weights.
+
+        Returns
+        ----------
+                fbol : numpy array
+                The bolometric flux of each object in erg/s/cm**2, nan for
+                objects with fewer than two points.
+
+                fbolErr : numpy array
+                The error of each bolometric flux.
+    """
+    wave, flux, err, offsets = merge(np.asarray(wave, dtype=float), np.asarray(flux, dtype=float), np.asarray(err, dtype=float), np.asarray(offsets))
+
+    weight = weights(wave, flux, offsets, blue, red)
+
+    fbol = segmentSum(weight * flux, offsets)
+    fbolErr = np.sqrt(segmentSum((weight * err)**2, offsets))
+
+    few = np.diff(offsets) < 2
+    fbol[few] = np.nan
+    fbolErr[few] = np.nan
+
+    return fbol, fbolErr
+
+def fromPhoto(photo, blue=None, red=None):
+    """
+        Integrates the SED of one object from its data structure.
+
+        Parameters
+        ----------
+                photo : dictionary
+                The photometry, see dataStruct.buildPhStruct.
+
+                blue, red : string, optional
+                The tails, see weights.
+
+        Returns
+        ----------
+                fbol : float
+                The bolometric flux in erg/s/cm**2.
+
+                fbolErr : float
+                The error of the bolometric flux.
+    """
+    wave, flux, err = [], [], []
+
+    for source in photo:
+        if photo[source]['flux']:
+            wave += list(photo[source]['wave'])
+            flux += [x.value.n for x in photo[source]['flux']]
+            err += [x.value.s for x in photo[source]['flux']]
+
+    fbol, fbolErr = integrate(wave, flux, err, [0, len(wave)], blue, red)
+
+    return fbol[0], fbolErr[0]
+
+def fromChunk(chunk, bandCols):
+    """
+        Turns a chunk of the wide table into a ragged array.
+
+        Parameters
+        ----------
+                chunk : numpy structured array
+                A chunk of the wide table, see export.iterChunks.
+
+                bandCols : dictionary
+                Maps (source, wavelength) to the index of the flux column.
+
+        Returns
+        ----------
+                wave, flux, err, offsets : numpy arrays
+                The ragged array of the chunk.
+    """
+    names = chunk.dtype.names
+    bands = sorted(bandCols.items(), key=lambda item: item[1])
+
+    waves = np.array([wave for (source, wave), col in bands])
+    flux = np.column_stack([chunk[names[col]] for band, col in bands]) if bands else np.zeros((len(chunk), 0))
+    err = np.column_stack([chunk[names[col + 1]] for band, col in bands]) if bands else np.zeros((len(chunk), 0))
+
+    good = np.isfinite(flux) & (flux > 0)
+    offsets = np.concatenate(([0], np.cumsum(good.sum(axis=1))))
+
+    return np.broadcast_to(waves, flux.shape)[good], flux[good], err[good], offsets
+
+def archive(chunkSize=10000, files=None, blue=None, red=None):
+    """
+        Integrates the SED of every object in the photometry archive.
+
+        Parameters
+        ----------
+                chunkSize : int, optional
+                The number of objects read at once.
+
+                files : list, optional
+                The photometry files, defaults to the whole archive.
+
+                blue, red : string, optional
+                The tails, see weights.
+
+        Returns
+        ----------
+                table : numpy structured array
+                The 'name', number of points 'npts', 'fbol' and 'fbol_err'
+                of each object.
+    """
+    from . import export
+
+    _, bandCols = export.columns()
+    tables = []
+
+    for chunk in export.iterChunks(chunkSize, files):
+        wave, flux, err, offsets = fromChunk(chunk, bandCols)
+
+        table = np.zeros(len(chunk), dtype=dtype)
+        table['name'] = chunk['name']
+        table['npts'] = np.diff(offsets)
+        table['fbol'], table['fbol_err'] = integrate(wave, flux, err, offsets, blue, red)
+
+        tables.append(table)
+
+    table = np.concatenate(tables) if tables else np.zeros(0, dtype=dtype)
+
+    globs.logger.info("Integrated the SEDs of {} objects.".format(len(table)))
+
+    return table
@@ -0,0 +1,272 @@
+"""
+    This module checks whether a position lies in the footprint of a survey
+    before it is queried. A survey config may point to a multi-order HEALPix
+    coverage map (MOC) in a [coverage] section:
+
+        [coverage]
+        moc=data/coverage/akari.json
+
+    either in the IVOA MOC JSON serialisation ({"order": [pixels, ...]}) or as
+    a MOC FITS file with a UNIQ column. Surveys without a coverage map are
+    always queried. The checks are vectorised over any number of positions.
+"""
+
+import configparser
+import itertools
+import json
+import numpy as np
+from . import globs
+from . import targets
+
+mocCache = {}
+
+def confName(source):
+    """
+        Returns the config name of a source, spectroscopic sources have their
+        configs in the spec/ directory.
+    """
+    return source if source in globs.phSources else "spec/{}".format(source)
+
+def loadMoc(source):
+    """
+        Loads and caches the coverage map of a source.
+
+        Parameters
+        ----------
+                source : string
+                The name of the cat/survey.
+
+        Returns
+        ----------
+                moc : dictionary
+                The sorted HEALPix nested pixels at each order, or None if the
+                source has no coverage map.
+    """
+    if source in mocCache:
+        return mocCache[source]
+
+    conf = configparser.ConfigParser()
+    conf.read("{}{}.ini".format(globs.confPath, confName(source)))
+
+    moc = None
+
+    if conf.has_option('coverage', 'moc'):
+        filename = conf['coverage']['moc']
+
+        if filename.endswith('.json'):
+            with open(filename, 'r') as f:
+                cells = json.load(f)
+            moc = dict((int(order), np.unique(np.asarray(pix, dtype=np.int64))) for order, pix in cells.items() if len(pix))
+        else:
+            from astropy.io import fits
+            with fits.open(filename) as hdul:
+                uniq = np.asarray(hdul[1].data['UNIQ'], dtype=np.int64)
+            order = (np.floor(np.log2(uniq // 4) / 2)).astype(int)
+            moc = {}
+            for o in np.unique(order):
+                moc[int(o)] = np.unique(uniq[order == o] - 4 * 4**int(o))
+
+        globs.logger.info("Loaded coverage map {} for {}.".format(filename, source))
+
+    mocCache[source] = moc
+
+    return moc
+
+def spreadBits(v):
+    """
+        Spreads the bits of an integer array so bit i moves to bit 2i.
+    """
+    v = v.astype(np.int64)
+    out = np.zeros_like(v)
+
+    for i in range(30):
+        out |= ((v >> i) & 1) << (2 * i)
+
+    return out
+
+def ang2pixNest(order, ra, dec):
+    """
+        HEALPix nested pixel numbers of positions.
+
+        Parameters
+        ----------
+                order : int
+                The HEALPix order, nside = 2**order.
+
+                ra : numpy array
+                Right ascensions in degrees.
+
+                dec : numpy array
+                Declinations in degrees.
+
+        Returns
+        ----------
+                pix : numpy array
+                The nested pixel numbers.
+    """
+    nside = 1 << order
+
+    z = np.sin(np.radians(dec))
+    za = np.abs(z)
+    tt = np.mod(np.radians(ra), 2 * np.pi) / (np.pi / 2)
+
+    face = np.zeros(len(z), dtype=np.int64)
+    ix = np.zeros(len(z), dtype=np.int64)
+    iy = np.zeros(len(z), dtype=np.int64)
+
+    eq = za <= 2.0 / 3.0
+
+    temp1 = nside * (0.5 + tt[eq])
+    temp2 = nside * z[eq] * 0.75
+    jp = (temp1 - temp2).astype(np.int64)
+    jm = (temp1 + temp2).astype(np.int64)
+    ifp = jp >> order
+    ifm = jm >> order
+    face[eq] = np.where(ifp == ifm, ifp | 4, np.where(ifp < ifm, ifp, ifm + 8))
+    ix[eq] = jm & (nside - 1)
+    iy[eq] = nside - (jp & (nside - 1)) - 1
+
+    pol = ~eq
+
+    ntt = np.minimum(tt[pol].astype(np.int64), 3)
+    tp = tt[pol] - ntt
+    tmp = nside * np.sqrt(3 * (1 - za[pol]))
+    jp = np.minimum((tp * tmp).astype(np.int64), nside - 1)
+    jm = np.minimum(((1 - tp) * tmp).astype(np.int64), nside - 1)
+    north = z[pol] >= 0
+    face[pol] = np.where(north, ntt, ntt + 8)
+    ix[pol] = np.where(north, nside - jm - 1, jp)
+    iy[pol] = np.where(north, nside - jp - 1, jm)
+
+    return (face << (2 * order)) + spreadBits(ix) + (spreadBits(iy) << 1)
+
+def contains(moc, ra, dec):
+    """
+        Checks which positions lie inside a coverage map.
+
+        Parameters
+        ----------
+                moc : dictionary
+                The coverage map from loadMoc.
+
+                ra : numpy array
+                Right ascensions in degrees.
+
+                dec : numpy array
+                Declinations in degrees.
+
+        Returns
+        ----------
+                inside : numpy array
+                Boolean array, True where the position is covered.
+    """
+    ra = np.atleast_1d(np.asarray(ra, dtype=float))
+    dec = np.atleast_1d(np.asarray(dec, dtype=float))
+
+    # an empty map covers nothing
+    if not moc:
+        return np.zeros(len(ra), dtype=bool)
+
+    maxOrder = max(moc)
+    pix = ang2pixNest(maxOrder, ra, dec)
+
+    inside = np.zeros(len(pix), dtype=bool)
+
+    for order, cells in moc.items():
+        parent = pix >> (2 * (maxOrder - order))
+        idx = np.clip(np.searchsorted(cells, parent), 0, len(cells) - 1)
+        inside |= cells[idx] == parent
+
+    return inside
+
+def covers(source, ra=None, dec=None):
+    """
+        Checks which positions are in the footprint of a source, by default
+        the object in globs.
+
+        Parameters
+        ----------
+                source : string
+                The name of the cat/survey.
+
+                ra : string, float or array, optional
+                Right ascensions in any format, see targets.toDegrees,
+                defaults to globs.ra.
+
+                dec : string, float or array, optional
+                Declinations in any format, see targets.toDegrees, defaults
+                to globs.dec.
+
+        Returns
+        ----------
+                inside : numpy array
+                Boolean array, True where the position may be in the source.
+    """
+    if ra is None:
+        ra, dec = globs.ra, globs.dec
+
+    moc = loadMoc(source)
+
+    if moc is None:
+        return np.ones(len(np.atleast_1d(ra)), dtype=bool)
+
+    return contains(moc, *targets.toDegrees(ra, dec))
+
+def coverageMask(sources, ra, dec):
+    """
+        Checks a batch of positions against the footprints of many sources.
+
+        Parameters
+        ----------
+                sources : list
+                The names of the cats/surveys.
+
+                ra : array
+                Right ascensions.
+
+                dec : array
+                Declinations.
+
+        Returns
+        ----------
+                masks : dictionary
+                A boolean array per source, True where the position may be in
+                the source.
+    """
+    ra, dec = targets.toDegrees(ra, dec)
+
+    return dict((source, covers(source, ra, dec)) for source in sources)
+
+def coverTargets(targets, chunkSize=1000):
+    """
+        Checks the coverage of every source for many targets, a chunk of
+        targets at a time with coverageMask.
+
+        Parameters
+        ----------
+                targets : iterable of dictionaries
+                The objects, see makeSED.setGlobs.
+
+                chunkSize : int, optional
+                The number of targets checked at once.
+
+        Returns
+        ----------
+                covered : generator
+                Yields (target, covered) where covered maps each source in
+                globs.phSources and globs.specSources to True if the target
+                may be in it.
+    """
+    sources = globs.phSources + globs.specSources
+    targets = iter(targets)
+
+    while True:
+        chunk = list(itertools.islice(targets, chunkSize))
+
+        if not chunk:
+            return
+
+        masks = coverageMask(sources, [target['ra'] for target in chunk], [target['dec'] for target in chunk])
+
+        for k, target in enumerate(chunk):
+            yield target, dict((source, bool(masks[source][k])) for source in sources)
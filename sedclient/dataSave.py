@@ -4,11 +4,27 @@
     globs.name.
 """
 
-import globs
+import atexit
+import configparser
+import os
+import tempfile
+import threading
+from . import summary as sm
+from . import globs
 
-def savePh(red, wave, source):
+# photometry waiting to be flushed, {filename: {source: {key: value}}}
+pending = {}
+# summary index updates waiting to be flushed
+pendingSummary = []
+lock = threading.Lock()
+
+def savePh(red, wave, source, errLo=None, errHi=None):
     """
-        Saves downloaded data in a reduced format.
+        Saves downloaded data in a reduced format. The section for the source
+        replaces any existing section for it in the file so re-running an
+        object does not grow the file. If globs.batchSave is True the data are
+        held in memory until flush is called, globs.flushEvery objects are
+        waiting or the process exits.
 
         Parameters
         ----------
@@ -21,30 +37,214 @@ def savePh(red, wave, source):
                 source : string
                 The name of the cat/survey.
 
+                errLo : list, optional
+                The lower errors from the Monte Carlo error mode.
+
+                errHi : list, optional
+                The upper errors from the Monte Carlo error mode.
+
         Returns
         ----------
                 None
     """
     filename = "{}{}".format(globs.dirPh, globs.name.replace(' ', '_'))
 
-    with open(filename, 'a') as saveFile:
-        saveFile.write("[{}] \n".format(source))
+    entries = {}
+
+    if red:
+        entries['wave'] = ("{} " * len(wave)).format(*wave)
+
+        redEx = [y for x in red for y in (x.value.n, x.value.s)]
+        entries['fluxes'] = ("{:.3E} " * len(red) * 2).format(*redEx)
+
+        if errLo:
+            asymEx = [y for x in zip(errLo, errHi) for y in x]
+            entries['asym'] = ("{:.3E} " * len(errLo) * 2).format(*asymEx)
 
-        if red:
-            waveStr = "wave=" + "{} " * len(wave) + "\n"
-            saveFile.write(waveStr.format(*wave))
+    with lock:
+        sections = pending.setdefault(filename, {})
+        sections[source] = entries
+        sections['meta'] = metaEntries()
 
-            redStr = "fluxes=" + "{:.3E} " * len(red) * 2 + "\n"
-            redEx = [y for x in red for y in (x.value.n, x.value.s)]
-            saveFile.write(redStr.format(*redEx))
+        if sm.enabled():
+            fluxes = [f.value.n for f in red] if red else None
+            pendingSummary.append((globs.name.replace(' ', '_'), source, wave, fluxes))
 
     globs.logger.info("{} data saved for {}.".format(source, globs.name))
 
-    saveFile.close()
+    if not globs.batchSave or len(pending) >= globs.flushEvery:
+        flush()
+
+def saveTimeout(source):
+    """
+        Marks a source whose query missed the deadline of the object, so the
+        next build of the object queries it again, see load.timedOut. Saving
+        the photometry of the source clears the mark.
+
+        Parameters
+        ----------
+                source : string
+                The name of the cat/survey.
+
+        Returns
+        ----------
+                None
+    """
+    filename = "{}{}".format(globs.dirPh, globs.name.replace(' ', '_'))
+
+    with lock:
+        sections = pending.setdefault(filename, {})
+        sections[source] = {'timeout': 'True'}
+        sections['meta'] = metaEntries()
+
+    globs.logger.info("{} marked as timed out for {}.".format(source, globs.name))
+
+    if not globs.batchSave or len(pending) >= globs.flushEvery:
+        flush()
+
+def metaEntries():
+    """
+        Builds the 'meta' section saved with the photometry holding the name,
+        coordinates and E(B-V) of the object.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                entries : dictionary
+                The entries of the 'meta' section.
+    """
+    entries = {}
+    entries['name'] = globs.name
+    entries['ra'] = str(globs.ra)
+    entries['dec'] = str(globs.dec)
+    entries['l'] = str(globs.l)
+    entries['b'] = str(globs.b)
+
+    if globs.ebv is not None:
+        entries['ebv'] = str(globs.ebv.n)
+        entries['ebv_err'] = str(globs.ebv.s)
+
+    return entries
+
+def flush():
+    """
+        Writes all the pending photometry to disk. Each file is read, the
+        pending sections replace the existing ones and the file is atomically
+        replaced.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                None
+    """
+    with lock:
+        for filename, sections in pending.items():
+            conf = configparser.ConfigParser(strict=False, interpolation=None)
+            conf.read(filename)
+
+            for source, entries in sections.items():
+                conf.remove_section(source)
+                conf.add_section(source)
+                for key, val in entries.items():
+                    conf.set(source, key, val)
+
+            atomicWrite(filename, conf.write)
+
+        pending.clear()
+
+        for name, source, wave, fluxes in pendingSummary:
+            sm.update(name, source, wave, fluxes)
+
+        del pendingSummary[:]
+
+atexit.register(flush)
+
+def saveFlags(flags):
+    """
+        Flags outliers in the photometry files, replacing the earlier flags
+        of the objects. The data themselves are kept. Saving the photometry
+        of a source again clears its flags.
+
+        Parameters
+        ----------
+                flags : dictionary
+                Maps the file name of each object checked to a dictionary of
+                the flagged wavelengths of each source, empty if it has none.
+
+        Returns
+        ----------
+                None
+    """
+    flush()
+
+    with lock:
+        for name, sources in flags.items():
+            filename = "{}{}".format(globs.dirPh, name)
+            conf = configparser.ConfigParser(strict=False, interpolation=None)
+            conf.read(filename)
+
+            for source in conf.sections():
+                if source == 'meta':
+                    continue
+
+                if sources.get(source):
+                    conf.set(source, 'outliers', ("{} " * len(sources[source])).format(*sources[source]))
+                else:
+                    conf.remove_option(source, 'outliers')
+
+            atomicWrite(filename, conf.write)
+
+def atomicWrite(filename, write):
+    """
+        Writes a file through a temporary file in the same directory which is
+        then renamed over the original so readers never see a partial file.
+        The data are fsynced if globs.fsync is True.
+
+        Parameters
+        ----------
+                filename : string
+                The file to write.
+
+                write : function
+                A function that writes the contents to the open file object it
+                is given.
+
+        Returns
+        ----------
+                None
+    """
+    dirname = os.path.dirname(filename) or '.'
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix='.tmp_')
+
+    try:
+        mode = os.stat(filename).st_mode if os.path.exists(filename) else 0o644
+        os.chmod(tmp, mode & 0o777)
+
+        with os.fdopen(fd, 'w') as tmpFile:
+            write(tmpFile)
+            if globs.fsync:
+                tmpFile.flush()
+                os.fsync(tmpFile.fileno())
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+    if globs.fsync and hasattr(os, 'O_DIRECTORY'):
+        dirFd = os.open(dirname, os.O_RDONLY | os.O_DIRECTORY)
+        os.fsync(dirFd)
+        os.close(dirFd)
 
 def saveSp(wave, flux, source):
     """
-        Saves downloaded spectral data and saves in txt files.
+        Saves downloaded spectral data and saves in txt files. Any existing
+        spectrum for the object is replaced.
 
         Parameters
         ----------
@@ -63,16 +263,19 @@ def saveSp(wave, flux, source):
     """
     filename = "{}{}_iso".format(globs.dirSp, globs.name.replace(' ', '_'))
 
-    with open(filename, 'a') as saveFile:
+    def write(saveFile):
         if flux:
             for w, f in zip(wave, flux):
                 dataStr = "{:.3F}, {:.3E}, {:.3E} \n"
                 data = [w, f.value.n, f.value.s]
                 saveFile.write(dataStr.format(*data))
 
-    globs.logger.info("ISO data saved for {}.".format(globs.name))
+    atomicWrite(filename, write)
 
-    saveFile.close()
+    if sm.enabled():
+        sm.update(globs.name.replace(' ', '_'), source, wave, [f.value.n for f in flux] if flux else None, 'sp')
+
+    globs.logger.info("ISO data saved for {}.".format(globs.name))
 
 def saveSed(fig, filename=None):
     """
@@ -91,8 +294,36 @@ def saveSed(fig, filename=None):
                 None
     """
     if filename:
-        fig.savefig(filename, figsize=(5,4), transparent=True, bbox_inches='tight')
+        fig.savefig(filename, transparent=True, bbox_inches='tight')
         globs.logger.info("SED for {} saved as {}.".format(globs.name, filename))
     else:
-        fig.savefig("{}{}.eps".format(globs.dirSed, globs.name.replace(' ', '_')), figsize=(5,4), transparent=False, bbox_inches='tight')
+        fig.savefig("{}{}.eps".format(globs.dirSed, globs.name.replace(' ', '_')), transparent=False, bbox_inches='tight')
         globs.logger.info("SED for {} saved.".format(globs.name))
+
+def saveFit(fits):
+    """
+        Saves the best fitting models of an SED.
+
+        Parameters
+        ----------
+                fits : list of dictionaries
+                The fits returned by fit.fitSED.
+
+        Returns
+        ----------
+                None
+    """
+    filename = "{}{}".format(globs.dirFit, globs.name.replace(' ', '_'))
+
+    with open(filename, 'w') as saveFile:
+        for fit in fits:
+            saveFile.write("[{}] \n".format(fit['grid']['name']))
+            saveFile.write("kind={} \n".format(fit['grid']['kind']))
+            saveFile.write("index={} \n".format(fit['index']))
+            for par in fit['params'].dtype.names:
+                saveFile.write("{}={} \n".format(par, fit['params'][par]))
+            saveFile.write("scale={:.6E} \n".format(fit['scale']))
+            saveFile.write("chi2={:.6E} \n".format(fit['chi2']))
+            saveFile.write("dof={} \n".format(fit['dof']))
+
+    globs.logger.info("Fits saved for {}.".format(globs.name))
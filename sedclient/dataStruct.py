@@ -6,18 +6,23 @@
     data['iras']['fluxes'] which are lists of wavelengths and fluxes.
 """
 
-import load as dl
-import download as dw
-import globs
-import deredden as dr
-
-def buildPhStruct():
+from . import load as dl
+from . import download as dw
+from . import dataSave as ds
+from . import globs
+from . import journal as jr
+from . import coverage as cv
+from . import scheduler
+
+def buildPhStruct(stored=False):
     """
         Builds and fills a dictionary of photometric data for the SED.
 
         Parameters
         ----------
-                None
+                stored : bool, optional
+                If True only the saved data are loaded, nothing is
+                downloaded.
 
         Returns
         ----------
@@ -26,8 +31,15 @@ def buildPhStruct():
     """
     data = {}
 
-    if dl.dataExists():
+    if stored:
         data = loadSource(data, dl.loadPh, globs.phSources)
+    elif jr.enabled() and not jr.isDone(globs.name):
+        data = resumeSource(data, dl.loadPh, dw.downPh, globs.phSources)
+    elif dl.dataExists():
+        late = dl.timedOut()
+        data = loadSource(data, dl.loadPh, [source for source in globs.phSources if source not in late])
+        if late:
+            data = downSource(data, dw.downPh, late)
     else:
         data = downSource(data, dw.downPh, globs.phSources)
 
@@ -81,19 +93,120 @@ def downSource(data, func, sources):
                 data : dictionary
                 Returns the populated data dictionary.
     """
+    if func is dw.downPh and (globs.objectBudget is not None or globs.queryTimeout is not None):
+        return scheduleSource(data, sources)
+
     for source in sources:
         currData = data[source] = {}
-        currData['wave'], currData['flux'] = func(source)
+
+        if not cv.covers(source)[0]:
+            globs.logger.info("{} skipped for {}, the position is outside its coverage.".format(source, globs.name))
+            if jr.enabled():
+                jr.mark(globs.name, source, 'reduce', 'skipped')
+            currData['wave'], currData['flux'] = None, None
+            continue
+
+        try:
+            currData['wave'], currData['flux'] = func(source)
+        except Exception as e:
+            globs.logger.error("{} failed for {}: {}".format(source, globs.name, e))
+            if jr.enabled():
+                jr.mark(globs.name, source, 'reduce', 'failed')
+            raise
+
+        if jr.enabled():
+            jr.mark(globs.name, source, 'reduce', 'done')
+
+    return data
+
+def scheduleSource(data, sources):
+    """
+        Queries the photometric sources concurrently within the time budget
+        of the object, see the scheduler module. The sources that miss the
+        deadline are marked in the photometry file, and 'timeout' in the
+        journal, so the next build queries them again.
+
+        Parameters
+        ----------
+                data : dictionary
+                The data dictionary.
+
+                sources : list
+                List of cats/surveys to query.
+
+        Returns
+        ----------
+                data : dictionary
+                Returns the populated data dictionary.
+    """
+    covered = []
+
+    for source in sources:
+        if cv.covers(source)[0]:
+            covered.append(source)
+            continue
+
+        globs.logger.info("{} skipped for {}, the position is outside its coverage.".format(source, globs.name))
+        if jr.enabled():
+            jr.mark(globs.name, source, 'reduce', 'skipped')
+        data[source] = {'wave': None, 'flux': None}
+
+    fetch = lambda source, timeout: dw.query(dw.queryParams(source), timeout)
+
+    results, status = scheduler.run(covered, fetch, dw.reducePh)
+    data.update(results)
+
+    for source in covered:
+        if status[source] == 'timeout':
+            ds.saveTimeout(source)
+
+    if jr.enabled():
+        for source in covered:
+            jr.mark(globs.name, source, 'reduce', status[source])
+
+    return data
+
+def resumeSource(data, load, down, sources):
+    """
+        Resumes an object from the journal, loading the sources that were
+        completed by an earlier run and downloading the rest.
+
+        Parameters
+        ----------
+                data : dictionary
+                The data dictionary.
+
+                load : function
+                The function used to load the data either loadPh or loadSp.
+
+                down : function
+                The function used to download the data either downPh or
+                downSp.
+
+                sources : list
+                List of cats/surveys to query.
+
+        Returns
+        ----------
+                data : dictionary
+                Returns the populated data dictionary.
+    """
+    done = [source for source in sources if jr.isDone(globs.name, source, 'reduce')]
+
+    data = loadSource(data, load, done)
+    data = downSource(data, down, [source for source in sources if source not in done])
 
     return data
 
-def buildSpStruct():
+def buildSpStruct(stored=False):
     """
         Builds and fills a dictionary of spectroscopic data for the SED.
 
         Parameters
         ----------
-                None
+                stored : bool, optional
+                If True only the saved spectra are loaded, nothing is
+                downloaded.
 
         Returns
         ----------
@@ -102,7 +215,13 @@ def buildSpStruct():
     """
     data = {}
 
-    if dl.dataExists('iso'):
+    if stored:
+        data = loadSource(data, dl.loadSp, [source for source in globs.specSources if dl.dataExists(source)])
+        for source in globs.specSources:
+            data.setdefault(source, {'wave': None, 'flux': None})
+    elif jr.enabled() and not jr.isDone(globs.name):
+        data = resumeSource(data, dl.loadSp, dw.downSp, globs.specSources)
+    elif dl.dataExists('iso'):
         data = loadSource(data, dl.loadSp, globs.specSources)
     else:
         data = downSource(data, dw.downSp, globs.specSources)
@@ -0,0 +1,280 @@
+"""
+    This module removes duplicate objects from target lists so the same star
+    submitted under two names, or with slightly different coordinates, is
+    queried and stored once. The targets are cross-matched against each
+    other and against the objects already in the photometry archive within
+    a tolerance, by default the smallest query radius of the surveys, using
+    a declination sorted index. Each group of coincident targets resolves to
+    one canonical name, that of the stored object if there is one, and the
+    other names are kept as aliases in globs.aliasPath. Distinct objects
+    whose names only differ by spaces and underscores, and so would share a
+    file, are given distinct names. A name is never an alias if it is the
+    canonical name of an object, so each name resolves to one object. Target
+    files are read as they are, the de-duplication is run on request, see
+    sedclient.py --dedupe.
+"""
+
+import configparser
+import json
+import os
+import numpy as np
+from . import globs
+
+def tolerance():
+    """
+        The matching tolerance in arcsec, globs.dedupRadius or the smallest
+        query radius of the surveys.
+    """
+    if globs.dedupRadius is not None:
+        return globs.dedupRadius
+
+    radii = []
+    for source in globs.phSources:
+        conf = configparser.ConfigParser()
+        conf.read("{}{}.ini".format(globs.confPath, source))
+        if conf.has_option('query', 'radius'):
+            radii.append(float(conf['query']['radius']))
+
+    return min(radii) if radii else 1.0
+
+def separation(ra1, dec1, ra2, dec2):
+    """
+        The angular separation in degrees of positions in degrees.
+    """
+    d1, d2 = np.radians(dec1), np.radians(dec2)
+    dra = np.radians(ra1 - ra2)
+
+    return np.degrees(2 * np.arcsin(np.sqrt(np.sin((d2 - d1) / 2)**2 + np.cos(d1) * np.cos(d2) * np.sin(dra / 2)**2)))
+
+def neighbours(ra, dec, refRa, refDec, radius):
+    """
+        Finds every pair of a position and a reference position closer than
+        the radius.
+
+        Parameters
+        ----------
+                ra, dec : numpy arrays
+                The positions in degrees.
+
+                refRa, refDec : numpy arrays
+                The reference positions in degrees.
+
+                radius : float
+                The radius in arcsec.
+
+        Returns
+        ----------
+                i, j : numpy arrays
+                The indices of the positions and reference positions of the
+                pairs.
+    """
+    radius = radius / 3600.0
+
+    order = np.argsort(refDec)
+    sortedDec = refDec[order]
+
+    lo = np.searchsorted(sortedDec, dec - radius, 'left')
+    hi = np.searchsorted(sortedDec, dec + radius, 'right')
+    counts = hi - lo
+
+    i = np.repeat(np.arange(len(ra)), counts)
+    j = order[np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+
+    close = separation(ra[i], dec[i], refRa[j], refDec[j]) <= radius
+
+    return i[close], j[close]
+
+def groups(n, i, j):
+    """
+        Labels the connected groups of n items joined by the pairs (i, j),
+        each group is labelled by its smallest index.
+    """
+    labels = np.arange(n)
+
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        before = labels.copy()
+        np.minimum.at(labels, i, low)
+        np.minimum.at(labels, j, low)
+        labels = labels[labels]
+
+        if np.array_equal(labels, before):
+            return labels
+
+def metaDegrees(values, hours):
+    """
+        Converts a mixture of decimal degrees and sexagesimal strings, as
+        saved in the 'meta' sections, into degrees.
+    """
+    from . import targets
+
+    out = np.full(len(values), np.nan)
+    strings = []
+
+    for k, value in enumerate(values):
+        try:
+            out[k] = float(value)
+        except ValueError:
+            strings.append(k)
+
+    if strings:
+        out[strings] = targets.parseSexagesimal([values[k] for k in strings], hours)
+
+    return out
+
+def storedObjects():
+    """
+        The names and positions of the objects in the photometry archive.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                names : list
+                The names of the objects.
+
+                ra, dec : numpy arrays
+                Their positions in degrees.
+    """
+    from . import export
+
+    names, ra, dec = [], [], []
+
+    for filename, conf in export.iterArchive():
+        if not conf.has_option('meta', 'ra') or conf['meta']['ra'] in ('', 'None'):
+            continue
+        names.append(conf['meta'].get('name', filename))
+        ra.append(conf['meta']['ra'])
+        dec.append(conf['meta']['dec'])
+
+    try:
+        return names, metaDegrees(ra, True), metaDegrees(dec, False)
+    except ValueError:
+        globs.logger.error("Unreadable positions in the archive, not matching to stored objects.")
+        return [], np.zeros(0), np.zeros(0)
+
+def loadAliases():
+    """
+        Loads the alias map, alias to canonical name.
+    """
+    if not globs.aliasPath or not os.path.exists(globs.aliasPath):
+        return {}
+
+    with open(globs.aliasPath, 'r') as f:
+        return json.load(f)
+
+def saveAliases(aliases, canonical=()):
+    """
+        Adds aliases to the alias map, dropping any earlier alias that is
+        now one of the canonical names.
+    """
+    from . import dataSave as ds
+
+    if not globs.aliasPath:
+        return
+
+    merged = loadAliases()
+    merged.update(aliases)
+
+    for name in canonical:
+        merged.pop(name, None)
+
+    ds.atomicWrite(globs.aliasPath, lambda f: json.dump(merged, f, indent=1, sort_keys=True))
+
+def resolve(name):
+    """
+        Returns the canonical name of an object, the name itself if it is
+        not an alias.
+    """
+    return loadAliases().get(name, name)
+
+def dedupe(table, stored=True, radius=None):
+    """
+        Removes the duplicates from a target table.
+
+        Parameters
+        ----------
+                table : numpy structured array
+                The targets, see targets.prepare.
+
+                stored : bool, optional
+                Match to the objects already in the archive too.
+
+                radius : float, optional
+                The tolerance in arcsec, see tolerance.
+
+        Returns
+        ----------
+                table : numpy structured array
+                One target per object under its canonical name, in the order
+                of the first of each group.
+
+                aliases : dictionary
+                Maps each dropped name to its canonical name, leaving out
+                the canonical names and the names renamed to tell distinct
+                objects apart.
+    """
+    radius = tolerance() if radius is None else radius
+    n = len(table)
+
+    names, ra, dec = [str(name) for name in table['name']], table['ra'], table['dec']
+
+    if stored:
+        storedNames, storedRa, storedDec = storedObjects()
+    else:
+        storedNames, storedRa, storedDec = [], np.zeros(0), np.zeros(0)
+
+    # the stored objects follow the targets, so they join the same groups
+    allRa = np.concatenate((ra, storedRa))
+    allDec = np.concatenate((dec, storedDec))
+
+    i, j = neighbours(ra, dec, allRa, allDec, radius)
+    labels = groups(n + len(storedNames), i, j)
+
+    # a group matching a stored object takes its name
+    canonical = {}
+    for k in range(n, n + len(storedNames)):
+        canonical.setdefault(labels[k], storedNames[k - n])
+
+    # distinct objects must not share a file name
+    taken = dict((name.replace(' ', '_'), labels[n + k]) for k, name in enumerate(storedNames))
+
+    keep, kept, renamed = [], set(), set()
+
+    for k in range(n):
+        label = labels[k]
+
+        if label not in canonical:
+            name, count = names[k], 1
+            while taken.get(name.replace(' ', '_'), label) != label:
+                count += 1
+                name = "{}_{}".format(names[k], count)
+            taken[name.replace(' ', '_')] = label
+            canonical[label] = name
+
+            if name != names[k]:
+                renamed.add(k)
+
+        if label not in kept:
+            kept.add(label)
+            keep.append(k)
+
+    # the names of objects are never aliases of another, nor are the names
+    # which were renamed as they belong to a different object
+    objects = set(canonical.values()) | set(storedNames)
+    aliases = {}
+
+    for k in range(n):
+        if k not in renamed and names[k] not in objects:
+            aliases[names[k]] = canonical[labels[k]]
+
+    out = table[keep].copy()
+    out['name'] = [canonical[labels[k]] for k in keep]
+
+    saveAliases(aliases, objects)
+
+    globs.logger.info("Deduplicated {} targets to {}, {} aliases.".format(n, len(out), len(aliases)))
+
+    return out, aliases
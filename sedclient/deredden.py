@@ -0,0 +1,96 @@
+"""
+    This module corrects spectral flux densities for interstellar extinction
+    with the extinction curve of Cardelli, Clayton & Mathis (1989), ApJ, 345,
+    245, for a ratio of total to selective extinction globs.rv. The curve is
+    defined from 0.1 to 3.3 microns, beyond 3.3 microns its infrared power
+    law is extended and below 0.1 microns it is held at its value at 0.1
+    microns.
+"""
+
+import numpy as np
+from . import globs
+
+def ccm(x):
+    """
+        The a(x) and b(x) coefficients of the extinction curve.
+
+        Parameters
+        ----------
+                x : numpy array
+                The inverse wavelengths in 1/microns.
+
+        Returns
+        ----------
+                a : numpy array
+                The a(x) coefficients.
+
+                b : numpy array
+                The b(x) coefficients.
+    """
+    x = np.clip(np.asarray(x, dtype=float), 0.0, 10.0)
+
+    a = np.zeros(len(x))
+    b = np.zeros(len(x))
+
+    ir = x < 1.1
+    a[ir] = 0.574 * x[ir]**1.61
+    b[ir] = -0.527 * x[ir]**1.61
+
+    opt = (x >= 1.1) & (x < 3.3)
+    y = x[opt] - 1.82
+    a[opt] = np.polyval([0.32999, -0.77530, 0.01979, 0.72085, -0.02427, -0.50447, 0.17699, 1.0], y)
+    b[opt] = np.polyval([-2.09002, 5.30260, -0.62251, -5.38434, 1.07233, 2.28305, 1.41338, 0.0], y)
+
+    uv = (x >= 3.3) & (x < 8.0)
+    xu = x[uv]
+    far = np.clip(xu - 5.9, 0.0, None)
+    a[uv] = 1.752 - 0.316 * xu - 0.104 / ((xu - 4.67)**2 + 0.341) - 0.04473 * far**2 - 0.009779 * far**3
+    b[uv] = -3.090 + 1.825 * xu + 1.206 / ((xu - 4.62)**2 + 0.263) + 0.2130 * far**2 + 0.1207 * far**3
+
+    fuv = x >= 8.0
+    xf = x[fuv] - 8.0
+    a[fuv] = np.polyval([-0.070, 0.137, -0.628, -1.073], xf)
+    b[fuv] = np.polyval([0.374, -0.420, 4.257, 13.670], xf)
+
+    return a, b
+
+def extinction(wave):
+    """
+        The extinction A_lambda / E(B-V) at each wavelength.
+
+        Parameters
+        ----------
+                wave : list
+                The wavelengths in microns.
+
+        Returns
+        ----------
+                ext : numpy array
+                A_lambda / E(B-V) at each wavelength.
+    """
+    a, b = ccm(1.0 / np.asarray(wave, dtype=float))
+
+    return a * globs.rv + b
+
+def dered(wave, fluxes, ebv):
+    """
+        Dereddens spectral flux densities.
+
+        Parameters
+        ----------
+                wave : list
+                The wavelengths in microns.
+
+                fluxes : list
+                The spectral flux densities, floats, ufloats or astropy
+                quantities.
+
+                ebv : float or ufloat
+                E(B-V) of the object.
+
+        Returns
+        ----------
+                fluxes : list
+                The dereddened spectral flux densities.
+    """
+    return [f * 10**(0.4 * float(ext) * ebv) for f, ext in zip(fluxes, extinction(wave))]
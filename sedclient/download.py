@@ -4,14 +4,20 @@
     the data in cgs spectral flux density.
 """
 
+import os
+import signal
 import subprocess
 import configparser
-import unitConversion as uc
-import dataSave as ds
-import globs
+from . import unitConversion as uc
+from . import dataSave as ds
+from . import globs
+from . import parse
 from uncertainties import ufloat
 from astropy import units as u
-import deredden as dr
+from . import montecarlo as mc
+from . import isoIndex
+from . import targets
+from . import deredden as dr
 import numpy as np
 
 def downPh(source):
@@ -31,33 +37,59 @@ def downPh(source):
                 fluxes : list of astropy.units ufloats
                 The fluxes with corresponding units and uncertainties.
     """
+    return reducePh(source, query(queryParams(source)))
+
+def reducePh(source, result):
+    """
+        Reduces the raw query output for a given cat/survey 'source', converts
+        and dereddens the fluxes and saves them.
+
+        Parameters
+        ----------
+                source : string
+                Name of the cat/survey queried.
+
+                result : list
+                A list of the lines of output from the query.
+
+        Returns
+        ---------
+                waves : list
+                List of the wave lengths of the data points.
+
+                fluxes : list of astropy.units ufloats
+                The fluxes with corresponding units and uncertainties.
+    """
 
     conf = configparser.ConfigParser()
     conf.read("{}{}.ini".format(globs.confPath, source))
 
-    quer = queryParams(source)
-    result = query(quer)
-
     kwargs = build_kwargs(result, conf)
 
     kwargs = reduction(**kwargs)
 
-    steps = [checkTypes, checkUnits, qualCheck, convertFluxes]
+    if globs.errMode == 'mc':
+        steps = [checkTypes, checkUnits, qualCheck, mc.convertFluxes]
+    else:
+        steps = [checkTypes, checkUnits, qualCheck, convertFluxes]
 
     if kwargs['fluxes']:
         for step in steps:
             kwargs = step(**kwargs)
 
-        kwargs['fluxes'] = list(dr.dered(kwargs['wave'], kwargs['fluxes'], globs.ebv))
+        if globs.errMode != 'mc':
+            kwargs['fluxes'] = dr.dered(kwargs['wave'], kwargs['fluxes'], globs.ebv)
 
         #debugPrint(source, **kwargs)
 
-        ds.savePh(kwargs['fluxes'], kwargs['wave'], source)
+        ds.savePh(kwargs['fluxes'], kwargs['wave'], source, kwargs.get('errLo'), kwargs.get('errHi'))
 
         return kwargs['wave'], kwargs['fluxes']
 
     globs.logger.info("no {} photometric data found for {}.".format(source, globs.name))
 
+    ds.savePh(None, None, source)
+
     return None, None
 
 
@@ -82,6 +114,9 @@ def debugPrint(source, **kwargs):
 def build_kwargs(data, conf):
     """
         Builds a dictionary of kwargs to be used in the data reduction process.
+        The optional 'select' entry of the reduce section of the config is the
+        policy choosing the row of the object, 'nearest' (the default) or
+        'brightest' followed by the column to compare, see parse.select.
 
         Parameters
         ----------
@@ -107,6 +142,11 @@ def build_kwargs(data, conf):
     for key, val_type in zip(keys, val_types):
         kwargs[key] = [val_type(val) for val in red_conf[key].split()]
 
+    select = red_conf.get('select', 'nearest').split()
+    kwargs['select'] = select[0]
+    kwargs['selectColumn'] = select[1] if len(select) > 1 else None
+
+    kwargs['zeroErr'] = float(red_conf.get('zeroErr', '0'))
     kwargs['qualReq'] = conf['quality']['qual'].split()
     kwargs['fluxes'] = data
 
@@ -130,23 +170,84 @@ def downSp(source):
                 fluxes : list
                 The fluxes for the spectra.
     """
-    quer = queryParams("spec/" + source)
-    result = query(quer)
+    return reduceSp(source, fetchSp(source))
+
+def fetchSp(source, ra=None, dec=None):
+    """
+        Finds the TDT of the SWS01 spectrum of the object and downloads the
+        raw spectrum. If the local ISO index has been built the TDT is found
+        in it and the spectrum is taken from the local cache, otherwise
+        VizieR is queried.
+
+        Parameters
+        ----------
+                source : string
+                Name of the cat/survey to query.
+
+                ra : string or float, optional
+                The right ascension, defaults to globs.ra.
+
+                dec : string or float, optional
+                The declination, defaults to globs.dec.
+
+        Returns
+        ---------
+                lines : list
+                The lines of the raw spectrum or None if there is no spectrum.
+    """
+    if ra is None:
+        ra, dec = globs.ra, globs.dec
+
+    if isoIndex.available():
+        raDeg, decDeg = targets.toDegrees([ra], [dec])
+        TDT = isoIndex.lookup(raDeg[0], decDeg[0])
+    else:
+        quer = queryParams("spec/" + source, "{} {}".format(ra, dec))
+        result = query(quer)
 
-    TDT = getTDT(result)
+        TDT = getTDT(result)
 
     if not TDT:
-        globs.logger.info("No ISO spectra found for {}".format(name))
-        return None, None
+        globs.logger.info("No ISO spectra found at {} {}".format(ra, dec))
+        return None
 
     if len(TDT) != 8:
         TDT = "0{}".format(TDT)
 
+    if isoIndex.available():
+        return isoIndex.fetchCached(TDT, fetchISO)
+
     filename = "http://irsa.ipac.caltech.edu/data/SWS/spectra/sws/{}_sws.txt".format(TDT)
 
-    wave, flux = getISO(filename)
+    return fetchISO(filename)
+
+def reduceSp(source, lines):
+    """
+        Converts, dereddens and saves a raw spectrum.
+
+        Parameters
+        ----------
+                source : string
+                Name of the cat/survey.
+
+                lines : list
+                The lines of the raw spectrum, may be None.
+
+        Returns
+        ---------
+                waves : list
+                List of the wave lengths of the data points.
+
+                fluxes : list
+                The fluxes for the spectra.
+    """
+    if not lines:
+        ds.saveSp(None, None, source)
+        return None, None
+
+    wave, flux = parseISO(lines)
 
-    flux = list(dr.dered(wave, flux, globs.ebv))
+    flux = dr.dered(wave, flux, globs.ebv)
 
     ds.saveSp(wave, flux, source)
 
@@ -169,19 +270,58 @@ def getISO(filename):
                 flux : list of astropy.units ufloats
                 A list of the corresponding fluxes for the spectra.
     """
-    import urllib2
+    return parseISO(fetchISO(filename))
+
+def fetchISO(filename):
+    """
+        Downloads the raw ISO spectra.
+
+        Parameters
+        ----------
+                filename : string
+                The URL of the ISO spectra to download.
+
+        Returns
+        ----------
+                lines : list
+                The lines of the spectra.
+    """
+    if globs.offline:
+        raise RuntimeError("Download of {} refused, the client is offline.".format(filename))
+
+    from urllib.request import urlopen
+
+    f = urlopen(filename)
+    lines = [line.decode() for line in f.readlines()]
+    f.close()
+
+    return lines
+
+def parseISO(lines):
+    """
+        Formats the raw ISO spectra.
+
+        Parameters
+        ----------
+                lines : list
+                The lines of the spectra.
 
-    f = urllib2.urlopen(filename)
+        Returns
+        ----------
+                wave : list
+                A list of wavelengths in microns.
+
+                flux : list of astropy.units ufloats
+                A list of the corresponding fluxes for the spectra.
+    """
     wave, flux = [], []
 
-    for line in f.readlines():
-        data = [value for value in line.split()]
+    for line in lines:
+        data = [float(value) for value in line.split()]
         if data[1] > 0:
-            wave.append(float(data[0]))
+            wave.append(data[0])
             flux.append(uc.convert(ufloat(data[1], data[2]) * u.Jy, data[0]))
 
-    f.close()
-
     return wave, flux
 
 def getTDT(result):
@@ -196,24 +336,16 @@ def getTDT(result):
         Returns
         ----------
                 TDT : string
-                The TDT ID for the SWS01 ISO spectra.
-    """
-    for res in result:
-        exclude = False
-        if (res):
-            for ele in ['#', '---', ' ', 'AOT']:
-                if ele in res.split(';')[0]:
-                    exclude = True
-        else:
-            exclude = True
-            
-        if not exclude:
-            if 'SWS01' in res.split(';')[0]:
-                return res.split(';')[1]
+                The TDT ID for the nearest SWS01 ISO spectra.
+    """
+    table = parse.parse(result, [str, str], [' ', 'AOT'])
+    aot, tdt = table.dtype.names[1:]
 
-    return None
+    table = parse.select(table[np.char.find(table[aot], 'SWS01') >= 0], 'nearest')
+
+    return str(table[tdt][0]) if len(table) else None
 
-def queryParams(source):
+def queryParams(source, obj=None):
     """
         Makes a dictionary with the query parameters.
 
@@ -223,6 +355,9 @@ def queryParams(source):
                 Name of the catalogue to query. Each survey/source has a .ini
                 file with the parameters for querying that survey/source.
 
+                obj : string, optional
+                The coordinates to query, defaults to globs.ra and globs.dec.
+
         Returns
         ---------
                 query : dictionary
@@ -231,7 +366,7 @@ def queryParams(source):
 
     query = {}
 
-    query['object'] = "{} {}".format(globs.ra, globs.dec)
+    query['object'] = obj or "{} {}".format(globs.ra, globs.dec)
 
     conf = configparser.ConfigParser()
     conf.read("{}{}.ini".format(globs.confPath, source))
@@ -241,7 +376,7 @@ def queryParams(source):
 
     return query
 
-def query(params):
+def query(params, timeout=None):
     """
         Performs vizieR query using the parameters in the dictionary 'params'
 
@@ -250,21 +385,37 @@ def query(params):
                 params : dictionary
                 A dictionary listing the parameters of the query.
 
+                timeout : float, optional
+                The time in seconds after which the query is killed and
+                subprocess.TimeoutExpired is raised, defaults to no limit.
+
         Returns
         ---------
                 result : list
                 A list of the resulting data from the query.
     """
 
+    if globs.offline:
+        raise RuntimeError("Query of {} refused, the client is offline.".format(params['source']))
+
     query = "vizquery -source='{source}' -c='{object}' -c.rs='{radius}' -out='{output}' -sort='_r' -out.max='{max}' -mime='csv'".format(**params)
 
-    (output, err) = subprocess.Popen(query, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True).communicate()
+    proc = subprocess.Popen(query, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True, start_new_session=True, text=True)
+
+    try:
+        (output, err) = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.communicate()
+        raise
 
     return output.split('\n')
 
 def reduction(**kwargs):
     """
-        Reduces the raw data list by removing all the associated crap.
+        Parses the raw data list into a structured array typed by the survey
+        config and keeps the row of the object chosen by the 'select' policy
+        of the survey config, see parse.select.
 
         Parameters
         ----------
@@ -276,28 +427,20 @@ def reduction(**kwargs):
                 kwargs : dictionary
                 Dictionary of objects required to reduce the data.
     """
-    kwargs['exclude'] += ['#', '---']
+    table = parse.parse(kwargs['fluxes'], kwargs['types'], kwargs['exclude'])
+    table = parse.select(table, kwargs['select'], kwargs['selectColumn'], mag=kwargs['units'][0] == u.mag)
 
-    for row in kwargs['fluxes']:
-        exBool = False
-        if row:
-            for ele in kwargs['exclude']:
-                if ele in row.split(';')[0]:
-                    exBool = True
-        else:
-            exBool = True
-
-        if not exBool:
-            kwargs['fluxes'] = row.split(';')
-            return kwargs
-        else:
-            kwargs['fluxes'] = None
+    if len(table):
+        kwargs['fluxes'] = [table[0][name] for name in table.dtype.names[1:]]
+    else:
+        kwargs['fluxes'] = None
 
     return kwargs
 
 def checkTypes(**kwargs):
     """
-        Converts each element of the data list into the required data type.
+        Converts each element of the data list into the required data type,
+        empty fields become nan.
 
         Parameters
         ----------
@@ -309,16 +452,13 @@ def checkTypes(**kwargs):
                 kwargs : dictionary
                 Dictionary of objects required to reduce the data.
     """
-    import numpy as np
-
-    data = kwargs['fluxes']
-    types = kwargs['types']
+    fluxes = kwargs['fluxes']
 
-    for i in range(0, len(kwargs['fluxes'])):
-        if kwargs['fluxes'][i].strip() == '':
-            kwargs['fluxes'][i] = np.nan
+    for i in range(0, len(fluxes)):
+        if isinstance(fluxes[i], str) and fluxes[i].strip() == '':
+            fluxes[i] = np.nan
         else:
-            kwargs['fluxes'][i] = kwargs['types'][i](kwargs['fluxes'][i])
+            fluxes[i] = kwargs['types'][i](fluxes[i])
 
     return kwargs
 
@@ -375,11 +515,11 @@ def checkUnits(**kwargs):
         units *= len(fluxes)
     elif len(units) == 2:
         if units[1].is_equivalent(u.percent):
-            for i in range(1, len(units)*len(fluxes)/2, 2):
+            for i in range(1, len(units)*len(fluxes)//2, 2):
                 fluxes[i] = (fluxes[i] / 100) * fluxes[i-1]
             units = [units[0]] * 2
 
-        units *= len(fluxes) / 2
+        units *= len(fluxes) // 2
 
     fluxes = [x*y for x, y in zip(fluxes, units)]
 
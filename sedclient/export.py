@@ -0,0 +1,248 @@
+"""
+    This module streams the whole photometry archive in globs.dirPh into one
+    wide table with one row per object. The columns are the name, coordinates
+    and E(B-V) of each object followed by the flux and error in each band of
+    the surveys in the config files. The table is written in chunks either as
+    csv or as a directory of .npy files (one per column) so the memory used
+    does not depend on the size of the archive.
+"""
+
+import configparser
+import csv
+import os
+import numpy as np
+from . import globs
+from . import load
+
+metaColumns = [('name', 'U64'), ('ra', 'U32'), ('dec', 'U32'), ('l', 'f8'), ('b', 'f8'), ('ebv', 'f8'), ('ebv_err', 'f8')]
+
+def archiveFiles():
+    """
+        Lists the photometry files in the archive.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                files : list
+                A sorted list of the file names in globs.dirPh.
+    """
+    return sorted(f for f in os.listdir(globs.dirPh) if not f.startswith('.') and os.path.isfile(os.path.join(globs.dirPh, f)))
+
+def iterArchive(files=None):
+    """
+        Reads the photometry files one at a time.
+
+        Parameters
+        ----------
+                files : list, optional
+                The files to read, defaults to the whole archive.
+
+        Returns
+        ----------
+                objects : generator
+                Yields (filename, configparser) for each object.
+    """
+    for filename in (files if files is not None else archiveFiles()):
+        conf = configparser.ConfigParser(strict=False, interpolation=None)
+        conf.read(os.path.join(globs.dirPh, filename))
+        yield filename, conf
+
+def columns():
+    """
+        Builds the columns of the wide table.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                dtype : list
+                A list of (column, NumPy dtype) tuples.
+
+                bandCols : dictionary
+                Maps (source, wavelength) to the index of the flux column, the
+                error is in the following column.
+    """
+    dtype = list(metaColumns)
+    bandCols = {}
+
+    for source, wave in load.bands():
+        bandCols[(source, wave)] = len(dtype)
+        dtype.append(("{}_{}".format(source, wave), 'f8'))
+        dtype.append(("{}_{}_err".format(source, wave), 'f8'))
+
+    return dtype, bandCols
+
+def fillRow(row, filename, conf, bandCols):
+    """
+        Fills one row of the wide table from a photometry file.
+
+        Parameters
+        ----------
+                row : numpy record
+                The row to fill, numeric columns already set to nan.
+
+                filename : string
+                The name of the photometry file.
+
+                conf : configparser
+                The contents of the photometry file.
+
+                bandCols : dictionary
+                Maps (source, wavelength) to the index of the flux column.
+
+        Returns
+        ----------
+                None
+    """
+    names = row.dtype.names
+
+    row['name'] = filename
+
+    if conf.has_section('meta'):
+        meta = conf['meta']
+        for col, kind in metaColumns:
+            if col in meta and meta[col] not in ('', 'None'):
+                row[col] = meta[col] if kind.startswith('U') else float(meta[col])
+
+    for source in conf.sections():
+        if 'wave' not in conf[source]:
+            continue
+
+        wave = [float(w) for w in conf[source]['wave'].split()]
+        fluxVec = [float(f) for f in conf[source]['fluxes'].split()]
+
+        for w, f, e in zip(wave, fluxVec[0::2], fluxVec[1::2]):
+            col = bandCols.get((source, w))
+            if col is not None:
+                row[names[col]] = f
+                row[names[col + 1]] = e
+
+def emptyChunk(dtype, size):
+    """
+        Makes a chunk of the wide table with the numeric columns set to nan.
+
+        Parameters
+        ----------
+                dtype : list
+                The columns of the table.
+
+                size : int
+                The number of rows.
+
+        Returns
+        ----------
+                chunk : numpy structured array
+                The empty chunk.
+    """
+    chunk = np.zeros(size, dtype=dtype)
+
+    for col, kind in dtype:
+        if kind == 'f8':
+            chunk[col] = np.nan
+
+    return chunk
+
+def iterChunks(chunkSize=10000, files=None):
+    """
+        Streams the archive as chunks of the wide table.
+
+        Parameters
+        ----------
+                chunkSize : int, optional
+                The number of objects per chunk.
+
+                files : list, optional
+                The files to read, defaults to the whole archive.
+
+        Returns
+        ----------
+                chunks : generator
+                Yields numpy structured arrays of up to chunkSize rows.
+    """
+    dtype, bandCols = columns()
+    files = archiveFiles() if files is None else files
+
+    for start in range(0, len(files), chunkSize):
+        batch = files[start:start + chunkSize]
+        chunk = emptyChunk(dtype, len(batch))
+
+        for row, (filename, conf) in zip(chunk, iterArchive(batch)):
+            fillRow(row, filename, conf, bandCols)
+
+        yield chunk
+
+def export(filename, fmt='csv', chunkSize=10000):
+    """
+        Exports the whole photometry archive as one wide table.
+
+        Parameters
+        ----------
+                filename : string
+                The csv file, or the directory for the .npy columns.
+
+                fmt : string, optional
+                Either 'csv' or 'npy'.
+
+                chunkSize : int, optional
+                The number of objects held in memory at once.
+
+        Returns
+        ----------
+                None
+    """
+    dtype, bandCols = columns()
+    files = archiveFiles()
+
+    if fmt == 'csv':
+        with open(filename, 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow([col for col, _ in dtype])
+            for chunk in iterChunks(chunkSize, files):
+                writer.writerows(chunk.tolist())
+    elif fmt == 'npy':
+        if not os.path.exists(filename):
+            os.makedirs(filename)
+
+        out = {}
+        for col, kind in dtype:
+            out[col] = np.lib.format.open_memmap(os.path.join(filename, "{}.npy".format(col)), mode='w+', dtype=kind, shape=(len(files),))
+
+        start = 0
+        for chunk in iterChunks(chunkSize, files):
+            for col, _ in dtype:
+                out[col][start:start + len(chunk)] = chunk[col]
+            start += len(chunk)
+
+        for col in out:
+            out[col].flush()
+    else:
+        raise ValueError("Unknown export format '{}'.".format(fmt))
+
+    globs.logger.info("Exported {} objects to {}.".format(len(files), filename))
+
+def loadExport(dirname, cols=None):
+    """
+        Memory maps the columns of a table exported with fmt='npy'.
+
+        Parameters
+        ----------
+                dirname : string
+                The directory of the exported table.
+
+                cols : list, optional
+                The columns to load, defaults to all of them.
+
+        Returns
+        ----------
+                table : dictionary
+                The memory mapped columns.
+    """
+    if cols is None:
+        cols = [f[:-4] for f in os.listdir(dirname) if f.endswith('.npy')]
+
+    return dict((col, np.load(os.path.join(dirname, "{}.npy".format(col)), mmap_mode='r')) for col in cols)
@@ -0,0 +1,547 @@
+"""
+    This module fits model grids to the photometry of an SED. The grids are
+    either blackbodies, modified blackbodies or tabulated models and are
+    stored in the globs.dirGrid directory as .npy files which are memory
+    mapped when fitting. Each grid is pre-convolved to the bands of the
+    surveys listed in the config files so the fit is a vectorised chi-square
+    over the whole grid with the best scaling of each model solved
+    analytically.
+"""
+
+import configparser
+import os
+import numpy as np
+from . import globs
+from . import load
+
+h = 6.6260755e-27
+c = 2.99792458e10
+k = 1.380658e-16
+
+chunkSize = 20000
+
+def blackbody(wave, temp):
+    """
+        The shape of a blackbody in lambda F_lambda.
+
+        Parameters
+        ----------
+                wave : numpy array
+                Wavelengths in microns.
+
+                temp : numpy array
+                Temperatures in K, broadcast against wave.
+
+        Returns
+        ----------
+                flux : numpy array
+                lambda B_lambda in erg/s/cm**2/sr.
+    """
+    lam = np.asarray(wave, dtype=float) * 1e-4
+    x = np.clip(h * c / (lam * k * np.asarray(temp, dtype=float)), None, 700.0)
+
+    return 2.0 * h * c**2 / lam**4 / np.expm1(x)
+
+def modBlackbody(wave, temp, beta, wave0=100.0):
+    """
+        The shape of a modified blackbody in lambda F_lambda, the blackbody
+        multiplied by the emissivity (wave0 / wave)**beta.
+
+        Parameters
+        ----------
+                wave : numpy array
+                Wavelengths in microns.
+
+                temp : numpy array
+                Temperatures in K, broadcast against wave.
+
+                beta : numpy array
+                Emissivity indices, broadcast against wave.
+
+                wave0 : float, optional
+                The reference wavelength of the emissivity in microns.
+
+        Returns
+        ----------
+                flux : numpy array
+                The modified blackbody in erg/s/cm**2/sr.
+    """
+    return blackbody(wave, temp) * (wave0 / np.asarray(wave, dtype=float))**beta
+
+def bandFluxes(wave, flux, bandWaves, bandList=None):
+    """
+        Convolves model spectra to the survey bands. Bands with a
+        transmission curve (see synphot) are convolved through it, the
+        others are interpolated at the wavelength of the band.
+
+        Parameters
+        ----------
+                wave : numpy array
+                The wavelengths of the models in microns.
+
+                flux : numpy array
+                The models in lambda F_lambda, shape (nModels, len(wave)).
+
+                bandWaves : numpy array
+                The wavelengths of the bands.
+
+                bandList : list, optional
+                The (source, wavelength) of the bands, needed to find their
+                transmission curves.
+
+        Returns
+        ----------
+                fluxes : numpy array
+                The models in each band, shape (nModels, len(bandWaves)).
+    """
+    logWave = np.log10(wave)
+    logFlux = np.log10(np.clip(flux, 1e-300, None))
+    logBand = np.log10(bandWaves)
+
+    idx = np.clip(np.searchsorted(logWave, logBand), 1, len(logWave) - 1)
+    frac = (logBand - logWave[idx - 1]) / (logWave[idx] - logWave[idx - 1])
+
+    out = logFlux[:, idx - 1] + frac * (logFlux[:, idx] - logFlux[:, idx - 1])
+    outside = (logBand < logWave[0]) | (logBand > logWave[-1])
+
+    out = np.where(outside, 0.0, 10**out)
+
+    if bandList is not None:
+        from . import synphot
+
+        weights, valid, _ = synphot.matrix(wave, bandList)
+        if valid.any():
+            out[:, valid] = flux.dot(weights[valid].T)
+
+    return out
+
+def saveGrid(name, kind, params, fluxes, wave=None, full=None):
+    """
+        Writes a grid to the globs.dirGrid directory.
+
+        Parameters
+        ----------
+                name : string
+                Name of the grid.
+
+                kind : string
+                The kind of model, 'bb', 'modbb' or 'tab'.
+
+                params : numpy structured array
+                The parameters of each model.
+
+                fluxes : numpy array
+                The models convolved to the bands, shape (nModels, nBands).
+
+                wave : numpy array, optional
+                Wavelengths of the full resolution tabulated models.
+
+                full : numpy array, optional
+                The full resolution tabulated models used for plotting.
+
+        Returns
+        ----------
+                None
+    """
+    base = "{}{}".format(globs.dirGrid, name)
+
+    norm = fluxes.max(axis=1)
+    norm[norm <= 0] = 1.0
+
+    np.save("{}.npy".format(base), (fluxes / norm[:, None]).astype('f4'))
+    np.save("{}_params.npy".format(base), params)
+
+    conf = configparser.ConfigParser()
+    conf['grid'] = {'kind': kind, 'bands': ' '.join("{}:{}".format(s, w) for s, w in load.bands())}
+
+    if full is not None:
+        np.save("{}_wave.npy".format(base), np.asarray(wave, dtype='f8'))
+        np.save("{}_full.npy".format(base), (full / norm[:, None]).astype('f4'))
+
+    with open("{}.ini".format(base), 'w') as f:
+        conf.write(f)
+
+    globs.logger.info("Saved model grid {} with {} models.".format(name, len(params)))
+
+def buildBB(name, temps):
+    """
+        Builds a grid of blackbodies.
+
+        Parameters
+        ----------
+                name : string
+                Name of the grid.
+
+                temps : array
+                Temperatures of the models in K.
+
+        Returns
+        ----------
+                None
+    """
+    temps = np.asarray(temps, dtype=float)
+    bandWaves = np.array([w for _, w in load.bands()])
+
+    params = np.zeros(len(temps), dtype=[('temp', 'f8')])
+    params['temp'] = temps
+
+    fluxes = np.vstack([blackbody(bandWaves, temps[i:i + chunkSize, None]) for i in range(0, len(temps), chunkSize)])
+
+    saveGrid(name, 'bb', params, fluxes)
+
+def buildModBB(name, temps, betas, wave0=100.0):
+    """
+        Builds a grid of modified blackbodies over all combinations of temps
+        and betas.
+
+        Parameters
+        ----------
+                name : string
+                Name of the grid.
+
+                temps : array
+                Temperatures of the models in K.
+
+                betas : array
+                Emissivity indices of the models.
+
+                wave0 : float, optional
+                The reference wavelength of the emissivity in microns.
+
+        Returns
+        ----------
+                None
+    """
+    temp, beta = np.meshgrid(np.asarray(temps, dtype=float), np.asarray(betas, dtype=float), indexing='ij')
+    bandWaves = np.array([w for _, w in load.bands()])
+
+    params = np.zeros(temp.size, dtype=[('temp', 'f8'), ('beta', 'f8'), ('wave0', 'f8')])
+    params['temp'], params['beta'], params['wave0'] = temp.ravel(), beta.ravel(), wave0
+
+    fluxes = modBlackbody(bandWaves, params['temp'][:, None], params['beta'][:, None], wave0)
+
+    saveGrid(name, 'modbb', params, fluxes)
+
+def buildTab(name, wave, models, params):
+    """
+        Builds a grid from tabulated models.
+
+        Parameters
+        ----------
+                name : string
+                Name of the grid.
+
+                wave : array
+                The wavelengths of the models in microns, sorted.
+
+                models : array
+                The models in lambda F_lambda, shape (nModels, len(wave)).
+
+                params : numpy structured array
+                The parameters of each model.
+
+        Returns
+        ----------
+                None
+    """
+    wave = np.asarray(wave, dtype=float)
+    models = np.asarray(models, dtype=float)
+    bandList = load.bands()
+    bandWaves = np.array([w for _, w in bandList])
+
+    fluxes = bandFluxes(wave, models, bandWaves, bandList)
+
+    saveGrid(name, 'tab', params, fluxes, wave, models)
+
+def loadGrid(name):
+    """
+        Memory maps a grid from the globs.dirGrid directory.
+
+        Parameters
+        ----------
+                name : string
+                Name of the grid.
+
+        Returns
+        ----------
+                grid : dictionary
+                A dictionary with the 'name', 'kind', 'params', the 'bands'
+                and their 'waves' and the memory mapped 'fluxes'.
+    """
+    base = "{}{}".format(globs.dirGrid, name)
+
+    conf = configparser.ConfigParser()
+    conf.read("{}.ini".format(base))
+
+    grid = {}
+    grid['name'] = name
+    grid['kind'] = conf['grid']['kind']
+    grid['bands'] = [(b.split(':')[0], float(b.split(':')[1])) for b in conf['grid']['bands'].split()]
+    grid['waves'] = np.array([w for _, w in grid['bands']])
+    grid['fluxes'] = np.load("{}.npy".format(base), mmap_mode='r')
+    grid['params'] = np.load("{}_params.npy".format(base))
+
+    if os.path.exists("{}_full.npy".format(base)):
+        grid['wave'] = np.load("{}_wave.npy".format(base))
+        grid['full'] = np.load("{}_full.npy".format(base), mmap_mode='r')
+
+    return grid
+
+def observed(photo, bandList):
+    """
+        Puts the photometry of an object onto the band columns of a grid.
+
+        Parameters
+        ----------
+                photo : dictionary
+                The photometry data structure from dataStruct.
+
+                bandList : list
+                The (source, wavelength) bands of the grid.
+
+        Returns
+        ----------
+                flux : numpy array
+                The fluxes in each band, zero where missing.
+
+                weight : numpy array
+                The inverse variances in each band, zero where missing.
+    """
+    columns = {}
+    for i, band in enumerate(bandList):
+        columns[band] = i
+
+    flux = np.zeros(len(bandList))
+    weight = np.zeros(len(bandList))
+
+    for source in photo:
+        if not photo[source]['flux']:
+            continue
+        for w, f in zip(photo[source]['wave'], photo[source]['flux']):
+            col = columns.get((source, w))
+            if col is not None and f.value.s > 0:
+                flux[col] = f.value.n
+                weight[col] = 1.0 / f.value.s**2
+
+    return flux, weight
+
+def chiSquare(fluxes, flux, weight):
+    """
+        Evaluates the chi-square of every model in a grid against many objects
+        at once with the scale of each model solved analytically. The grid is
+        processed in chunks so memory mapped grids are never fully loaded.
+
+        Parameters
+        ----------
+                fluxes : numpy array
+                The grid, shape (nModels, nBands).
+
+                flux : numpy array
+                The observed fluxes, shape (nObjects, nBands).
+
+                weight : numpy array
+                The inverse variances, shape (nObjects, nBands), zero where
+                there is no data.
+
+        Returns
+        ----------
+                best : numpy array
+                The index of the best model for each object.
+
+                scale : numpy array
+                The scale of the best model for each object.
+
+                chi2 : numpy array
+                The chi-square of the best model for each object.
+    """
+    flux = np.atleast_2d(flux)
+    weight = np.atleast_2d(weight)
+
+    wy = (weight * flux).T
+    base = (weight * flux**2).sum(axis=1)
+
+    best = np.zeros(len(flux), dtype=int)
+    scale = np.zeros(len(flux))
+    chi2 = np.full(len(flux), np.inf)
+
+    for i in range(0, len(fluxes), chunkSize):
+        models = np.asarray(fluxes[i:i + chunkSize], dtype=float)
+
+        a = models.dot(wy)
+        b = (models**2).dot(weight.T)
+        b[b == 0] = np.inf
+
+        curr = base - a**2 / b
+        idx = curr.argmin(axis=0)
+        cols = np.arange(len(flux))
+
+        better = curr[idx, cols] < chi2
+        best[better] = i + idx[better]
+        scale[better] = a[idx, cols][better] / b[idx, cols][better]
+        chi2[better] = curr[idx, cols][better]
+
+    return best, scale, chi2
+
+def freeParams(params):
+    """
+        The number of parameters varied across a grid, those that are the
+        same for every model, i.e. wave0 of a modified blackbody grid, are
+        not fitted.
+
+        Parameters
+        ----------
+                params : numpy structured array
+                The parameters of the models of the grid.
+
+        Returns
+        ----------
+                n : int
+                The number of fitted parameters, not counting the scale.
+    """
+    return sum(1 for col in params.dtype.names if len(np.unique(params[col])) > 1)
+
+def fitSED(photo, names=None):
+    """
+        Fits each of the grids to the photometry of an object.
+
+        Parameters
+        ----------
+                photo : dictionary
+                The photometry data structure from dataStruct, without the
+                outliers if globs.excludeOutliers is set.
+
+                names : list, optional
+                The names of the grids to fit, defaults to globs.fitGrids.
+
+        Returns
+        ----------
+                fits : list of dictionaries
+                For each grid the 'grid', best model 'index', 'params',
+                'scale', 'chi2' and degrees of freedom 'dof'.
+    """
+    fits = []
+
+    if globs.excludeOutliers:
+        from . import outliers
+        photo = outliers.exclude(photo)
+
+    for name in (names or globs.fitGrids):
+        grid = loadGrid(name)
+        flux, weight = observed(photo, grid['bands'])
+
+        nPoints = int((weight > 0).sum())
+        if nPoints == 0:
+            globs.logger.info("No photometry to fit grid {} for {}.".format(name, globs.name))
+            continue
+
+        best, scale, chi2 = chiSquare(grid['fluxes'], flux, weight)
+
+        fit = {}
+        fit['grid'] = grid
+        fit['index'] = int(best[0])
+        fit['params'] = grid['params'][best[0]]
+        fit['scale'] = float(scale[0])
+        fit['chi2'] = float(chi2[0])
+        fit['dof'] = nPoints - freeParams(grid['params']) - 1
+
+        globs.logger.info("Best {} model for {} is {} with chi2 = {:.3E}.".format(name, globs.name, fit['params'], fit['chi2']))
+
+        fits.append(fit)
+
+    return fits
+
+def fitMany(photos, name):
+    """
+        Fits one grid to the photometry of many objects at once.
+
+        Parameters
+        ----------
+                photos : list of dictionaries
+                The photometry data structures of the objects.
+
+                name : string
+                The name of the grid to fit.
+
+        Returns
+        ----------
+                params : numpy structured array
+                The parameters of the best model for each object.
+
+                scale : numpy array
+                The scale of the best model for each object.
+
+                chi2 : numpy array
+                The chi-square of the best model for each object.
+    """
+    grid = loadGrid(name)
+
+    obs = [observed(photo, grid['bands']) for photo in photos]
+    flux = np.array([o[0] for o in obs])
+    weight = np.array([o[1] for o in obs])
+
+    best, scale, chi2 = chiSquare(grid['fluxes'], flux, weight)
+
+    return grid['params'][best], scale, chi2
+
+def modelCurve(fit, wave=None):
+    """
+        Evaluates the best fitting model for plotting.
+
+        Parameters
+        ----------
+                fit : dictionary
+                A fit returned by fitSED.
+
+                wave : numpy array, optional
+                Wavelengths in microns for the analytic models.
+
+        Returns
+        ----------
+                wave : numpy array
+                The wavelengths of the model.
+
+                flux : numpy array
+                The scaled model in lambda F_lambda (erg/s/cm**2).
+    """
+    grid = fit['grid']
+    params = fit['params']
+
+    if wave is None:
+        wave = np.logspace(-1, 3, 400)
+
+    if grid['kind'] == 'bb':
+        flux = blackbody(wave, params['temp'])
+    elif grid['kind'] == 'modbb':
+        flux = modBlackbody(wave, params['temp'], params['beta'], params['wave0'])
+    elif 'full' in grid:
+        wave, flux = grid['wave'], np.asarray(grid['full'][fit['index']], dtype=float)
+        return wave, fit['scale'] * flux
+    else:
+        return grid['waves'], fit['scale'] * np.asarray(grid['fluxes'][fit['index']], dtype=float)
+
+    return wave, fit['scale'] * flux / modelNorm(grid, params)
+
+def modelNorm(grid, params):
+    """
+        The normalisation applied to an analytic model when the grid was
+        built, i.e. its maximum over the bands.
+
+        Parameters
+        ----------
+                grid : dictionary
+                The grid returned by loadGrid.
+
+                params : numpy record
+                The parameters of the model.
+
+        Returns
+        ----------
+                norm : float
+                The normalisation of the model.
+    """
+    if grid['kind'] == 'bb':
+        norm = blackbody(grid['waves'], params['temp']).max()
+    else:
+        norm = modBlackbody(grid['waves'], params['temp'], params['beta'], params['wave0']).max()
+
+    return norm if norm > 0 else 1.0
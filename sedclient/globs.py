@@ -17,12 +17,108 @@ dirPh = "data/photometry/"
 dirSp = "data/spectroscopy/"
 dirSed = "data/sed/"
 dirLog = "data/logfiles/"
+dirGrid = "data/grids/"
+dirFit = "data/fits/"
 masterLog = "master.log"
 confPath = "sedclient/config/"
 
 phSources = [f.replace('.ini', '') for f in os.listdir(confPath) if os.path.isfile(os.path.join(confPath, f))]
 specSources=['iso']
 
+# the ratio of total to selective extinction of the extinction curve, see
+# deredden
+rv = 3.1
+
+# names of the model grids in dirGrid to fit to each SED
+fitGrids = []
+
+# error propagation, 'ufloat' or 'mc' for Monte Carlo samples
+errMode = 'ufloat'
+mcSamples = 1000
+mcSeed = None
+
+# saving, batchSave holds photometry in memory until dataSave.flush or until
+# flushEvery objects are waiting, fsync forces the data to disk on each write
+batchSave = False
+flushEvery = 100
+fsync = False
+
+# plotting, reuseFigure keeps one figure for every SED so the shared labels
+# are only laid out once, plainAnns annotates without mathtext
+reuseFigure = False
+plainAnns = False
+
+# the spectra are decimated to the minimum and maximum flux in each pixel
+# column of the wavelength axis, spColumns is the number of columns or None
+# for the width of the axes at plotDpi, 0 plots every point
+spColumns = None
+plotDpi = 300
+
+# the raw query output and spectra stored by the fetch stage, the stamps of
+# the inputs of each stage, and offline refuses any query or download
+dirRaw = "data/raw/"
+dirStamp = "data/stamps/"
+offline = False
+
+# the run journal used to resume batch runs, None to disable
+journalPath = None
+
+# synthetic photometry, the standard grid spectra are rebinned onto and the
+# fraction of a band a spectrum must cover
+synRange = (1.0, 200.0)
+synBins = 20000
+synCoverage = 0.99
+
+# the tails of the bolometric flux integration, 'wien' or 'none' blueward
+# of the bluest point and 'rj' or 'none' beyond the reddest point
+bolBlue = 'wien'
+bolRed = 'rj'
+
+# the time budget in seconds for the catalogue queries of an object and the
+# limit of a single query, None to wait; with either set the queries run
+# concurrently slowest first using the latency history, see scheduler
+objectBudget = None
+queryTimeout = None
+queryWorkers = 8
+latencyPath = "data/latency.json"
+latencyWeight = 0.2
+
+# profiling of each SED build, profileTop is the number of entries reported
+profile = False
+profileTop = 25
+
+# the summary index of the saved data, None to disable
+summaryPath = None
+
+# the local dust map used by the targets module
+dustMap = "data/dust/ebv.npy"
+
+# the local index of ISO SWS01 observations and the cache of their spectra
+isoIndex = "data/iso/index.npz"
+dirIso = "data/iso/sws/"
+
+# the SED server, the address it listens on, the number of worker processes
+# and the number of requests kept for the latency statistics
+serverHost = "127.0.0.1"
+serverPort = 8642
+serverWorkers = 2
+serverHistory = 1000
+
+# the de-duplication of target lists, see dedup.dedupe, the matching radius
+# in arcsec (None for the smallest query radius of the surveys) and the
+# alias map
+dedupRadius = None
+aliasPath = "data/aliases.json"
+
+# the outlier check, the threshold in units of the error, the scatter in dex
+# added to the errors, the curvature in dex per dex**2 allowed for at the
+# ends of an SED and whether the plots and fits leave out the flagged
+# points, see outliers
+outlierSigma = 5.0
+outlierFloor = 0.05
+outlierCurvature = 3.0
+excludeOutliers = False
+
 logFormat = logging.Formatter("%(asctime)-15s ; %(levelname)s ; Mod: %(module)-5s ; LN: %(lineno)d ; %(message)s", "%Y-%m-%d %H:%M:%S")
 
 logger = logging.getLogger()
@@ -0,0 +1,201 @@
+"""
+    This module keeps a local positional index of the ISO SWS01 observations
+    so the TDT of an object's spectrum is found without querying VizieR. The
+    index is built once from a vizquery csv dump of the ISO catalogue and is
+    saved at globs.isoIndex as arrays sorted by declination, so a lookup is a
+    binary search for the declination strip followed by an angular distance
+    check of the few observations in it. Downloaded SWS spectra are cached in
+    globs.dirIso by TDT.
+"""
+
+import configparser
+import os
+import numpy as np
+from . import parse
+from . import globs
+
+indexCache = {}
+
+def build(dumpFile, aotCol='AOT', tdtCol='TDT', raCol='RAJ2000', decCol='DEJ2000', aot='SWS01'):
+    """
+        Builds the index from a vizquery csv dump of the ISO catalogue.
+
+        Parameters
+        ----------
+                dumpFile : string
+                The dump of the catalogue.
+
+                aotCol, tdtCol, raCol, decCol : string, optional
+                The names of the AOT, TDT and position columns in the dump.
+
+                aot : string, optional
+                The observation type kept in the index.
+
+        Returns
+        ----------
+                None
+    """
+    from . import targets
+
+    with open(dumpFile, 'r') as f:
+        rows = list(parse.dataRows(f))
+
+    header = rows[0][1] if rows else []
+    cols = [header.index(col) for col in [aotCol, tdtCol, raCol, decCol]]
+
+    kept = [[fields[c].strip() for c in cols] for _, _, fields in rows]
+    kept = [row for row in kept if aot in row[0]]
+
+    tdt = np.array([row[1].zfill(8) for row in kept], dtype='U8')
+    ra, dec = targets.toDegrees([row[2] for row in kept], [row[3] for row in kept])
+
+    order = np.argsort(dec)
+
+    np.savez(globs.isoIndex, tdt=tdt[order], ra=ra[order], dec=dec[order])
+    indexCache.pop(globs.isoIndex, None)
+
+    globs.logger.info("Built ISO index of {} {} observations.".format(len(tdt), aot))
+
+def available():
+    """
+        Returns True if the index has been built.
+    """
+    return os.path.exists(globs.isoIndex)
+
+def loadIndex():
+    """
+        Loads and caches the index.
+    """
+    if globs.isoIndex not in indexCache:
+        with np.load(globs.isoIndex) as index:
+            indexCache[globs.isoIndex] = dict((key, index[key]) for key in index.files)
+
+    return indexCache[globs.isoIndex]
+
+def searchRadius():
+    """
+        The search radius in arcsec taken from the query config of the ISO
+        catalogue.
+    """
+    conf = configparser.ConfigParser()
+    conf.read("{}spec/iso.ini".format(globs.confPath))
+
+    return float(conf['query']['radius'])
+
+def lookupMany(ra, dec, radius=None, chunkSize=100000):
+    """
+        Finds the nearest SWS01 observation of many positions.
+
+        Parameters
+        ----------
+                ra : array
+                Right ascensions in degrees.
+
+                dec : array
+                Declinations in degrees.
+
+                radius : float, optional
+                The search radius in arcsec, defaults to the ISO config.
+
+                chunkSize : int, optional
+                The number of positions matched at once.
+
+        Returns
+        ----------
+                tdt : numpy array
+                The TDT of each position, '' where there is none.
+    """
+    index = loadIndex()
+    radius = (searchRadius() if radius is None else radius) / 3600.0
+
+    ra = np.atleast_1d(np.asarray(ra, dtype=float))
+    dec = np.atleast_1d(np.asarray(dec, dtype=float))
+
+    result = np.full(len(ra), '', dtype='U8')
+
+    for start in range(0, len(ra), chunkSize):
+        r = ra[start:start + chunkSize]
+        d = dec[start:start + chunkSize]
+
+        lo = np.searchsorted(index['dec'], d - radius, 'left')
+        hi = np.searchsorted(index['dec'], d + radius, 'right')
+        counts = hi - lo
+
+        if not counts.sum():
+            continue
+
+        target = np.repeat(np.arange(len(r)), counts)
+        cand = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        d1, d2 = np.radians(d[target]), np.radians(index['dec'][cand])
+        dra = np.radians(r[target] - index['ra'][cand])
+        sep = np.degrees(2 * np.arcsin(np.sqrt(np.sin((d2 - d1) / 2)**2 + np.cos(d1) * np.cos(d2) * np.sin(dra / 2)**2)))
+
+        inside = sep <= radius
+        target, cand, sep = target[inside], cand[inside], sep[inside]
+
+        order = np.lexsort((sep, target))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = target[order][1:] != target[order][:-1]
+
+        result[start + target[order][first]] = index['tdt'][cand[order][first]]
+
+    return result
+
+def lookup(ra, dec, radius=None):
+    """
+        Finds the nearest SWS01 observation of a position.
+
+        Parameters
+        ----------
+                ra : float
+                Right ascension in degrees.
+
+                dec : float
+                Declination in degrees.
+
+                radius : float, optional
+                The search radius in arcsec, defaults to the ISO config.
+
+        Returns
+        ----------
+                TDT : string
+                The TDT or None if there is no observation.
+    """
+    return lookupMany([ra], [dec], radius)[0] or None
+
+def fetchCached(TDT, fetch):
+    """
+        Returns the raw SWS spectrum of a TDT from the cache, downloading and
+        caching it if needed.
+
+        Parameters
+        ----------
+                TDT : string
+                The TDT of the observation.
+
+                fetch : function
+                Downloads the spectrum from a URL, i.e. download.fetchISO.
+
+        Returns
+        ----------
+                lines : list
+                The lines of the spectrum.
+    """
+    from . import dataSave as ds
+
+    filename = "{}{}_sws.txt".format(globs.dirIso, TDT)
+
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            return f.readlines()
+
+    lines = fetch("http://irsa.ipac.caltech.edu/data/SWS/spectra/sws/{}_sws.txt".format(TDT))
+    lines = [line.decode() if not isinstance(line, str) else line for line in lines]
+
+    if not os.path.exists(globs.dirIso):
+        os.makedirs(globs.dirIso)
+
+    ds.atomicWrite(filename, lambda f: f.writelines(lines))
+
+    return lines
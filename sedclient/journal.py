@@ -0,0 +1,169 @@
+"""
+    This module keeps a journal of the progress of a run in an SQLite database
+    at globs.journalPath. Each object, source and stage has one row with its
+    status so a run that dies can be restarted, skipping the completed objects
+    and sources and retrying only those that failed or never finished. The
+    journal is disabled when globs.journalPath is None.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from . import globs
+
+# the source and stage used to mark a whole object as finished
+allSources = '*'
+sedStage = 'sed'
+
+conn = {}
+lock = threading.Lock()
+
+def connect():
+    """
+        Opens the journal, creating it if needed. The connection is shared by
+        the threads of a process, a forked worker opens its own as an SQLite
+        connection must not be used across a fork.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                conn : sqlite3 connection
+                The connection to the journal.
+    """
+    key = (os.getpid(), globs.journalPath)
+
+    if key not in conn:
+        db = sqlite3.connect(globs.journalPath, timeout=60, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS journal (name TEXT, source TEXT, stage TEXT, status TEXT, time REAL, PRIMARY KEY (name, source, stage))")
+        db.commit()
+        conn[key] = db
+
+    return conn[key]
+
+def enabled():
+    """
+        Returns True if the journal is in use.
+    """
+    return globs.journalPath is not None
+
+def mark(name, source, stage, status):
+    """
+        Records the status of a stage, the row is committed at once so it
+        survives a crash.
+
+        Parameters
+        ----------
+                name : string
+                The name of the object.
+
+                source : string
+                The cat/survey, or journal.allSources for the whole object.
+
+                stage : string
+                The stage i.e. 'fetch', 'reduce' or 'sed'.
+
+                status : string
+                The status i.e. 'done', 'failed', 'skipped', 'timeout' or
+                'partial'.
+
+        Returns
+        ----------
+                None
+    """
+    with lock:
+        db = connect()
+        db.execute("INSERT OR REPLACE INTO journal VALUES (?, ?, ?, ?, ?)", (name, source, stage, status, time.time()))
+        db.commit()
+
+def status(name, source=allSources, stage=sedStage):
+    """
+        Looks up the status of a stage.
+
+        Parameters
+        ----------
+                name : string
+                The name of the object.
+
+                source : string, optional
+                The cat/survey, defaults to the whole object.
+
+                stage : string, optional
+                The stage, defaults to the whole SED.
+
+        Returns
+        ----------
+                status : string
+                The status or None if the stage was never recorded.
+    """
+    with lock:
+        row = connect().execute("SELECT status FROM journal WHERE name=? AND source=? AND stage=?", (name, source, stage)).fetchone()
+
+    return row[0] if row else None
+
+def isDone(name, source=allSources, stage=sedStage):
+    """
+        Returns True if the stage is done, by default the whole SED.
+    """
+    return status(name, source, stage) in ('done', 'skipped')
+
+def missing(name):
+    """
+        Lists the sources of an object that missed the deadline of their
+        run, see the scheduler module.
+
+        Parameters
+        ----------
+                name : string
+                The name of the object.
+
+        Returns
+        ----------
+                sources : list
+                The cats/surveys marked 'timeout'.
+    """
+    with lock:
+        rows = connect().execute("SELECT source FROM journal WHERE name=? AND status='timeout'", (name,)).fetchall()
+
+    return [row[0] for row in rows]
+
+def summary(names):
+    """
+        Summarises what remains of a run.
+
+        Parameters
+        ----------
+                names : list
+                The names of the objects in the run.
+
+        Returns
+        ----------
+                summary : dictionary
+                Lists of the names that are 'done', 'failed' (a stage failed),
+                'partial' (some stages done) and 'pending' (nothing done).
+    """
+    result = {'done': [], 'failed': [], 'partial': [], 'pending': []}
+
+    with lock:
+        db = connect()
+        for name in names:
+            rows = db.execute("SELECT source, stage, status FROM journal WHERE name=?", (name,)).fetchall()
+            statuses = set(row[2] for row in rows)
+
+            if (allSources, sedStage, 'done') in rows:
+                result['done'].append(name)
+            elif 'failed' in statuses:
+                result['failed'].append(name)
+            elif rows:
+                result['partial'].append(name)
+            else:
+                result['pending'].append(name)
+
+    globs.logger.info("Journal: {} done, {} failed, {} partial, {} pending.".format(*[len(result[k]) for k in ['done', 'failed', 'partial', 'pending']]))
+
+    return result
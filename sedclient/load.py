@@ -7,7 +7,30 @@
 import configparser
 from astropy import units as u
 from uncertainties import ufloat 
-import globs
+from . import globs
+
+def bands():
+    """
+        Builds the list of survey bands from the config files, shared by
+        the fits and the export of the archive.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                bands : list
+                A list of (source, wavelength) tuples sorted by wavelength.
+    """
+    bandList = []
+
+    for source in globs.phSources:
+        conf = configparser.ConfigParser()
+        conf.read("{}{}.ini".format(globs.confPath, source))
+        bandList += [(source, float(w)) for w in conf['reduce']['wave'].split()]
+
+    return sorted(bandList, key=lambda band: band[1])
 
 def loadPh(source):
     """
@@ -28,7 +51,7 @@ def loadPh(source):
                 units.
     """
 
-    conf = configparser.ConfigParser()
+    conf = configparser.ConfigParser(strict=False)
     conf.read("{}{}".format(globs.dirPh, globs.name.replace(' ', '_')))
     
     try:
@@ -49,6 +72,117 @@ def loadPh(source):
 
     return wave, fluxes
 
+def loadFlags(source):
+    """
+        Loads the wavelengths of the photometry flagged as outliers, see
+        outliers.
+
+        Parameters
+        ----------
+                source : string
+                The name of the cat/survey.
+
+        Returns
+        ----------
+                wave : list
+                The flagged wavelengths, empty if there are none.
+    """
+    conf = configparser.ConfigParser(strict=False)
+    conf.read("{}{}".format(globs.dirPh, globs.name.replace(' ', '_')))
+
+    if not conf.has_option(source, 'outliers'):
+        return []
+
+    return [float(w) for w in conf[source]['outliers'].split()]
+
+def loadAsym(source):
+    """
+        Loads the asymmetric errors of the photometry saved by the Monte
+        Carlo error mode, see montecarlo.
+
+        Parameters
+        ----------
+                source : string
+                The name of the cat/survey.
+
+        Returns
+        ----------
+                wave : list
+                The wavelengths of the cat/survey, None if no asymmetric
+                errors were saved.
+
+                errLo : list
+                The lower errors at each of the wavelengths.
+
+                errHi : list
+                The upper errors at each of the wavelengths.
+    """
+    conf = configparser.ConfigParser(strict=False, interpolation=None)
+    conf.read("{}{}".format(globs.dirPh, globs.name.replace(' ', '_')))
+
+    if not conf.has_option(source, 'asym'):
+        return None, None, None
+
+    wave = [float(w) for w in conf[source]['wave'].split()]
+    errVec = [float(e) for e in conf[source]['asym'].split()]
+
+    return wave, errVec[0::2], errVec[1::2]
+
+def loadMeta(name):
+    """
+        Loads the name, coordinates and E(B-V) of an object from the 'meta'
+        section of its photometry file, see dataSave.metaEntries.
+
+        Parameters
+        ----------
+                name : string
+                The name of the object.
+
+        Returns
+        ----------
+                target : dictionary
+                The object, see makeSED.setGlobs, or None if it is not in
+                the archive.
+    """
+    conf = configparser.ConfigParser(strict=False, interpolation=None)
+
+    if not conf.read("{}{}".format(globs.dirPh, name.replace(' ', '_'))) or not conf.has_section('meta'):
+        return None
+
+    meta = conf['meta']
+
+    target = {'name': meta.get('name', name)}
+
+    for key in ['ra', 'dec', 'l', 'b']:
+        value = meta.get(key, 'None')
+        target[key] = None if value in ('', 'None') else float(value)
+
+    if 'ebv' in meta:
+        target['ebv'] = ufloat(float(meta['ebv']), float(meta.get('ebv_err', 0.0)))
+    else:
+        target['ebv'] = None
+
+    return target
+
+def timedOut():
+    """
+        Finds the photometric sources whose queries missed the deadline when
+        the object was last built, see dataSave.saveTimeout.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                sources : list
+                The timed out cats/surveys.
+    """
+    conf = configparser.ConfigParser(strict=False, interpolation=None)
+    conf.read("{}{}".format(globs.dirPh, globs.name.replace(' ', '_')))
+
+    return [source for source in globs.phSources if conf.has_option(source, 'timeout')]
+
 def loadSp(source):
     """
         Loads photometric data from saved data files.
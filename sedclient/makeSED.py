@@ -1,10 +1,15 @@
-from sedclient import sedPlot
-from sedclient import globs
+from . import sedPlot
+from . import globs
+from . import fit
+from . import dataSave
+from . import journal
+from . import profiling
 
 def make():
     """
         The function for building an SED for an object. Takes no inputs as they
-        are taken from the globals 'globs' file.
+        are taken from the globals 'globs' file. If globs.profile is True the
+        build is profiled, see the profiling module.
 
         Parameters
         ----------
@@ -17,6 +22,31 @@ def make():
 
     openLogger()
 
+    SED = profiling.profiled(build, globs.name)
+
+    SED.show()
+
+    if journal.enabled():
+        status = 'partial' if journal.missing(globs.name) else 'done'
+        journal.mark(globs.name, journal.allSources, journal.sedStage, status)
+
+    closeLogger()
+
+def build(save=True):
+    """
+        Builds, plots and saves the SED of the object in globs.
+
+        Parameters
+        ----------
+                save : bool, optional
+                If False the plot is not written to globs.dirSed, only the
+                data are saved.
+
+        Returns
+        ----------
+                SED : sedPlot.Plot
+                The SED.
+    """
     # builds SED skeleton
     SED = sedPlot.Plot()
 
@@ -24,10 +54,11 @@ def make():
     SED.plotPh()
     SED.plotSp()
 
-    # ------------------------------------------- #
-    # space here to call a fitting function and 
-    # return some data to plot on the SED.
-    # ------------------------------------------- #
+    # fits the model grids and plots the best models
+    if globs.fitGrids:
+        fits = fit.fitSED(SED.photo)
+        SED.plotFit(fits)
+        dataSave.saveFit(fits)
 
     # standard annotations; name, ra, dec, ebv
     for annotation in makeAnns():
@@ -35,11 +66,76 @@ def make():
 
     SED.legend()
 
-    SED.saveSed()
+    if save:
+        SED.saveSed()
 
-    SED.show()
+    return SED
 
-    closeLogger()
+def setGlobs(target):
+    """
+        Sets the object in the globs module from a target.
+
+        Parameters
+        ----------
+                target : dictionary
+                The 'name', 'ra', 'dec', 'l', 'b' and 'ebv' (a ufloat) of the
+                object.
+
+        Returns
+        ----------
+                None
+    """
+    for key in ['name', 'ra', 'dec', 'l', 'b', 'ebv']:
+        setattr(globs, key, target[key])
+
+def makeSheet(targets, filename, rows=4, cols=4, fmt='pdf'):
+    """
+        Builds the SEDs for many objects as the tiles of a contact sheet
+        instead of one figure per object.
+
+        Parameters
+        ----------
+                targets : list of dictionaries
+                The objects, see setGlobs.
+
+                filename : string
+                The multi-page pdf, or the base name of the png pages.
+
+                rows : int, optional
+                The number of rows of tiles per page.
+
+                cols : int, optional
+                The number of columns of tiles per page.
+
+                fmt : string, optional
+                Either 'pdf' or 'png'.
+
+        Returns
+        ----------
+                None
+    """
+    from . import sheet
+
+    contact = sheet.Sheet(filename, rows, cols, fmt)
+
+    try:
+        for target in targets:
+            setGlobs(target)
+            openLogger()
+
+            try:
+                SED = sedPlot.Plot(ax=contact.nextTile(globs.name))
+
+                SED.plotPh()
+                SED.plotSp()
+
+                for annotation in plainAnns():
+                    SED.annotate(annotation)
+            finally:
+                closeLogger()
+    finally:
+        # the tiles done so far are written out even if an object fails
+        contact.close()
 
 def makeAnns():
     """
@@ -56,6 +152,9 @@ def makeAnns():
                 The list of the strings that are to be annotated on the plot
                 area.
     """
+    if globs.plainAnns:
+        return plainAnns()
+
     annotations = []
 
     annotations.append("$\\rm{{ {} }}$".format(globs.name))
@@ -65,6 +164,29 @@ def makeAnns():
 
     return annotations
 
+def plainAnns():
+    """
+        Prepares the annotations as plain text so they are not parsed as
+        mathtext, which is faster when rendering many SEDs.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                Anns : list of strings
+                The list of the strings that are to be annotated on the plot
+                area.
+    """
+    annotations = []
+
+    annotations.append(globs.name.replace('$', '\\$'))
+    annotations.append("l={:.3F}\u00b0, b={:.3F}\u00b0".format(globs.l, globs.b))
+    annotations.append("E(B-V)={}\u00b1{} mag".format(globs.ebv.n, globs.ebv.s))
+
+    return annotations
+
 def openLogger():
     """
         Opens a log file for each object.
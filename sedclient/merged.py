@@ -0,0 +1,381 @@
+"""
+    This module merges the photometry and spectroscopy of an object into one
+    index sorted by wavelength so questions such as the flux between 8 and
+    13 microns or the flux at 24 microns are answered with a binary search
+    rather than a scan of every survey. Each point keeps the source it came
+    from. MergedBatch holds many objects as one ragged array sorted by
+    object and wavelength, so a batch of queries over many objects and
+    wavelengths is a single search.
+"""
+
+import numpy as np
+from . import globs
+
+def flatten(data):
+    """
+        Turns a photometry or spectroscopy data structure into arrays.
+
+        Parameters
+        ----------
+                data : dictionary
+                The data structure, see dataStruct.
+
+        Returns
+        ----------
+                wave, flux, err : numpy arrays
+                The wavelengths, fluxes and errors of every point.
+
+                source : list
+                The source of every point.
+    """
+    wave, flux, err, source = [], [], [], []
+
+    for name in sorted(data):
+        if data[name]['flux']:
+            wave += list(data[name]['wave'])
+            flux += [x.value.n for x in data[name]['flux']]
+            err += [x.value.s for x in data[name]['flux']]
+            source += [name] * len(data[name]['flux'])
+
+    return np.array(wave, dtype=float), np.array(flux, dtype=float), np.array(err, dtype=float), source
+
+def interpolate(wave, flux, at, left, right):
+    """
+        Interpolates in log-log between the points either side of each
+        query, nan where there is no point on one side.
+
+        Parameters
+        ----------
+                wave, flux : numpy arrays
+                The sorted points.
+
+                at : numpy array
+                The query wavelengths.
+
+                left, right : numpy arrays
+                The indices of the points either side of each query, from a
+                binary search.
+
+        Returns
+        ----------
+                flux : numpy array
+                The interpolated fluxes.
+    """
+    ok = (left >= 0) & (right >= 0)
+    out = np.full(len(at), np.nan)
+
+    l, r = left[ok], right[ok]
+    x0, x1 = np.log10(wave[l]), np.log10(wave[r])
+    y0, y1 = np.log10(flux[l]), np.log10(flux[r])
+
+    same = x1 == x0
+    frac = np.where(same, 0.0, (np.log10(at[ok]) - x0) / np.where(same, 1.0, x1 - x0))
+
+    out[ok] = 10**(y0 + frac * (y1 - y0))
+
+    return out
+
+class MergedSED:
+    """
+        class for the wavelength sorted index of the data of one object.
+    """
+
+    def __init__(self, photo, spec=None, name=None):
+        """
+            Merges the photometry and spectroscopy data structures, see
+            dataStruct, keeping only the points with a positive flux.
+        """
+        self.name = globs.name if name is None else name
+
+        wave, flux, err, source = flatten(photo)
+
+        if spec:
+            sWave, sFlux, sErr, sSource = flatten(spec)
+            wave, flux, err, source = np.concatenate((wave, sWave)), np.concatenate((flux, sFlux)), np.concatenate((err, sErr)), source + sSource
+
+        self.setArrays(wave, flux, err, source)
+
+    def setArrays(self, wave, flux, err, source):
+        """
+            Sorts the points by wavelength and builds the source tags.
+        """
+        good = np.isfinite(wave) & np.isfinite(flux) & (wave > 0) & (flux > 0)
+        order = np.argsort(wave[good], kind='stable')
+
+        self.sources = sorted(set(source))
+        codes = np.array([self.sources.index(s) for s in source], dtype=int)
+
+        self.wave = wave[good][order]
+        self.flux = flux[good][order]
+        self.err = err[good][order]
+        self.source = codes[good][order] if len(codes) else codes
+
+    def subset(self, sources):
+        """
+            The indices of the points from the given sources, all points if
+            sources is None.
+        """
+        if sources is None:
+            return np.arange(len(self.wave))
+
+        codes = [self.sources.index(s) for s in sources if s in self.sources]
+
+        return np.flatnonzero(np.isin(self.source, codes))
+
+    def range(self, wmin, wmax, sources=None):
+        """
+            Finds the points between two wavelengths.
+
+            Parameters
+            ----------
+                    wmin, wmax : float
+                    The wavelength range in microns, inclusive.
+
+                    sources : list, optional
+                    Only points from these sources.
+
+            Returns
+            ----------
+                    points : dictionary
+                    The 'wave', 'flux', 'err' and 'source' of the points.
+        """
+        lo = np.searchsorted(self.wave, wmin, 'left')
+        hi = np.searchsorted(self.wave, wmax, 'right')
+
+        idx = np.arange(lo, hi)
+        if sources is not None:
+            idx = np.intersect1d(idx, self.subset(sources))
+
+        return {'wave': self.wave[idx], 'flux': self.flux[idx], 'err': self.err[idx], 'source': [self.sources[c] for c in self.source[idx]]}
+
+    def interp(self, wave, sources=None):
+        """
+            Interpolates the flux in log-log at wavelengths.
+
+            Parameters
+            ----------
+                    wave : float or array
+                    The wavelengths in microns.
+
+                    sources : list, optional
+                    Only use points from these sources.
+
+            Returns
+            ----------
+                    flux : numpy array
+                    The fluxes, nan outside the data.
+        """
+        at = np.atleast_1d(np.asarray(wave, dtype=float))
+        idx = self.subset(sources)
+        w, f = self.wave[idx], self.flux[idx]
+
+        right = np.searchsorted(w, at, 'left')
+
+        exact = right < len(w)
+        exact[exact] = w[right[exact]] == at[exact]
+
+        left = np.where(exact, right, right - 1)
+        right = np.where(right < len(w), right, -1)
+
+        return interpolate(w, f, at, left, right)
+
+class MergedBatch:
+    """
+        class for the wavelength sorted index of the data of many objects.
+    """
+
+    def __init__(self, names, wave, flux, err, source, offsets, sources):
+        """
+            Builds the index from a ragged array, the points of object i are
+            wave[offsets[i]:offsets[i + 1]] in any order, and 'source' holds
+            the index in 'sources' of each point.
+        """
+        ids = np.repeat(np.arange(len(names)), np.diff(offsets))
+        good = np.isfinite(wave) & np.isfinite(flux) & (wave > 0) & (flux > 0)
+
+        order = np.lexsort((wave[good], ids[good]))
+
+        self.names = list(names)
+        self.lookup = dict((name, i) for i, name in enumerate(self.names))
+        self.sources = list(sources)
+
+        self.ids = ids[good][order]
+        self.wave = wave[good][order]
+        self.flux = flux[good][order]
+        self.err = err[good][order]
+        self.source = np.asarray(source)[good][order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(self.ids, minlength=len(self.names)))))
+
+        # the object index plus the scaled log wavelength sorts the whole
+        # batch, so one binary search covers every object
+        self.logMin = np.log10(self.wave.min()) if len(self.wave) else 0.0
+        self.logSpan = (np.log10(self.wave.max()) - self.logMin) * 1.000001 + 1e-9 if len(self.wave) else 1.0
+        self.keys = self.key(self.ids, self.wave)
+
+    def key(self, ids, wave):
+        """
+            The sort keys of points or queries.
+        """
+        scaled = np.clip((np.log10(wave) - self.logMin) / self.logSpan, 0.0, 0.999999999)
+
+        return ids + scaled
+
+    def objects(self, names):
+        """
+            The indices of objects from their names or indices.
+        """
+        return np.array([self.lookup[n] if isinstance(n, str) else n for n in np.atleast_1d(names)], dtype=int)
+
+    def rangeIndex(self, names, wmin, wmax):
+        """
+            Finds the points of many objects between wavelengths.
+
+            Parameters
+            ----------
+                    names : array
+                    The names or indices of the objects.
+
+                    wmin, wmax : float or array
+                    The wavelength ranges in microns, inclusive.
+
+            Returns
+            ----------
+                    start, stop : numpy arrays
+                    The slice of the points of each query, i.e.
+                    batch.flux[start[i]:stop[i]].
+        """
+        ids = self.objects(names)
+        wmin = np.broadcast_to(np.asarray(wmin, dtype=float), ids.shape)
+        wmax = np.broadcast_to(np.asarray(wmax, dtype=float), ids.shape)
+
+        start = np.searchsorted(self.keys, self.key(ids, wmin), 'left')
+        stop = np.searchsorted(self.keys, self.key(ids, wmax), 'right')
+
+        # the keys are clipped, so keep to the object
+        start = np.clip(start, self.offsets[ids], self.offsets[ids + 1])
+        stop = np.clip(stop, start, self.offsets[ids + 1])
+
+        return start, stop
+
+    def rangeStats(self, names, wmin, wmax):
+        """
+            The number of points and the maximum and mean flux of many
+            objects between wavelengths, see rangeIndex.
+
+            Returns
+            ----------
+                    stats : dictionary
+                    The 'count', 'max' and 'mean' of each query, nan where
+                    there are no points.
+        """
+        start, stop = self.rangeIndex(names, wmin, wmax)
+        count = stop - start
+
+        # ranges of every query laid out one after another
+        idx = np.repeat(start - np.cumsum(count) + count, count) + np.arange(count.sum())
+        segment = np.repeat(np.arange(len(count)), count)
+
+        total = np.bincount(segment, self.flux[idx], len(count))
+        peak = np.full(len(count), -np.inf)
+        np.maximum.at(peak, segment, self.flux[idx])
+
+        empty = count == 0
+        mean = np.where(empty, np.nan, total / np.maximum(count, 1))
+        peak[empty] = np.nan
+
+        return {'count': count, 'max': peak, 'mean': mean}
+
+    def interp(self, names, wave):
+        """
+            Interpolates the flux in log-log for many objects and
+            wavelengths.
+
+            Parameters
+            ----------
+                    names : array
+                    The names or indices of the objects.
+
+                    wave : float or array
+                    The wavelengths in microns, broadcast against names.
+
+            Returns
+            ----------
+                    flux : numpy array
+                    The fluxes, nan outside the data of the object.
+        """
+        ids = self.objects(names)
+        ids, at = np.broadcast_arrays(ids, np.asarray(wave, dtype=float))
+        ids, at = ids.ravel(), at.ravel()
+
+        q = self.key(ids, at)
+        right = np.searchsorted(self.keys, q, 'left')
+        left = right - 1
+
+        lo, hi = self.offsets[ids], self.offsets[ids + 1]
+
+        exact = (right < hi) & (self.keys[np.minimum(right, len(self.keys) - 1)] == q)
+        left = np.where(exact, right, left)
+
+        left = np.where(left >= lo, left, -1)
+        right = np.where(right < hi, right, -1)
+
+        return interpolate(self.wave, self.flux, at, left, right)
+
+def fromArchive(files=None, spectra=True, chunkSize=10000):
+    """
+        Builds a batch index of the photometry archive and, optionally, the
+        saved spectra.
+
+        Parameters
+        ----------
+                files : list, optional
+                The photometry files, defaults to the whole archive.
+
+                spectra : bool, optional
+                Include the spectra in globs.specSources.
+
+                chunkSize : int, optional
+                The number of objects read at once.
+
+        Returns
+        ----------
+                batch : MergedBatch
+                The index.
+    """
+    import os
+    from . import export
+    from . import resample as rs
+
+    _, bandCols = export.columns()
+    bands = sorted(bandCols.items(), key=lambda item: item[1])
+
+    sources = sorted(set(source for (source, wave) in bandCols) | set(globs.specSources if spectra else []))
+    codes = np.array([sources.index(source) for (source, wave), col in bands], dtype=int)
+    waves = np.array([wave for (source, wave), col in bands])
+
+    names, parts, counts = [], [], []
+
+    for chunk in export.iterChunks(chunkSize, files):
+        cols = chunk.dtype.names
+        flux = np.column_stack([chunk[cols[col]] for band, col in bands])
+        err = np.column_stack([chunk[cols[col + 1]] for band, col in bands])
+
+        for i, name in enumerate(chunk['name']):
+            good = np.isfinite(flux[i])
+            part = [waves[good], flux[i][good], err[i][good], codes[good]]
+
+            for source in (globs.specSources if spectra else []):
+                if os.path.exists("{}{}_{}".format(globs.dirSp, name.replace(' ', '_'), source)):
+                    sWave, sFlux, sErr = rs.loadSpectrum(name, source)
+                    part = [np.concatenate((part[0], sWave)), np.concatenate((part[1], sFlux)), np.concatenate((part[2], sErr)), np.concatenate((part[3], np.full(len(sWave), sources.index(source))))]
+
+            names.append(str(name))
+            parts.append(part)
+            counts.append(len(part[0]))
+
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(int)
+    arrays = [np.concatenate([p[k] for p in parts]) if parts else np.zeros(0) for k in range(4)]
+
+    globs.logger.info("Indexed {} points of {} objects.".format(offsets[-1], len(names)))
+
+    return MergedBatch(names, arrays[0].astype(float), arrays[1].astype(float), arrays[2].astype(float), arrays[3].astype(int), offsets, sources)
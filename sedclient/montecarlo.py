@@ -0,0 +1,227 @@
+"""
+    This module is an alternative to propagating the errors with ufloats. Each
+    data point is drawn globs.mcSamples times from its value and error, the
+    flux zero point and E(B-V) are drawn in the same way, and the samples are
+    pushed through the unit conversion and dereddening as NumPy arrays. The
+    samples are summarised by their percentiles which gives asymmetric errors
+    for the magnitude conversions.
+"""
+
+import numpy as np
+from uncertainties import ufloat
+from astropy import units as u
+from . import unitConversion as uc
+from . import deredden as dr
+from . import globs
+
+percentiles = [15.865, 50.0, 84.135]
+
+extCache = {}
+
+def draw(val, err, n, rng):
+    """
+        Draws samples for an array of values with gaussian errors.
+
+        Parameters
+        ----------
+                val : numpy array
+                The values.
+
+                err : numpy array
+                The errors of the values.
+
+                n : int
+                The number of samples per value.
+
+                rng : numpy random Generator
+                The random number generator.
+
+        Returns
+        ----------
+                samples : numpy array
+                The samples, shape (len(val), n).
+    """
+    val = np.asarray(val, dtype=float)
+    err = np.asarray(err, dtype=float)
+
+    return val[:, None] + err[:, None] * rng.standard_normal((len(val), n))
+
+def cgsFactor(unit, wave):
+    """
+        The factor converting a spectral flux density in 'unit' at 'wave' into
+        erg/s/cm**2, found with the unitConversion module.
+
+        Parameters
+        ----------
+                unit : astropy.units
+                The unit of the spectral flux density.
+
+                wave : float
+                The wavelength in microns.
+
+        Returns
+        ----------
+                factor : float
+                The conversion factor.
+    """
+    return uc.convert(ufloat(1.0, 0.0) * unit, wave).value.n
+
+def extCurve(wave):
+    """
+        The extinction A_lambda / E(B-V) at each wavelength taken from the
+        deredden module.
+
+        Parameters
+        ----------
+                wave : list
+                The wavelengths in microns.
+
+        Returns
+        ----------
+                ext : numpy array
+                A_lambda / E(B-V) at each wavelength.
+    """
+    key = (globs.rv,) + tuple(wave)
+
+    if key not in extCache:
+        extCache[key] = dr.extinction(wave)
+
+    return extCache[key]
+
+def toFlux(samples, wave, units, zero=None, zeroErr=0.0, rng=None):
+    """
+        Converts samples of spectral flux densities or magnitudes into
+        erg/s/cm**2.
+
+        Parameters
+        ----------
+                samples : numpy array
+                The samples, shape (nPoints, nSamples).
+
+                wave : list
+                The wavelengths in microns.
+
+                units : list
+                The astropy unit of each point.
+
+                zero : list, optional
+                The flux at zero magnitude in Jy of each point, needed if
+                any point is a magnitude.
+
+                zeroErr : float, optional
+                The fractional error of the zero points.
+
+                rng : numpy random Generator, optional
+                The random number generator for the zero point samples.
+
+        Returns
+        ----------
+                samples : numpy array
+                The samples in erg/s/cm**2.
+    """
+    samples = np.array(samples, dtype=float)
+
+    isMag = np.array([unit == u.mag for unit in units])
+
+    if isMag.any():
+        if zero is None or len(zero) != len(units):
+            raise ValueError("Magnitudes need a zero point for every point of the source.")
+
+        zeroPt = np.asarray(zero, dtype=float)[isMag][:, None]
+        if zeroErr:
+            zeroPt = zeroPt * (1.0 + zeroErr * rng.standard_normal(samples[isMag].shape))
+        samples[isMag] = zeroPt * 10**(-0.4 * samples[isMag])
+
+    factor = np.array([cgsFactor(u.Jy if mag else unit, w) for unit, w, mag in zip(units, wave, isMag)])
+
+    return samples * factor[:, None]
+
+def dered(samples, wave, ebv, rng):
+    """
+        Dereddens the samples with samples of E(B-V) shared by all points of
+        the object.
+
+        Parameters
+        ----------
+                samples : numpy array
+                The samples in erg/s/cm**2, shape (nPoints, nSamples).
+
+                wave : list
+                The wavelengths in microns.
+
+                ebv : ufloat
+                E(B-V) of the object.
+
+                rng : numpy random Generator
+                The random number generator.
+
+        Returns
+        ----------
+                samples : numpy array
+                The dereddened samples.
+    """
+    ebvSamples = ebv.n + ebv.s * rng.standard_normal(samples.shape[1])
+
+    return samples * 10**(0.4 * extCurve(wave)[:, None] * ebvSamples[None, :])
+
+def summarise(samples):
+    """
+        Summarises the samples by their median and percentiles.
+
+        Parameters
+        ----------
+                samples : numpy array
+                The samples, shape (nPoints, nSamples).
+
+        Returns
+        ----------
+                med : numpy array
+                The median of each point.
+
+                lo : numpy array
+                The lower error of each point.
+
+                hi : numpy array
+                The upper error of each point.
+    """
+    low, med, high = np.percentile(samples, percentiles, axis=1)
+
+    return med, med - low, high - med
+
+def convertFluxes(**kwargs):
+    """
+        The Monte Carlo replacement for download.convertFluxes followed by
+        dereddening. The fluxes are returned as ufloats with the mean of the
+        lower and upper errors so the rest of the client is unchanged, the
+        asymmetric errors are kept in kwargs['errLo'] and kwargs['errHi'],
+        they are saved with the photometry and drawn as its error bars.
+
+        Parameters
+        ----------
+                **kwargs : dictionary
+                A dictionary of the parameters for the data reduction.
+
+        Returns
+        ----------
+                **kwargs : dictionary
+                A dictionary of the parameters for the data reduction.
+    """
+    rng = np.random.default_rng(globs.mcSeed)
+
+    wave = kwargs['wave']
+    fluxes = kwargs['fluxes']
+
+    val = [f.value.n for f in fluxes]
+    err = [f.value.s for f in fluxes]
+    units = [f.unit for f in fluxes]
+
+    samples = draw(val, err, globs.mcSamples, rng)
+    samples = toFlux(samples, wave, units, kwargs['zero'], kwargs.get('zeroErr', 0.0), rng)
+    samples = dered(samples, wave, globs.ebv, rng)
+
+    med, lo, hi = summarise(samples)
+
+    kwargs['fluxes'] = [ufloat(m, (l + h) / 2) * (u.erg/u.s/u.cm**2) for m, l, h in zip(med, lo, hi)]
+    kwargs['errLo'], kwargs['errHi'] = list(lo), list(hi)
+
+    return kwargs
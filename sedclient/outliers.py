@@ -0,0 +1,313 @@
+"""
+    This module finds photometry that is inconsistent with the rest of the
+    SED of an object, i.e. a mis-matched neighbour in one catalogue, which
+    the checks of download.popBad cannot see as they look at each point on
+    its own. The points of every source of an object are merged and sorted
+    by wavelength and each point is compared with the straight line in
+    log-log through its neighbours either side, or the two nearest at the
+    ends. The deviation is measured in units of the error of the point and
+    of the line, with globs.outlierFloor dex added to every point for the
+    calibration of the surveys and globs.outlierCurvature allowed for where
+    the line is extrapolated. A bad point also makes its neighbours deviate,
+    so if any point of an object deviates by more than globs.outlierSigma
+    the outlier is the point whose removal most reduces the deviations of
+    the object, and the object is checked again without it until no point
+    deviates. The archive is checked as ragged arrays, see bolometric, a
+    chunk of objects at a time. The outliers are flagged in the photometry
+    files, not removed, and the plots and fits leave them out if
+    globs.excludeOutliers is set.
+"""
+
+import numpy as np
+from . import globs
+
+dtype = [('name', 'U64'), ('source', 'U32'), ('wave', 'f8'), ('flux', 'f8'), ('err', 'f8'), ('z', 'f8')]
+
+def lines(pos, counts):
+    """
+        The positions within an object of the two points each point is
+        compared with, the neighbours either side or the two nearest at the
+        ends.
+
+        Parameters
+        ----------
+                pos : numpy array
+                The position of each point within its object.
+
+                counts : numpy array
+                The number of points of the object of each point.
+
+        Returns
+        ----------
+                left, right : numpy arrays
+                The positions of the two points.
+    """
+    first, last = pos == 0, pos == counts - 1
+
+    left = np.where(first, 1, np.where(last, counts - 3, pos - 1))
+    right = np.where(first, 2, np.where(last, counts - 2, pos + 1))
+
+    return left, right
+
+def lineDeviation(x, y, sy2, idx, left, right, curvature):
+    """
+        The deviation of points from the straight lines through two others
+        in units of the error, see deviations.
+    """
+    same = x[right] == x[left]
+    frac = np.where(same, 0.5, (x[idx] - x[left]) / np.where(same, 1.0, x[right] - x[left]))
+
+    pred = y[left] + frac * (y[right] - y[left])
+    var = sy2[idx] + (1 - frac)**2 * sy2[left] + frac**2 * sy2[right]
+
+    # an extrapolated line misses the curvature of the SED
+    bend = np.where((frac < 0) | (frac > 1), 0.5 * curvature * (x[idx] - x[left]) * (x[idx] - x[right]), 0.0)
+
+    return (y[idx] - pred) / np.sqrt(var + bend**2)
+
+def deviations(wave, flux, err, offsets, floor=None, curvature=None):
+    """
+        The deviation of each point from the line in log-log through its
+        neighbours, and how much more consistent its object would be
+        without it.
+
+        Parameters
+        ----------
+                wave, flux, err : numpy arrays
+                The wavelengths, positive fluxes and errors of a ragged
+                array sorted by wavelength within each object, see
+                bolometric.merge.
+
+                offsets : numpy array
+                The start of each object and the end of the last.
+
+                floor : float, optional
+                The scatter in dex added to the errors, defaults to
+                globs.outlierFloor.
+
+                curvature : float, optional
+                The curvature in dex per dex**2 allowed for when a line is
+                extrapolated, defaults to globs.outlierCurvature.
+
+        Returns
+        ----------
+                z : numpy array
+                The deviation of each point in units of its error, positive
+                above the line, nan for objects with fewer than three
+                points.
+
+                gain : numpy array
+                The fall in the sum of z**2 over the object if the point is
+                removed.
+    """
+    from . import bolometric as bl
+
+    floor = globs.outlierFloor if floor is None else floor
+    curvature = globs.outlierCurvature if curvature is None else curvature
+
+    ids = bl.segmentIds(offsets)
+    starts = offsets[:-1][ids]
+    counts = np.diff(offsets)[ids]
+    pos = np.arange(len(wave)) - starts
+
+    x, y = np.log10(wave), np.log10(flux)
+    sy2 = (np.abs(err) / (flux * np.log(10)))**2 + floor**2
+
+    z = np.full(len(wave), np.nan)
+    idx = np.flatnonzero(counts >= 3)
+
+    left, right = lines(pos[idx], counts[idx])
+    z[idx] = lineDeviation(x, y, sy2, idx, starts[idx] + left, starts[idx] + right, curvature)
+
+    z2 = np.nan_to_num(z)**2
+    gain = np.zeros(len(wave))
+    gain[idx] = z2[idx]
+
+    # removing a point changes the lines of the two points either side of
+    # it, and of the ends if it is next to them
+    for step in [-2, -1, 1, 2]:
+        near = pos[idx] + step
+        valid = (near >= 0) & (near < counts[idx])
+        k, j = idx[valid], idx[valid] + step
+
+        gain[k] += z2[j]
+
+        after = counts[k] >= 4
+        k, j = k[after], j[after]
+
+        # the positions of the point and its line without k
+        cut = pos[k]
+        pj = pos[j] - (pos[j] > cut)
+        left, right = lines(pj, counts[k] - 1)
+        left, right = left + (left >= cut), right + (right >= cut)
+
+        gain[k] -= lineDeviation(x, y, sy2, j, starts[k] + left, starts[k] + right, curvature)**2
+
+    return z, gain
+
+def detect(wave, flux, err, offsets, sigma=None, floor=None, curvature=None):
+    """
+        Finds the outliers of a ragged array.
+
+        Parameters
+        ----------
+                wave, flux, err, offsets : numpy arrays
+                The sorted ragged array, see deviations.
+
+                sigma : float, optional
+                The threshold in units of the error, defaults to
+                globs.outlierSigma.
+
+                floor, curvature : float, optional
+                See deviations.
+
+        Returns
+        ----------
+                flags : numpy array
+                True for the outliers.
+
+                z : numpy array
+                The deviations, see deviations, of the outliers when they
+                were flagged.
+    """
+    from . import bolometric as bl
+
+    sigma = globs.outlierSigma if sigma is None else sigma
+
+    ids = bl.segmentIds(offsets)
+    nObj = len(offsets) - 1
+
+    flags = np.zeros(len(wave), dtype=bool)
+    z = np.full(len(wave), np.nan)
+
+    # each pass flags one point of every object that has a point deviating
+    # by more than sigma, the point whose removal helps the most
+    while True:
+        active = np.flatnonzero(~flags)
+        sub = np.concatenate(([0], np.cumsum(np.bincount(ids[active], minlength=nObj))))
+
+        curr, gain = deviations(wave[active], flux[active], err[active], sub, floor, curvature)
+        z[active] = curr
+
+        worst = np.zeros(nObj)
+        np.maximum.at(worst, ids[active], np.nan_to_num(np.abs(curr)))
+
+        candidate = (worst[ids[active]] > sigma) & ~np.isnan(curr)
+        score = np.where(candidate, gain, -np.inf)
+
+        best = np.full(nObj, -np.inf)
+        np.maximum.at(best, ids[active], score)
+
+        bad = candidate & (score == best[ids[active]])
+        _, first = np.unique(ids[active][bad], return_index=True)
+
+        if not len(first):
+            return flags, z
+
+        flags[active[np.flatnonzero(bad)[first]]] = True
+
+def check(batch, sigma=None, floor=None, curvature=None):
+    """
+        Finds the outliers of the photometry of a batch of objects.
+
+        Parameters
+        ----------
+                batch : merged.MergedBatch
+                The objects, see merged.fromArchive.
+
+                sigma, floor, curvature : float, optional
+                See detect.
+
+        Returns
+        ----------
+                outliers : numpy structured array
+                The 'name', 'source', 'wave', 'flux', 'err' and deviation
+                'z' of each outlier.
+    """
+    flags, z = detect(batch.wave, batch.flux, batch.err, batch.offsets, sigma, floor, curvature)
+
+    out = np.zeros(flags.sum(), dtype=dtype)
+    out['name'] = np.array(batch.names, dtype='U64')[batch.ids[flags]] if len(out) else []
+    out['source'] = np.array(batch.sources, dtype='U32')[batch.source[flags]] if len(out) else []
+    out['wave'], out['flux'], out['err'], out['z'] = batch.wave[flags], batch.flux[flags], batch.err[flags], z[flags]
+
+    return out
+
+def archive(chunkSize=10000, files=None, save=True, sigma=None, floor=None, curvature=None):
+    """
+        Finds the outliers of every object in the photometry archive and
+        flags them in the photometry files.
+
+        Parameters
+        ----------
+                chunkSize : int, optional
+                The number of objects checked at once.
+
+                files : list, optional
+                The photometry files, defaults to the whole archive.
+
+                save : bool, optional
+                Flag the outliers in the photometry files, replacing any
+                earlier flags of the objects checked.
+
+                sigma, floor, curvature : float, optional
+                See detect.
+
+        Returns
+        ----------
+                outliers : numpy structured array
+                The outliers, see check.
+    """
+    from . import dataSave as ds
+    from . import export
+    from . import merged
+
+    files = export.archiveFiles() if files is None else files
+    tables = []
+
+    for i in range(0, len(files), chunkSize):
+        batch = merged.fromArchive(files[i:i + chunkSize], spectra=False, chunkSize=chunkSize)
+        table = check(batch, sigma, floor, curvature)
+
+        if save:
+            flags = dict((name.replace(' ', '_'), {}) for name in batch.names)
+            for row in table:
+                flags[row['name'].replace(' ', '_')].setdefault(str(row['source']), []).append(float(row['wave']))
+            ds.saveFlags(flags)
+
+        tables.append(table)
+
+    table = np.concatenate(tables) if tables else np.zeros(0, dtype=dtype)
+
+    globs.logger.info("Found {} outliers in {} objects.".format(len(table), len(files)))
+
+    return table
+
+def exclude(photo):
+    """
+        Removes the flagged outliers from the photometry of globs.name.
+
+        Parameters
+        ----------
+                photo : dictionary
+                The photometry, see dataStruct.buildPhStruct.
+
+        Returns
+        ----------
+                photo : dictionary
+                A copy without the outliers.
+    """
+    from . import load
+
+    out = {}
+
+    for source in photo:
+        out[source] = dict(photo[source])
+        flagged = load.loadFlags(source)
+
+        if flagged and photo[source]['flux']:
+            keep = [k for k, w in enumerate(photo[source]['wave']) if not np.isclose(w, flagged).any()]
+            out[source]['wave'] = [photo[source]['wave'][k] for k in keep]
+            out[source]['flux'] = [photo[source]['flux'][k] for k in keep]
+
+    return out
@@ -0,0 +1,239 @@
+"""
+    This module parses the raw csv output of vizquery into NumPy structured
+    arrays. Each line of the output is split once, the header and unit lines
+    are detected along with comments and separators, and the surviving rows are
+    typed using the data types given in the survey config files. Selection
+    policies i.e. nearest, brightest or all within a radius are then applied to
+    the structured array.
+"""
+
+import numpy as np
+
+comment = '#'
+separator = '---'
+
+def dataRows(lines, exclude=None):
+    """
+        Walks the raw output of a query once and yields the data rows split
+        into their fields. Comments, blank lines, header lines, unit lines and
+        separators are skipped. Rows whose first field contains any of the
+        strings in 'exclude' are also skipped.
+
+        Parameters
+        ----------
+                lines : list
+                A list of lines of output from the query.
+
+                exclude : list, optional
+                A list of strings that mark a row as not being data.
+
+        Returns
+        ----------
+                rows : generator
+                Yields tuples of (block, header, fields) where block is the
+                index of the result block the row belongs to (one block per
+                queried object), header is the list of column names for that
+                block and fields is the list of strings of the row.
+    """
+    exclude = exclude or []
+
+    block = -1
+    header = None
+    inData = False
+
+    for line in lines:
+        if not isinstance(line, str):
+            line = line.decode()
+
+        line = line.rstrip('\r\n')
+
+        if not line.strip() or line.startswith(comment):
+            if inData or header is None:
+                inData = False
+                header = None
+            continue
+
+        fields = line.split(';')
+        first = fields[0]
+
+        if separator in first:
+            inData = True
+            continue
+
+        if not inData:
+            if header is None:
+                header = [f.strip() for f in fields]
+                block += 1
+            continue
+
+        excluded = False
+        for ele in exclude:
+            if ele in first:
+                excluded = True
+                break
+
+        if not excluded:
+            yield block, header, fields
+
+def fieldNames(header, nCols):
+    """
+        Builds a list of unique field names for the structured array from the
+        header line of the query output.
+
+        Parameters
+        ----------
+                header : list
+                The column names from the header line, may be None.
+
+                nCols : int
+                The number of columns required.
+
+        Returns
+        ----------
+                names : list
+                A list of unique field names.
+    """
+    header = header or []
+    names = []
+
+    for i in range(nCols):
+        name = header[i] if i < len(header) and header[i] else "f{}".format(i)
+        while name in names or name == 'block':
+            name = "{}_{}".format(name, i)
+        names.append(name)
+
+    return names
+
+def toDtype(val_type, width):
+    """
+        Converts a python type from the survey config into a NumPy dtype.
+
+        Parameters
+        ----------
+                val_type : type
+                The python type i.e. float, int or str.
+
+                width : int
+                The width needed for string columns.
+
+        Returns
+        ----------
+                dtype : string
+                The NumPy dtype string.
+    """
+    if val_type is float:
+        return 'f8'
+    if val_type is int:
+        return 'i8'
+
+    return 'U{}'.format(max(width, 1))
+
+def parse(lines, types, exclude=None):
+    """
+        Parses the full output of a query into a typed structured array in one
+        pass. Empty numeric fields become nan (or 0 for integers).
+
+        Parameters
+        ----------
+                lines : list
+                A list of lines of output from the query.
+
+                types : list
+                A list of the python types of each column as given in the
+                'types' entry of the survey config.
+
+                exclude : list, optional
+                A list of strings that mark a row as not being data.
+
+        Returns
+        ----------
+                table : numpy structured array
+                The typed data with an extra 'block' field giving the index of
+                the queried object each row belongs to.
+    """
+    rows = list(dataRows(lines, exclude))
+
+    nCols = len(types)
+    header = rows[0][1] if rows else None
+    names = fieldNames(header, nCols)
+
+    columns = list(zip(*[fields[:nCols] + [''] * (nCols - len(fields)) for _, _, fields in rows])) or [()] * nCols
+
+    dtype = [('block', 'i4')]
+    for name, val_type, col in zip(names, types, columns):
+        width = max([len(c) for c in col]) if col else 1
+        dtype.append((name, toDtype(val_type, width)))
+
+    table = np.zeros(len(rows), dtype=dtype)
+    table['block'] = [block for block, _, _ in rows]
+
+    for (name, kind), col in zip(dtype[1:], columns):
+        if not col:
+            continue
+        if kind == 'f8':
+            table[name] = [float(c) if c.strip() else np.nan for c in col]
+        elif kind == 'i8':
+            table[name] = [int(c) if c.strip() else 0 for c in col]
+        else:
+            table[name] = col
+
+    return table
+
+def select(table, policy='nearest', column=None, radius=None, mag=True):
+    """
+        Applies a selection policy to a parsed table. Policies are applied per
+        block so batched multi-object results select per object.
+
+        Parameters
+        ----------
+                table : numpy structured array
+                The table returned by 'parse'.
+
+                policy : string, optional
+                One of 'nearest', 'brightest' or 'radius'. Without a numeric
+                '_r' column 'nearest' keeps the first row of each block.
+
+                column : string, optional
+                The numeric column used to judge brightness for the
+                'brightest' policy.
+
+                radius : float, optional
+                The maximum distance '_r' kept by the 'radius' policy.
+
+                mag : bool, optional
+                If True the brightest is the smallest value of 'column'
+                (magnitudes) otherwise the largest (fluxes).
+
+        Returns
+        ----------
+                table : numpy structured array
+                The selected rows of the table.
+    """
+    if not len(table):
+        return table
+
+    names = table.dtype.names
+
+    numeric = [name for name in names if table.dtype[name].kind in 'fi']
+
+    if policy == 'radius':
+        if '_r' not in numeric:
+            raise ValueError("'radius' selection requires a numeric '_r' column.")
+        return table[table['_r'] <= radius]
+
+    if policy == 'nearest':
+        key = table['_r'].astype(float) if '_r' in numeric else np.arange(len(table), dtype=float)
+    elif policy == 'brightest':
+        if column not in numeric:
+            raise ValueError("'brightest' selection requires a numeric column.")
+        key = table[column].astype(float) if mag else -table[column].astype(float)
+    else:
+        raise ValueError("Unknown selection policy '{}'.".format(policy))
+
+    key = np.where(np.isnan(key), np.inf, key)
+    order = np.lexsort((key, table['block']))
+    blocks = table['block'][order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = blocks[1:] != blocks[:-1]
+
+    return table[order[first]]
@@ -0,0 +1,282 @@
+"""
+    This module builds SEDs for many objects as a streaming pipeline so the
+    network, the data reduction and the rendering overlap. There are three
+    stages joined by bounded queues which give backpressure:
+
+        fetch  - threads running the catalogue queries and ISO downloads.
+        reduce - processes converting, dereddening and saving the raw data.
+        render - processes plotting and saving the SEDs.
+
+    The reduce and render stages run in their own processes because they set
+    the object in the globs module. Completed objects are yielded by 'run' as
+    they finish.
+"""
+
+import threading
+import concurrent.futures as cf
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+from . import download as dw
+from . import dataSave as ds
+from . import profiling
+from . import journal as jr
+from . import coverage as cv
+from . import globs
+
+done = object()
+
+def fetch(target, covered=None):
+    """
+        Runs the catalogue queries for an object and downloads its spectrum.
+
+        Parameters
+        ----------
+                target : dictionary
+                The object, see makeSED.setGlobs.
+
+                covered : dictionary, optional
+                Whether the object may be in each source, see
+                coverage.coverTargets, checked here if not given.
+
+        Returns
+        ----------
+                raw : dictionary
+                The raw output of the query for each photometric source and
+                the raw spectrum for each spectroscopic source.
+    """
+    obj = "{} {}".format(target['ra'], target['dec'])
+
+    if covered is None:
+        covered = next(cv.coverTargets([target]))[1]
+
+    raw = {}
+    for source in globs.phSources:
+        if covered[source]:
+            raw[source] = dw.query(dw.queryParams(source, obj))
+        else:
+            globs.logger.info("{} skipped for {}, the position is outside its coverage.".format(source, target['name']))
+            raw[source] = []
+    for source in globs.specSources:
+        if covered[source]:
+            raw[source] = dw.fetchSp(source, target['ra'], target['dec'])
+        else:
+            raw[source] = None
+
+    return raw
+
+def reduceRaw(target, raw):
+    """
+        Reduces and saves the raw data of an object, run in a worker process.
+
+        Parameters
+        ----------
+                target : dictionary
+                The object, see makeSED.setGlobs.
+
+                raw : dictionary
+                The raw data returned by fetch.
+
+        Returns
+        ----------
+                None
+    """
+    from . import makeSED
+
+    makeSED.setGlobs(target)
+    makeSED.openLogger()
+
+    def reduce():
+        for source in globs.phSources:
+            dw.reducePh(source, raw[source])
+        for source in globs.specSources:
+            dw.reduceSp(source, raw[source])
+
+    profiling.profiled(reduce, "{} reduce".format(target['name']))
+
+    # a worker process exits without running atexit, so nothing is left
+    # pending by a batched save
+    ds.flush()
+
+    if jr.enabled():
+        for source in globs.phSources + globs.specSources:
+            jr.mark(target['name'], source, 'reduce', 'done')
+
+    makeSED.closeLogger()
+
+def render(target):
+    """
+        Plots and saves the SED of an object from its saved data, run in a
+        worker process.
+
+        Parameters
+        ----------
+                target : dictionary
+                The object, see makeSED.setGlobs.
+
+        Returns
+        ----------
+                None
+    """
+    from . import makeSED
+    from . import sedPlot
+    import matplotlib.pyplot as plt
+
+    makeSED.setGlobs(target)
+    makeSED.openLogger()
+
+    def plot():
+        SED = sedPlot.Plot(stored=True)
+        SED.plotPh()
+        SED.plotSp()
+
+        for annotation in makeSED.makeAnns():
+            SED.annotate(annotation)
+
+        SED.legend()
+        SED.saveSed()
+
+        if not globs.reuseFigure:
+            plt.close(SED.fig)
+
+    profiling.profiled(plot, "{} render".format(target['name']))
+
+    if jr.enabled():
+        jr.mark(target['name'], jr.allSources, jr.sedStage, 'done')
+
+    makeSED.closeLogger()
+
+class Stage:
+    """
+        class for a stage of the pipeline, a pool of worker threads taking
+        items from one queue and putting the results on the next.
+    """
+
+    def __init__(self, name, func, workers, inQueue, outQueue, pool=None):
+        """
+            Starts the worker threads. If 'pool' is given the work is
+            submitted to it, i.e. a process pool, and the threads wait on the
+            results.
+        """
+        self.name = name
+        self.func = func
+        self.inQueue = inQueue
+        self.outQueue = outQueue
+        self.pool = pool
+
+        self.running = workers
+        self.lock = threading.Lock()
+
+        self.threads = [threading.Thread(target=self.work) for i in range(workers)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def work(self):
+        """
+            Processes items until the end of the stream is reached.
+        """
+        while True:
+            item = self.inQueue.get()
+
+            if item is done:
+                self.inQueue.put(done)
+                with self.lock:
+                    self.running -= 1
+                    if self.running == 0:
+                        self.outQueue.put(done)
+                return
+
+            target, args, error = item
+
+            if error is None:
+                try:
+                    if self.pool:
+                        result = self.pool.submit(self.func, target, *args).result()
+                    else:
+                        result = self.func(target, *args)
+                    args = (result,) if result is not None else ()
+                except Exception as e:
+                    globs.logger.error("{} stage failed for {}: {}".format(self.name, target['name'], e))
+                    error = (self.name, e)
+
+            self.outQueue.put((target, args, error))
+
+def feed(targets, outQueue):
+    """
+        Puts the targets on the first queue of the pipeline with their
+        coverage, skipping those the journal records as done.
+    """
+    if jr.enabled():
+        targets = (target for target in targets if not jr.isDone(target['name']))
+
+    for target, covered in cv.coverTargets(targets):
+        outQueue.put((target, (covered,), None))
+
+    outQueue.put(done)
+
+def run(targets, nFetch=8, nReduce=2, nRender=1, depth=16):
+    """
+        Builds the SEDs of many objects as a streaming pipeline.
+
+        Parameters
+        ----------
+                targets : iterable of dictionaries
+                The objects, see makeSED.setGlobs.
+
+                nFetch : int, optional
+                The number of fetch threads.
+
+                nReduce : int, optional
+                The number of reduce processes.
+
+                nRender : int, optional
+                The number of render processes.
+
+                depth : int, optional
+                The size of the queues between the stages.
+
+        Returns
+        ----------
+                results : generator
+                Yields a dictionary with the 'name' of each object as it
+                completes, with the 'stage' and 'error' if it failed. If
+                globs.profile is True the profiles of the batch are reported
+                at the end, see profiling.report.
+    """
+    queues = [queue.Queue(depth) for i in range(4)]
+
+    reducePool = cf.ProcessPoolExecutor(nReduce)
+    renderPool = cf.ProcessPoolExecutor(nRender)
+
+    try:
+        Stage('fetch', fetch, nFetch, queues[0], queues[1])
+        Stage('reduce', reduceRaw, nReduce, queues[1], queues[2], reducePool)
+        Stage('render', render, nRender, queues[2], queues[3], renderPool)
+
+        feeder = threading.Thread(target=feed, args=(targets, queues[0]))
+        feeder.daemon = True
+        feeder.start()
+
+        names = []
+
+        while True:
+            item = queues[3].get()
+            if item is done:
+                break
+
+            target, args, error = item
+            names.append(target['name'])
+
+            result = {'name': target['name']}
+            if error is not None:
+                result['stage'], result['error'] = error
+
+            yield result
+
+        if globs.profile:
+            profiling.report(["{} {}".format(name, stage) for name in names for stage in ['reduce', 'render']])
+    finally:
+        reducePool.shutdown()
+        renderPool.shutdown()
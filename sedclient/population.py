@@ -0,0 +1,211 @@
+"""
+    This module plots the SEDs of a whole population at once. The photometry
+    archive is streamed in chunks (see export.iterChunks) and every point is
+    added to a 2D histogram of log wavelength against log lambda F_lambda,
+    one layer per survey, so the memory used does not depend on the number of
+    objects. The bins may instead be coloured by the mean of a metadata
+    column, i.e. 'ebv' or 'b'. A single object can be drawn on top of the
+    population with sedPlot.Plot.
+"""
+
+import configparser
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import LinearSegmentedColormap, LogNorm, to_rgba
+from . import export
+from . import sedPlot
+from . import globs
+
+class Population:
+    """
+        class for building population density SEDs.
+    """
+
+    def __init__(self, waveRange=(0.1, 1000.0), fluxRange=(1e-16, 1e-6), bins=(200, 150), colourBy=None):
+        """
+            Sets up the empty histograms.
+
+            Parameters
+            ----------
+                    waveRange : tuple, optional
+                    The wavelength range in microns.
+
+                    fluxRange : tuple, optional
+                    The lambda F_lambda range in erg/s/cm**2.
+
+                    bins : tuple, optional
+                    The number of wavelength and flux bins.
+
+                    colourBy : string, optional
+                    A numeric metadata column, see export.metaColumns, whose
+                    mean in each bin colours the plot.
+        """
+        self.waveEdges = np.logspace(np.log10(waveRange[0]), np.log10(waveRange[1]), bins[0] + 1)
+        self.fluxEdges = np.logspace(np.log10(fluxRange[0]), np.log10(fluxRange[1]), bins[1] + 1)
+        self.colourBy = colourBy
+
+        _, self.bandCols = export.columns()
+
+        self.counts = {}
+        self.colourSum = {}
+        self.objects = 0
+
+        self.fig, self.ax = None, None
+
+    def add(self, chunk):
+        """
+            Adds a chunk of the wide table to the histograms.
+        """
+        names = chunk.dtype.names
+
+        for (source, wave), col in self.bandCols.items():
+            flux = chunk[names[col]]
+            good = np.isfinite(flux) & (flux > 0)
+
+            if not good.any():
+                continue
+
+            if source not in self.counts:
+                self.counts[source] = np.zeros((len(self.waveEdges) - 1, len(self.fluxEdges) - 1))
+                self.colourSum[source] = np.zeros_like(self.counts[source])
+
+            waves = np.full(good.sum(), wave)
+
+            counts, _, _ = np.histogram2d(waves, flux[good], [self.waveEdges, self.fluxEdges])
+            self.counts[source] += counts
+
+            if self.colourBy:
+                meta = chunk[self.colourBy][good]
+                ok = np.isfinite(meta)
+                total, _, _ = np.histogram2d(waves[ok], flux[good][ok], [self.waveEdges, self.fluxEdges], weights=meta[ok])
+                self.colourSum[source] += total
+
+        self.objects += len(chunk)
+
+    def accumulate(self, chunkSize=10000, files=None):
+        """
+            Streams the photometry archive into the histograms.
+
+            Parameters
+            ----------
+                    chunkSize : int, optional
+                    The number of objects read at once.
+
+                    files : list, optional
+                    The photometry files, defaults to the whole archive.
+
+            Returns
+            ----------
+                    None
+        """
+        for chunk in export.iterChunks(chunkSize, files):
+            self.add(chunk)
+
+        globs.logger.info("Accumulated the photometry of {} objects.".format(self.objects))
+
+    def plot(self, sources=None, layers=True, ax=None):
+        """
+            Draws the histograms.
+
+            Parameters
+            ----------
+                    sources : list, optional
+                    The surveys to draw, defaults to all of them.
+
+                    layers : bool, optional
+                    If True each survey is drawn as its own layer in the
+                    colour of its plot config, otherwise the surveys are
+                    summed. Ignored when colouring by metadata.
+
+                    ax : matplotlib axes, optional
+                    The axes to draw on, defaults to a new figure.
+
+            Returns
+            ----------
+                    None
+        """
+        if ax is None:
+            self.fig, self.ax = sedPlot.newAxes()
+        else:
+            self.fig, self.ax = ax.figure, ax
+
+        sources = [source for source in (sources or sorted(self.counts)) if source in self.counts]
+
+        if not sources:
+            return
+
+        counts = sum(self.counts[source] for source in sources)
+
+        if self.colourBy:
+            colourSum = sum(self.colourSum[source] for source in sources)
+            mean = np.ma.masked_where(counts == 0, colourSum / np.maximum(counts, 1))
+            mesh = self.ax.pcolormesh(self.waveEdges, self.fluxEdges, mean.T, cmap='viridis', rasterized=True)
+            self.fig.colorbar(mesh, ax=self.ax, label=self.colourBy)
+        elif layers:
+            for source in sources:
+                conf = configparser.ConfigParser()
+                conf.read("{}{}.ini".format(globs.confPath, source))
+                colour = to_rgba(conf['plot']['mec'])
+                cmap = LinearSegmentedColormap.from_list(source, [colour[:3] + (0.0,), colour[:3] + (1.0,)])
+                layer = np.ma.masked_equal(self.counts[source], 0)
+                self.ax.pcolormesh(self.waveEdges, self.fluxEdges, layer.T, cmap=cmap, norm=LogNorm(vmin=1, vmax=max(layer.max(), 1)), rasterized=True)
+                self.ax.plot([], [], 's', color=colour, label=conf['plot']['label'])
+        else:
+            mesh = self.ax.pcolormesh(self.waveEdges, self.fluxEdges, np.ma.masked_equal(counts, 0).T, cmap='Greys', norm=LogNorm(vmin=1), rasterized=True)
+            self.fig.colorbar(mesh, ax=self.ax, label='N')
+
+        self.ax.set_xlim(self.waveEdges[0], self.waveEdges[-1])
+        self.ax.set_ylim(self.fluxEdges[0], self.fluxEdges[-1])
+
+    def overplot(self, name):
+        """
+            Draws the SED of one object from the archive on top of the
+            population, the position and E(B-V) are those saved with it.
+
+            Parameters
+            ----------
+                    name : string
+                    The name of the object.
+
+            Returns
+            ----------
+                    SED : sedPlot.Plot
+                    The SED of the object.
+        """
+        from . import load
+        from . import makeSED
+
+        target = load.loadMeta(name)
+
+        if target is None:
+            raise ValueError("{} is not in the photometry archive.".format(name))
+
+        makeSED.setGlobs(target)
+
+        SED = sedPlot.Plot(ax=self.ax, stored=True)
+        SED.annSize = 14
+
+        SED.plotPh()
+        SED.plotSp()
+        SED.annotate(name)
+
+        return SED
+
+    def legend(self):
+        """
+            Displays the legend.
+        """
+        self.ax.legend(loc='lower right', bbox_to_anchor=(0.99, 0.01), fancybox=False, shadow=False, ncol=4, numpoints=1, prop={'size':6.5})
+
+    def save(self, filename):
+        """
+            Saves the population plot.
+        """
+        self.fig.savefig(filename, transparent=True, bbox_inches='tight')
+        globs.logger.info("Population SED of {} objects saved as {}.".format(self.objects, filename))
+
+    def show(self):
+        """
+            Shows the figure.
+        """
+        plt.show()
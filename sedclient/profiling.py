@@ -0,0 +1,158 @@
+"""
+    This module profiles the building of SEDs. Each build is run under
+    cProfile and tracemalloc and the results are written next to the log file
+    of the object in globs.dirLog:
+
+        <name>.prof     - the cProfile dump, readable with pstats.
+        <name>.mem      - the peak memory and the top allocation sites.
+
+    The batch drivers profile each object in their worker processes, the
+    reduce and render stages under '<name> reduce' and '<name> render', and
+    'report' aggregates the dumps of a batch into a single report. Nothing in
+    this module runs unless globs.profile is True.
+"""
+
+import cProfile
+import os
+import pstats
+import tracemalloc
+from . import globs
+
+def run(func, name):
+    """
+        Runs a function under cProfile and tracemalloc and writes the profile
+        and the top allocation sites.
+
+        Parameters
+        ----------
+                func : function
+                The function to profile, called without arguments.
+
+                name : string
+                The name the profile is saved under, the name of the object
+                or of the object and stage.
+
+        Returns
+        ----------
+                result : object
+                The return value of func.
+    """
+    base = "{}{}".format(globs.dirLog, name.replace(' ', '_'))
+
+    # a caller already tracing keeps its tracing
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+
+    prof = cProfile.Profile()
+
+    prof.enable()
+    try:
+        result = func()
+    finally:
+        prof.disable()
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+        current, peak = tracemalloc.get_traced_memory()
+        if started:
+            tracemalloc.stop()
+
+        prof.dump_stats("{}.prof".format(base))
+
+        with open("{}.mem".format(base), 'w') as memFile:
+            memFile.write("peak={}\n".format(peak))
+            for stat in snapshot.statistics('lineno')[:globs.profileTop]:
+                memFile.write("{}\n".format(stat))
+
+        globs.logger.info("Profile of {} written to {}.prof, peak memory {:.1F} MB.".format(name, base, peak / 1e6))
+
+    return result
+
+def profiled(func, name):
+    """
+        Runs a function, under run if globs.profile is True.
+
+        Parameters
+        ----------
+                func : function
+                The function to run, called without arguments.
+
+                name : string
+                The name the profile is saved under.
+
+        Returns
+        ----------
+                result : object
+                The return value of func.
+    """
+    if globs.profile:
+        return run(func, name)
+
+    return func()
+
+def peakMemory(filename):
+    """
+        Reads the peak memory from a .mem file.
+
+        Parameters
+        ----------
+                filename : string
+                The .mem file.
+
+        Returns
+        ----------
+                peak : int
+                The peak memory in bytes.
+    """
+    with open(filename, 'r') as memFile:
+        return int(memFile.readline().split('=')[1])
+
+def report(names=None, filename=None):
+    """
+        Aggregates the profiles of a batch into one report of the functions
+        with the most cumulative time and the objects with the largest peak
+        memory.
+
+        Parameters
+        ----------
+                names : list, optional
+                The names of the objects, defaults to all profiled objects.
+
+                filename : string, optional
+                The report file, defaults to profile_report.txt in
+                globs.dirLog.
+
+        Returns
+        ----------
+                None
+    """
+    if names is None:
+        bases = [f[:-5] for f in os.listdir(globs.dirLog) if f.endswith('.prof')]
+    else:
+        bases = [name.replace(' ', '_') for name in names]
+
+    bases = [b for b in bases if os.path.exists("{}{}.prof".format(globs.dirLog, b))]
+
+    if not bases:
+        globs.logger.warning("No profiles found to report.")
+        return
+
+    filename = filename or "{}profile_report.txt".format(globs.dirLog)
+
+    with open(filename, 'w') as out:
+        stats = pstats.Stats(*["{}{}.prof".format(globs.dirLog, b) for b in bases], stream=out)
+
+        out.write("Aggregated profile of {} objects\n\n".format(len(bases)))
+        stats.sort_stats('cumulative').print_stats(globs.profileTop)
+        stats.sort_stats('tottime').print_stats(globs.profileTop)
+
+        peaks = []
+        for b in bases:
+            memName = "{}{}.mem".format(globs.dirLog, b)
+            if os.path.exists(memName):
+                peaks.append((peakMemory(memName), b))
+
+        out.write("Largest peak memory\n\n")
+        for peak, b in sorted(peaks, reverse=True)[:globs.profileTop]:
+            out.write("{:>12.1F} MB  {}\n".format(peak / 1e6, b))
+
+    globs.logger.info("Profile report of {} objects written to {}.".format(len(bases), filename))
@@ -0,0 +1,323 @@
+"""
+    This module rebins many spectra onto a common logarithmic wavelength grid
+    so they can be compared and stacked as one array. The rebinning conserves
+    the flux, each bin is the mean of lambda F_lambda over its width in
+    ln(lambda), which is the integral of F_lambda over the bin, and the errors
+    are propagated assuming independent points. A sample of spectra becomes a
+    masked 2D array of shape (objects, bins), masked where a spectrum does not
+    cover a bin, which can be written to .npy files as it is built so the
+    memory used does not depend on the size of the sample. Composite spectra
+    are computed from it a block of bins at a time.
+"""
+
+import os
+import numpy as np
+from . import globs
+
+def logGrid(wmin, wmax, nbins):
+    """
+        Builds a logarithmic wavelength grid.
+
+        Parameters
+        ----------
+                wmin : float
+                The lower edge of the grid in microns.
+
+                wmax : float
+                The upper edge of the grid in microns.
+
+                nbins : int
+                The number of bins.
+
+        Returns
+        ----------
+                edges : numpy array
+                The nbins + 1 edges of the bins.
+
+                centres : numpy array
+                The geometric centres of the bins.
+    """
+    edges = np.logspace(np.log10(wmin), np.log10(wmax), nbins + 1)
+
+    return edges, np.sqrt(edges[1:] * edges[:-1])
+
+def rebin(wave, flux, err, edges):
+    """
+        Rebins a spectrum onto a wavelength grid conserving the flux.
+
+        Parameters
+        ----------
+                wave : numpy array
+                The wavelengths of the spectrum in microns.
+
+                flux : numpy array
+                The fluxes, lambda F_lambda.
+
+                err : numpy array
+                The errors of the fluxes.
+
+                edges : numpy array
+                The edges of the bins, see logGrid.
+
+        Returns
+        ----------
+                flux : numpy array
+                The flux in each bin.
+
+                err : numpy array
+                The error of the flux in each bin.
+
+                mask : numpy array
+                True where the bin is not covered by the spectrum.
+    """
+    good = np.isfinite(wave) & np.isfinite(flux) & (wave > 0)
+    order = np.argsort(wave[good], kind='stable')
+
+    x = np.log(wave[good][order])
+    y = flux[good][order]
+    e = np.nan_to_num(err[good][order])
+
+    nbins = len(edges) - 1
+    logEdges = np.log(edges)
+
+    if len(x) < 2:
+        return np.zeros(nbins), np.zeros(nbins), np.ones(nbins, dtype=bool)
+
+    # cumulative integral of the flux over ln(lambda) evaluated at the edges
+    cumulative = np.concatenate(([0.0], np.cumsum(0.5 * (y[1:] + y[:-1]) * np.diff(x))))
+    inside = np.clip(logEdges, x[0], x[-1])
+    width = np.diff(logEdges)
+
+    binFlux = np.diff(np.interp(inside, x, cumulative)) / width
+
+    # each point stands for the ln(lambda) interval between its neighbours
+    mid = np.concatenate(([x[0]], 0.5 * (x[1:] + x[:-1]), [x[-1]]))
+    weight = np.diff(mid)
+    index = np.searchsorted(logEdges, x, 'right') - 1
+    used = (index >= 0) & (index < nbins)
+
+    wsum = np.bincount(index[used], weight[used], nbins)
+    var = np.bincount(index[used], (weight[used] * e[used])**2, nbins)
+
+    binErr = np.interp(0.5 * (logEdges[1:] + logEdges[:-1]), x, e)
+    filled = wsum > 0
+    binErr[filled] = np.sqrt(var[filled]) / wsum[filled]
+
+    mask = (logEdges[:-1] < x[0]) | (logEdges[1:] > x[-1])
+    binFlux[mask] = 0.0
+    binErr[mask] = 0.0
+
+    return binFlux, binErr, mask
+
+def spectrumFiles(source='iso'):
+    """
+        Lists the objects with a spectrum from a source.
+
+        Parameters
+        ----------
+                source : string, optional
+                The spectroscopic cat/survey.
+
+        Returns
+        ----------
+                names : list
+                A sorted list of the names of the objects, as in the file
+                names.
+    """
+    suffix = "_{}".format(source)
+
+    return sorted(f[:-len(suffix)] for f in os.listdir(globs.dirSp) if f.endswith(suffix) and os.path.getsize(os.path.join(globs.dirSp, f)))
+
+def loadSpectrum(name, source='iso'):
+    """
+        Reads a saved spectrum as arrays without building the ufloats of
+        load.loadSp.
+
+        Parameters
+        ----------
+                name : string
+                The name of the object.
+
+                source : string, optional
+                The spectroscopic cat/survey.
+
+        Returns
+        ----------
+                wave, flux, err : numpy arrays
+                The wavelengths, fluxes and errors.
+    """
+    data = np.loadtxt("{}{}_{}".format(globs.dirSp, name.replace(' ', '_'), source), delimiter=',', ndmin=2)
+
+    if not data.size:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+
+    return data[:, 0], data[:, 1], data[:, 2]
+
+def stack(names, edges, source='iso', filename=None):
+    """
+        Rebins the spectra of many objects onto a common grid.
+
+        Parameters
+        ----------
+                names : list
+                The names of the objects, see spectrumFiles.
+
+                edges : numpy array
+                The edges of the bins, see logGrid.
+
+                source : string, optional
+                The spectroscopic cat/survey.
+
+                filename : string, optional
+                If given the stack is written to {filename}_flux.npy and
+                {filename}_err.npy one spectrum at a time and memory mapped,
+                with the masked bins set to NaN.
+
+        Returns
+        ----------
+                flux : numpy masked array
+                The rebinned fluxes, shape (objects, bins).
+
+                err : numpy masked array
+                The errors of the rebinned fluxes.
+    """
+    from numpy.lib.format import open_memmap
+
+    shape = (len(names), len(edges) - 1)
+
+    if filename:
+        flux = open_memmap("{}_flux.npy".format(filename), mode='w+', dtype='f8', shape=shape)
+        err = open_memmap("{}_err.npy".format(filename), mode='w+', dtype='f8', shape=shape)
+    else:
+        flux = np.empty(shape)
+        err = np.empty(shape)
+
+    for i, name in enumerate(names):
+        flux[i], err[i], mask = rebin(*loadSpectrum(name, source), edges=edges)
+        flux[i, mask] = np.nan
+        err[i, mask] = np.nan
+
+    if filename:
+        flux.flush()
+        err.flush()
+
+    globs.logger.info("Stacked {} {} spectra on {} bins.".format(shape[0], source, shape[1]))
+
+    return np.ma.masked_invalid(flux, copy=False), np.ma.masked_invalid(err, copy=False)
+
+def loadStack(filename):
+    """
+        Memory maps a stack written by stack.
+
+        Parameters
+        ----------
+                filename : string
+                The base name given to stack.
+
+        Returns
+        ----------
+                flux, err : numpy masked arrays
+                The rebinned fluxes and their errors.
+    """
+    flux = np.load("{}_flux.npy".format(filename), mmap_mode='r')
+    err = np.load("{}_err.npy".format(filename), mmap_mode='r')
+
+    return np.ma.masked_invalid(flux, copy=False), np.ma.masked_invalid(err, copy=False)
+
+def normalise(flux, centres, wmin, wmax):
+    """
+        Scales each spectrum of a stack by its median flux in a wavelength
+        window so the shapes can be compared.
+
+        Parameters
+        ----------
+                flux : numpy masked array
+                The stack, see stack.
+
+                centres : numpy array
+                The centres of the bins.
+
+                wmin, wmax : float
+                The window in microns.
+
+        Returns
+        ----------
+                scale : numpy array
+                The median of each spectrum in the window, divide the stack
+                and its errors by scale[:, None].
+    """
+    window = (centres >= wmin) & (centres <= wmax)
+
+    return np.nanmedian(np.ma.filled(flux[:, window], np.nan), axis=1)
+
+def composite(flux, err=None, percentiles=(15.865, 84.135), scale=None, chunkSize=1000):
+    """
+        Computes composite spectra of a stack, a block of bins at a time so
+        a memory mapped stack is never read whole.
+
+        Parameters
+        ----------
+                flux : numpy masked array
+                The stack, see stack.
+
+                err : numpy masked array, optional
+                The errors, if given the error weighted mean is computed too.
+
+                percentiles : tuple, optional
+                The percentiles computed in each bin.
+
+                scale : numpy array, optional
+                Each spectrum is divided by its scale first, see normalise.
+
+                chunkSize : int, optional
+                The number of bins read at once.
+
+        Returns
+        ----------
+                composite : dictionary
+                The 'count', 'mean', 'median' and each percentile (keyed by
+                its value) in each bin, and the 'wmean' and 'wmeanErr' if the
+                errors are given. Empty bins are NaN.
+    """
+    nbins = flux.shape[1]
+
+    keys = ['count', 'mean', 'median'] + list(percentiles) + (['wmean', 'wmeanErr'] if err is not None else [])
+    out = dict((key, np.full(nbins, np.nan)) for key in keys)
+
+    for start in range(0, nbins, chunkSize):
+        cols = slice(start, start + chunkSize)
+        block = np.ma.filled(flux[:, cols].astype(float), np.nan)
+
+        if scale is not None:
+            block = block / scale[:, None]
+
+        count = np.isfinite(block).sum(axis=0)
+        out['count'][cols] = count
+
+        some = count > 0
+        if not some.any():
+            continue
+
+        block = block[:, some]
+        idx = np.arange(start, min(start + chunkSize, nbins))[some]
+
+        out['mean'][idx] = np.nanmean(block, axis=0)
+        out['median'][idx] = np.nanmedian(block, axis=0)
+
+        values = np.nanpercentile(block, percentiles, axis=0)
+        for p, value in zip(percentiles, values):
+            out[p][idx] = value
+
+        if err is not None:
+            sigma = np.ma.filled(err[:, cols].astype(float), np.nan)[:, some]
+            if scale is not None:
+                sigma = sigma / scale[:, None]
+
+            weight = np.where(np.isfinite(block) & (sigma > 0), 1.0 / np.where(sigma > 0, sigma, 1.0)**2, 0.0)
+            wsum = weight.sum(axis=0)
+            ok = wsum > 0
+
+            out['wmean'][idx[ok]] = (np.nan_to_num(block) * weight).sum(axis=0)[ok] / wsum[ok]
+            out['wmeanErr'][idx[ok]] = 1.0 / np.sqrt(wsum[ok])
+
+    return out
@@ -0,0 +1,239 @@
+"""
+    This module schedules the catalogue queries of an object against a time
+    budget. A history of the latency and failures of each survey is kept in
+    a JSON file at globs.latencyPath, shared by the processes of a run which
+    merge their queries into it under a file lock, and the queries are
+    launched slowest
+    first so the long ones overlap the short ones. Each query is given the
+    time left to the object, globs.objectBudget seconds, and is killed when
+    it runs out. The sources that miss the deadline are left out of the SED
+    and marked 'timeout' in the journal so a later run refreshes only them.
+"""
+
+import fcntl
+import json
+import os
+import subprocess
+import threading
+import time
+import concurrent.futures as cf
+from . import globs
+
+history = {}
+# the queries recorded since the history was last saved, (source, seconds,
+# status)
+recorded = []
+lock = threading.Lock()
+
+def loadHistory():
+    """
+        Loads the latency history, once per process.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                history : dictionary
+                The 'mean' latency in seconds and the number of 'queries',
+                'failures' and 'timeouts' of each source.
+    """
+    with lock:
+        if not history and globs.latencyPath and os.path.exists(globs.latencyPath):
+            with open(globs.latencyPath, 'r') as f:
+                history.update(json.load(f))
+
+    return history
+
+def saveHistory():
+    """
+        Merges the queries recorded since the last save into the history on
+        disk, which other processes may have updated, and writes it.
+    """
+    from . import dataSave as ds
+
+    if not globs.latencyPath:
+        with lock:
+            del recorded[:]
+        return
+
+    with lock, open("{}.lock".format(globs.latencyPath), 'w') as lockFile:
+        fcntl.flock(lockFile, fcntl.LOCK_EX)
+
+        merged = {}
+        if os.path.exists(globs.latencyPath):
+            with open(globs.latencyPath, 'r') as f:
+                merged = json.load(f)
+
+        for source, seconds, status in recorded:
+            update(merged, source, seconds, status)
+
+        text = json.dumps(merged, indent=1, sort_keys=True)
+        ds.atomicWrite(globs.latencyPath, lambda f: f.write(text))
+
+        history.clear()
+        history.update(merged)
+        del recorded[:]
+
+def update(entries, source, seconds, status):
+    """
+        Adds the outcome of a query to a history, see record.
+    """
+    entry = entries.setdefault(source, {'mean': seconds, 'queries': 0, 'failures': 0, 'timeouts': 0})
+
+    if seconds is not None:
+        entry['mean'] = seconds if entry['mean'] is None else entry['mean'] + globs.latencyWeight * (seconds - entry['mean'])
+    entry['queries'] += 1
+
+    if status == 'failed':
+        entry['failures'] += 1
+    elif status == 'timeout':
+        entry['timeouts'] += 1
+
+def record(source, seconds, status):
+    """
+        Adds the outcome of a query to the history. The mean latency is an
+        exponentially weighted mean with weight globs.latencyWeight, a
+        timeout counts as taking the whole time it was given and a failure
+        leaves the mean unchanged.
+
+        Parameters
+        ----------
+                source : string
+                The cat/survey.
+
+                seconds : float
+                The time the query took, None if unknown.
+
+                status : string
+                'done', 'failed' or 'timeout'.
+
+        Returns
+        ----------
+                None
+    """
+    loadHistory()
+
+    with lock:
+        update(history, source, seconds, status)
+        recorded.append((source, seconds, status))
+
+def expected(source):
+    """
+        The expected latency of a source in seconds, infinite for a source
+        with no history so it is launched first and learnt.
+    """
+    entry = loadHistory().get(source)
+
+    return entry['mean'] if entry and entry['mean'] is not None else float('inf')
+
+def order(sources):
+    """
+        Sorts the sources slowest first.
+    """
+    return sorted(sources, key=expected, reverse=True)
+
+def run(sources, fetch, reduce, budget=None):
+    """
+        Fetches the raw data of the sources concurrently, slowest first, and
+        reduces each in the calling thread as it arrives.
+
+        Parameters
+        ----------
+                sources : list
+                The cats/surveys to query.
+
+                fetch : function
+                Called as fetch(source, timeout) in a worker thread, returns
+                the raw data and raises subprocess.TimeoutExpired when it
+                runs out of time, i.e. a wrapper of download.query.
+
+                reduce : function
+                Called as reduce(source, raw), returns the wavelengths and
+                fluxes, i.e. download.reducePh.
+
+                budget : float, optional
+                The time in seconds the sources have, defaults to
+                globs.objectBudget, None for no limit.
+
+        Returns
+        ----------
+                data : dictionary
+                The 'wave' and 'flux' of each source, None for those that
+                failed or missed the deadline.
+
+                status : dictionary
+                'done', 'failed' or 'timeout' for each source.
+    """
+    budget = globs.objectBudget if budget is None else budget
+    deadline = time.time() + budget if budget is not None else None
+
+    def remaining():
+        left = None if deadline is None else max(deadline - time.time(), 0.0)
+        if globs.queryTimeout is not None:
+            left = globs.queryTimeout if left is None else min(left, globs.queryTimeout)
+        return left
+
+    def timed(source):
+        start = time.time()
+        try:
+            return fetch(source, remaining()), time.time() - start
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(time.time() - start)
+
+    data, status = {}, {}
+
+    pool = cf.ThreadPoolExecutor(max(1, min(globs.queryWorkers, len(sources))))
+    futures = dict((pool.submit(timed, source), source) for source in order(sources))
+    waiting = set(futures)
+
+    while waiting:
+        left = None if deadline is None else deadline - time.time()
+        if left is not None and left <= 0:
+            break
+
+        finished, waiting = cf.wait(waiting, timeout=left, return_when=cf.FIRST_COMPLETED)
+
+        for future in finished:
+            source = futures[future]
+            data[source] = {'wave': None, 'flux': None}
+
+            try:
+                raw, seconds = future.result()
+            except TimeoutError as e:
+                record(source, e.args[0], 'timeout')
+                status[source] = 'timeout'
+                continue
+            except Exception as e:
+                globs.logger.error("{} failed for {}: {}".format(source, globs.name, e))
+                record(source, None, 'failed')
+                status[source] = 'failed'
+                continue
+
+            record(source, seconds, 'done')
+
+            try:
+                data[source]['wave'], data[source]['flux'] = reduce(source, raw)
+                status[source] = 'done'
+            except Exception as e:
+                globs.logger.error("{} failed for {}: {}".format(source, globs.name, e))
+                status[source] = 'failed'
+
+    for future in waiting:
+        source = futures[future]
+        data[source] = {'wave': None, 'flux': None}
+        status[source] = 'timeout'
+
+        # queries that never started say nothing about the latency
+        if not future.cancel():
+            record(source, budget, 'timeout')
+
+    pool.shutdown(wait=False)
+    saveHistory()
+
+    late = [source for source in sources if status[source] == 'timeout']
+    if late:
+        globs.logger.warning("{} missed the deadline for {}.".format(', '.join(late), globs.name))
+
+    return data, status
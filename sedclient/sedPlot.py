@@ -1,7 +1,127 @@
 
 import matplotlib.pyplot as plt
-import dataStruct as ds
-import globs
+import numpy as np
+from . import dataStruct as ds
+from . import globs
+
+# the figure reused by every SED when globs.reuseFigure is True
+template = {}
+
+def newAxes():
+    """
+        Builds a figure and axes with the labels and ticks shared by every SED.
+    """
+    fig = plt.figure()
+    ax = plt.subplot(111)
+
+    styleAxes(ax)
+
+    return fig, ax
+
+def styleAxes(ax, fontsize=16, xlabel=True, ylabel=True):
+    """
+        Sets the labels, scales and limits shared by every SED on an axes.
+    """
+    if xlabel:
+        ax.set_xlabel(r'$\lambda\, \left[ \mu\rm{m} \right]$', fontsize=fontsize)
+    if ylabel:
+        ax.set_ylabel(r'$\lambda F_\lambda\,\left[ \rm{erg\,\,s}^{-1}\,\rm{cm}^{-2} \right]$', fontsize=fontsize)
+
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+
+    ax.set_xlim([0.1, 1000.0])
+    ax.set_xticklabels(['', '$0.1$', '$1$', '$10$', '$100$', '$1000$'])
+
+def cachedAxes():
+    """
+        Returns the cached figure and axes with the data and annotations of
+        the previous SED removed. The axis and tick labels are kept so their
+        mathtext is only parsed and laid out once.
+    """
+    if not template:
+        template['fig'], template['ax'] = newAxes()
+        return template['fig'], template['ax']
+
+    ax = template['ax']
+
+    for artist in list(ax.lines) + list(ax.collections) + list(ax.texts) + list(ax.patches):
+        artist.remove()
+    ax.containers[:] = []
+
+    if ax.get_legend():
+        ax.get_legend().remove()
+
+    ax.relim()
+    ax.set_autoscaley_on(True)
+
+    return template['fig'], ax
+
+def decimate(wave, flux, columns, xlim=None):
+    """
+        Reduces a spectrum to the points that can be seen at the resolution
+        of the figure, keeping the minimum and maximum flux in each pixel
+        column of the logarithmic wavelength axis so the shape of the
+        spectrum, i.e. narrow features, is preserved.
+
+        Parameters
+        ----------
+                wave : numpy array
+                The wavelengths.
+
+                flux : numpy array
+                The fluxes.
+
+                columns : int
+                The number of pixel columns across the wavelength axis, 0 to
+                keep every point.
+
+                xlim : tuple, optional
+                The limits of the wavelength axis, defaults to the range of
+                the wavelengths.
+
+        Returns
+        ----------
+                keep : numpy array
+                The indices of the points to plot in their original order.
+    """
+    good = np.flatnonzero(np.isfinite(flux) & (wave > 0))
+
+    if not columns or len(good) <= 2 * columns:
+        return good
+
+    logWave = np.log10(wave[good])
+    lo, hi = np.log10(xlim) if xlim else (logWave.min(), logWave.max())
+
+    column = np.clip(((logWave - lo) / (hi - lo) * columns).astype(int), 0, columns - 1)
+
+    order = np.lexsort((flux[good], column))
+    edges = np.flatnonzero(np.diff(column[order])) + 1
+
+    first = np.concatenate(([0], edges))
+    last = np.concatenate((edges - 1, [len(order) - 1]))
+
+    return good[np.unique(order[np.concatenate((first, last))])]
+
+def errorBars(survey, wave, err):
+    """
+        The error bars of the photometry of a cat/survey, the asymmetric
+        errors of the Monte Carlo error mode if they were saved for every
+        point, otherwise the symmetric errors.
+    """
+    from . import load
+
+    saved, errLo, errHi = load.loadAsym(survey)
+
+    if saved is None:
+        return err
+
+    index = [np.flatnonzero(np.isclose(saved, w)) for w in wave]
+
+    if not all(len(k) for k in index):
+        return err
+
+    return [[errLo[k[0]] for k in index], [errHi[k[0]] for k in index]]
 
 class Plot:
     """
@@ -9,50 +129,58 @@ class Plot:
 
     """
 
-    def __init__(self):
+    def __init__(self, ax=None, stored=False):
         """
-
+            Builds the data structures and the axes of the SED. If 'ax' is
+            given the SED is drawn on it, i.e. a tile of a contact sheet,
+            instead of a new figure. If 'stored' is set only the saved data
+            are used, nothing is downloaded.
         """
 
         self.name = globs.name
         self.ra = globs.ra
         self.dec = globs.dec
         self.y_ann = 0.97
+        self.annSize = 14
 
-        self.photo = ds.buildPhStruct()
-        self.spec = ds.buildSpStruct()
-
-        self.fig = plt.figure()
-        self.ax = plt.subplot(111)
-
-        self.ax.set_xlabel(r'$\lambda\, \left[ \mu\rm{m} \right]$', fontsize=16)
-        self.ax.set_ylabel(r'$\lambda F_\lambda\,\left[ \rm{erg\,\,s}^{-1}\,\rm{cm}^{-2} \right]$', fontsize=16)
-
-        self.ax.set_xscale('log')
-        self.ax.set_yscale('log')
+        self.photo = ds.buildPhStruct(stored)
+        self.spec = ds.buildSpStruct(stored)
 
-        self.ax.set_xlim([0.1, 1000.0])
-        self.ax.set_xticklabels(['', '$0.1$', '$1$', '$10$', '$100$', '$1000$'])
+        if ax is not None:
+            self.fig, self.ax = ax.figure, ax
+            self.annSize = 6
+        elif globs.reuseFigure:
+            self.fig, self.ax = cachedAxes()
+        else:
+            self.fig, self.ax = newAxes()
 
     def plotPh(self):
         """
-            Plots the photometry.
+            Plots the photometry, without the outliers if
+            globs.excludeOutliers is set, with the asymmetric errors of the
+            Monte Carlo error mode where they were saved.
         """
         import configparser
 
-        for survey in self.photo:
+        photo = self.photo
+        if globs.excludeOutliers:
+            from . import outliers
+            photo = outliers.exclude(photo)
+
+        for survey in photo:
             conf = configparser.ConfigParser()
             conf.read("{}{}.ini".format(globs.confPath, survey))
 
             conf = conf['plot']
 
-            if self.photo[survey]['flux']:
-                wave = self.photo[survey]['wave']
-                flux = [f for x in self.photo[survey]['flux'] for f in (x.value.n, x.value.s)]
+            if photo[survey]['flux']:
+                wave = photo[survey]['wave']
+                flux = [f for x in photo[survey]['flux'] for f in (x.value.n, x.value.s)]
+                err = errorBars(survey, wave, flux[1::2])
                 if 'white' not in conf['mfc']:
-                    self.ax.errorbar(wave, flux[0::2], yerr=flux[1::2], fmt=conf['marker'], mfc=conf['mfc'], mec=conf['mec'], ecolor=conf['mfc'], label=conf['label'])
+                    self.ax.errorbar(wave, flux[0::2], yerr=err, fmt=conf['marker'], mfc=conf['mfc'], mec=conf['mec'], ecolor=conf['mfc'], label=conf['label'])
                 else:
-                    self.ax.errorbar(wave, flux[0::2], yerr=flux[1::2], fmt=conf['marker'], mfc=conf['mfc'], mec=conf['mec'], ecolor=conf['mec'], label=conf['label'])
+                    self.ax.errorbar(wave, flux[0::2], yerr=err, fmt=conf['marker'], mfc=conf['mfc'], mec=conf['mec'], ecolor=conf['mec'], label=conf['label'])
 
     def plotSp(self):
         """
@@ -67,16 +195,50 @@ class Plot:
             conf = conf['plot']
 
             if self.spec[survey]['flux']:
-                wave = self.spec[survey]['wave']
-                flux = [f for x in self.spec[survey]['flux'] for f in (x.value.n, x.value.s)]
-                self.ax.plot(wave, flux[0::2], ls=conf['ls'], color=conf['col'], lw=float(conf['lw']), label=conf['label'])
+                wave = np.asarray(self.spec[survey]['wave'], dtype=float)
+                flux = np.array([x.value.n for x in self.spec[survey]['flux']])
+                keep = decimate(wave, flux, self.columns(), self.ax.get_xlim())
+                self.ax.plot(wave[keep], flux[keep], ls=conf['ls'], color=conf['col'], lw=float(conf['lw']), label=conf['label'])
+
+    def columns(self):
+        """
+            The number of pixel columns the spectra are decimated to, taken
+            from globs.spColumns or from the width of the axes at
+            globs.plotDpi.
+        """
+        if globs.spColumns is not None:
+            return globs.spColumns
+
+        width = self.ax.get_window_extent().width / self.fig.dpi
+
+        return int(np.ceil(width * globs.plotDpi))
+
+    def merged(self):
+        """
+            Returns the data as one wavelength sorted index, see
+            merged.MergedSED.
+        """
+        from . import merged
+
+        return merged.MergedSED(self.photo, self.spec, self.name)
+
+    def plotFit(self, fits):
+        """
+            Plots the best fitting models returned by fit.fitSED.
+        """
+        from . import fit as ft
+
+        for fit in fits:
+            wave, flux = ft.modelCurve(fit)
+            label = ', '.join("{}={:.3G}".format(par, fit['params'][par]) for par in fit['params'].dtype.names)
+            self.ax.plot(wave, flux, ls='--', lw=1.0, label=label)
 
     def annotate(self, string):
         """
             Annotates string in top right corner moving down after each line.
         """
-        self.ax.text(0.97, self.y_ann, string, fontsize=14, transform=self.ax.transAxes, horizontalalignment='right', verticalalignment='top')
-        self.y_ann -= 0.05
+        self.ax.text(0.97, self.y_ann, string, fontsize=self.annSize, transform=self.ax.transAxes, horizontalalignment='right', verticalalignment='top')
+        self.y_ann -= 0.05 * self.annSize / 14.0
 
     def legend(self):
         """
@@ -88,7 +250,7 @@ class Plot:
         """
             Saves SED plot using the dataSave.py modules.
         """
-        import dataSave as ds
+        from . import dataSave as ds
 
         if filename:
             ds.saveSed(self.fig, filename)
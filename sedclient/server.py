@@ -0,0 +1,375 @@
+"""
+    This module runs the client as a long lived local server so a request
+    only pays for the work of building its SED and not for the interpreter
+    start up, the astropy and matplotlib imports and the loading of the
+    coverage maps. The SEDs are built by a pool of worker processes which load
+    the coverage maps, dust map, ISO index and model grids once when they
+    start. Requests are served over HTTP:
+
+        GET /sed?name=...&ra=...&dec=...   - builds the SED and returns the
+                                             data as JSON, with the rendered
+                                             png if image=1.
+        GET /sed.png?name=...&ra=...&dec=... - returns the rendered png.
+        GET /stats                         - the queue depth and latencies.
+
+    The position may be in any format accepted by targets.toDegrees. The
+    Galactic coordinates and E(B-V) are taken from 'l', 'b', 'ebv' and
+    'ebv_err' if given, otherwise from the dust map. Concurrent requests for
+    the same object at the same position share one build.
+"""
+
+import base64
+import collections
+import io
+import json
+import threading
+import time
+import concurrent.futures as cf
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from . import globs
+
+def warm():
+    """
+        Loads the modules and caches used by every build, run once in each
+        worker process as it starts.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                None
+    """
+    import os
+    import matplotlib
+    matplotlib.use('Agg')
+
+    from . import makeSED
+    from . import coverage as cv
+    from . import isoIndex
+    from . import targets
+    from . import fit
+
+    for source in globs.phSources + globs.specSources:
+        cv.loadMoc(source)
+
+    if isoIndex.available():
+        isoIndex.loadIndex()
+
+    if os.path.exists(globs.dustMap):
+        targets.loadDustMap()
+
+    for name in globs.fitGrids:
+        fit.loadGrid(name)
+
+    globs.logger.info("Server worker {} ready.".format(os.getpid()))
+
+def toJson(data):
+    """
+        Turns a photometry or spectroscopy data structure into lists of
+        wavelengths, fluxes and errors.
+
+        Parameters
+        ----------
+                data : dictionary
+                The data structure, see dataStruct.
+
+        Returns
+        ----------
+                data : dictionary
+                The 'wave', 'flux' and 'err' of each cat/survey.
+    """
+    out = {}
+
+    for source in data:
+        out[source] = {'wave': [], 'flux': [], 'err': []}
+
+        if data[source]['flux']:
+            out[source]['wave'] = [float(w) for w in data[source]['wave']]
+            out[source]['flux'] = [x.value.n for x in data[source]['flux']]
+            out[source]['err'] = [x.value.s for x in data[source]['flux']]
+
+    return out
+
+def buildOne(target, image=False):
+    """
+        Builds and returns the SED of an object, run in a worker process.
+        The data are saved but the plot is only rendered into memory.
+
+        Parameters
+        ----------
+                target : dictionary
+                The object, see makeSED.setGlobs.
+
+                image : bool, optional
+                If True the rendered png is returned as well.
+
+        Returns
+        ----------
+                result : dictionary
+                The 'name', the 'photometry' and 'spectroscopy' (see toJson),
+                the 'png' bytes if asked for and the build 'time' in seconds.
+    """
+    from . import makeSED
+    from . import dataSave
+    from . import profiling
+    import matplotlib.pyplot as plt
+
+    start = time.time()
+
+    makeSED.setGlobs(target)
+    makeSED.openLogger()
+
+    try:
+        SED = profiling.profiled(lambda: makeSED.build(save=False), target['name'])
+        dataSave.flush()
+
+        result = {'name': target['name']}
+        result['photometry'] = toJson(SED.photo)
+        result['spectroscopy'] = toJson(SED.spec)
+
+        if image:
+            buf = io.BytesIO()
+            SED.fig.savefig(buf, format='png')
+            result['png'] = buf.getvalue()
+
+        if not globs.reuseFigure:
+            plt.close(SED.fig)
+    finally:
+        makeSED.closeLogger()
+
+    result['time'] = time.time() - start
+
+    return result
+
+def makeTarget(query):
+    """
+        Makes the target of a request from its query string.
+
+        Parameters
+        ----------
+                query : dictionary
+                The parsed query string.
+
+        Returns
+        ----------
+                target : dictionary
+                The object, see makeSED.setGlobs.
+    """
+    from uncertainties import ufloat
+    from . import dedup
+    from . import targets
+
+    for key in ['name', 'ra', 'dec']:
+        if key not in query:
+            raise ValueError("The request has no '{}'.".format(key))
+
+    name, ra, dec = dedup.resolve(query['name'][0]), query['ra'][0], query['dec'][0]
+
+    if all(key in query for key in ['l', 'b', 'ebv']):
+        target = {'name': name, 'ra': ra, 'dec': dec}
+        target['l'] = float(query['l'][0])
+        target['b'] = float(query['b'][0])
+        target['ebv'] = ufloat(float(query['ebv'][0]), float(query.get('ebv_err', [0.0])[0]))
+        return target
+
+    return next(targets.iterTargets(targets.prepare([ra], [dec], [name])))
+
+class Server(ThreadingHTTPServer):
+    """
+        class for the SED server, the HTTP server with the worker pool and
+        the request statistics.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host=None, port=None, workers=None):
+        """
+            Starts the worker pool and binds the server, the defaults are
+            taken from globs.
+        """
+        host = globs.serverHost if host is None else host
+        port = globs.serverPort if port is None else port
+
+        self.workers = globs.serverWorkers if workers is None else workers
+        self.pool = cf.ProcessPoolExecutor(self.workers, initializer=warm)
+
+        self.lock = threading.Lock()
+        self.building = {}
+        self.pending = 0
+        self.served = 0
+        self.failed = 0
+        self.started = time.time()
+        self.latency = collections.deque(maxlen=globs.serverHistory)
+        self.buildTime = collections.deque(maxlen=globs.serverHistory)
+
+        ThreadingHTTPServer.__init__(self, (host, port), Handler)
+
+    def submit(self, target, image):
+        """
+            Submits a build to the pool, or returns the build already running
+            for the same object at the same position.
+        """
+        key = (target['name'], target['ra'], target['dec'], image)
+
+        with self.lock:
+            future = self.building.get(key)
+            new = future is None
+
+            if new:
+                future = self.building[key] = self.pool.submit(buildOne, target, image)
+            self.pending += 1
+
+        # a build that is already done runs the callback at once, which
+        # takes the lock
+        if new:
+            future.add_done_callback(lambda f: self.finished(key, f))
+
+        return future
+
+    def finished(self, key, future):
+        """
+            Forgets a completed build.
+        """
+        with self.lock:
+            if self.building.get(key) is future:
+                del self.building[key]
+
+    def record(self, latency, result=None):
+        """
+            Records the outcome of a request.
+        """
+        with self.lock:
+            self.pending -= 1
+            self.latency.append(latency)
+
+            if result is None:
+                self.failed += 1
+            else:
+                self.served += 1
+                self.buildTime.append(result['time'])
+
+    def stats(self):
+        """
+            Returns the queue depth and the latency statistics.
+        """
+        with self.lock:
+            latency = np.array(self.latency)
+            buildTime = np.array(self.buildTime)
+
+            stats = {'workers': self.workers, 'pending': self.pending, 'queueDepth': max(0, len(self.building) - self.workers)}
+            stats.update({'served': self.served, 'failed': self.failed, 'uptime': time.time() - self.started})
+
+        for key, values in [('latency', latency), ('buildTime', buildTime)]:
+            if len(values):
+                stats[key] = {'mean': values.mean(), 'p50': np.percentile(values, 50), 'p95': np.percentile(values, 95), 'max': values.max()}
+            else:
+                stats[key] = None
+
+        return stats
+
+    def server_close(self):
+        """
+            Closes the server and shuts down the worker pool.
+        """
+        ThreadingHTTPServer.server_close(self)
+        self.pool.shutdown()
+
+class Handler(BaseHTTPRequestHandler):
+    """
+        class for handling the requests to the SED server.
+    """
+
+    def do_GET(self):
+        """
+            Serves the /sed, /sed.png and /stats requests.
+        """
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == '/stats':
+            return self.reply(200, self.server.stats())
+
+        if url.path not in ['/sed', '/sed.png']:
+            return self.reply(404, {'error': "Unknown path '{}'.".format(url.path)})
+
+        try:
+            target = makeTarget(query)
+        except Exception as e:
+            return self.reply(400, {'error': str(e)})
+
+        png = url.path == '/sed.png'
+        image = png or query.get('image', ['0'])[0] not in ['0', 'false', '']
+
+        start = time.time()
+
+        try:
+            result = self.server.submit(target, image).result()
+        except Exception as e:
+            self.server.record(time.time() - start)
+            globs.logger.error("Server build failed for {}: {}".format(target['name'], e))
+            return self.reply(500, {'error': str(e)})
+
+        self.server.record(time.time() - start, result)
+
+        if png:
+            return self.reply(200, result['png'], 'image/png')
+
+        result = dict(result)
+        if image:
+            result['png'] = base64.b64encode(result['png']).decode('ascii')
+
+        self.reply(200, result)
+
+    def reply(self, code, body, contentType='application/json'):
+        """
+            Sends a response, dictionaries are sent as JSON.
+        """
+        if isinstance(body, dict):
+            body = json.dumps(body).encode('utf-8')
+
+        self.send_response(code)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """
+            Sends the access log to the client logger.
+        """
+        globs.logger.info("Server: " + format % args)
+
+def serve(host=None, port=None, workers=None):
+    """
+        Runs the SED server until it is interrupted.
+
+        Parameters
+        ----------
+                host : string, optional
+                The address to listen on, defaults to globs.serverHost.
+
+                port : int, optional
+                The port to listen on, defaults to globs.serverPort.
+
+                workers : int, optional
+                The number of worker processes, defaults to
+                globs.serverWorkers.
+
+        Returns
+        ----------
+                None
+    """
+    server = Server(host, port, workers)
+
+    globs.logger.info("Serving SEDs on {}:{} with {} workers.".format(server.server_address[0], server.server_address[1], server.workers))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
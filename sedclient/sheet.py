@@ -0,0 +1,94 @@
+"""
+    This module places many SEDs on the tiles of a contact sheet. One page
+    figure is reused for every page and each finished page is streamed to a
+    multi-page pdf or written as a png, so only a single page is ever held in
+    memory. An index mapping each object to its page and tile is written next
+    to the output.
+"""
+
+import csv
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from . import sedPlot
+from . import globs
+
+class Sheet:
+    """
+        class for building contact sheets of SEDs.
+    """
+
+    def __init__(self, filename, rows=4, cols=4, fmt='pdf'):
+        """
+            Opens the output and the index and builds the page figure.
+        """
+        if fmt not in ['pdf', 'png']:
+            raise ValueError("Unknown contact sheet format '{}'.".format(fmt))
+
+        self.filename = filename
+        self.rows = rows
+        self.cols = cols
+        self.fmt = fmt
+
+        self.page = 0
+        self.tile = 0
+
+        self.fig, axes = plt.subplots(rows, cols, figsize=(3.0 * cols, 2.4 * rows), squeeze=False)
+        self.axes = axes.ravel()
+
+        self.pdf = PdfPages(filename) if fmt == 'pdf' else None
+
+        self.indexFile = open("{}.index".format(filename), 'w')
+        self.index = csv.writer(self.indexFile)
+        self.index.writerow(['name', 'page', 'tile'])
+
+    def nextTile(self, name):
+        """
+            Returns the next free tile, writing out the page first if it is
+            full.
+        """
+        if self.tile == self.rows * self.cols:
+            self.writePage()
+
+        ax = self.axes[self.tile]
+        ax.set_visible(True)
+
+        sedPlot.styleAxes(ax, fontsize=7, xlabel=self.tile >= (self.rows - 1) * self.cols, ylabel=self.tile % self.cols == 0)
+        ax.tick_params(labelsize=6)
+
+        self.index.writerow([name, self.page, self.tile])
+        self.tile += 1
+
+        return ax
+
+    def writePage(self):
+        """
+            Writes the current page and clears the tiles for the next one.
+        """
+        for ax in self.axes[self.tile:]:
+            ax.set_visible(False)
+
+        if self.pdf:
+            self.pdf.savefig(self.fig)
+        else:
+            self.fig.savefig("{}_{:04d}.png".format(self.filename, self.page), dpi=100)
+
+        globs.logger.info("Contact sheet page {} written to {}.".format(self.page, self.filename))
+
+        for ax in self.axes:
+            ax.cla()
+
+        self.page += 1
+        self.tile = 0
+
+    def close(self):
+        """
+            Writes the last page and closes the output and the index.
+        """
+        if self.tile:
+            self.writePage()
+
+        if self.pdf:
+            self.pdf.close()
+
+        self.indexFile.close()
+        plt.close(self.fig)
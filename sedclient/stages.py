@@ -0,0 +1,331 @@
+"""
+    This module runs the building of SEDs as separate stages over a list of
+    targets:
+
+        fetch  - runs the catalogue queries and downloads the spectra and
+                 stores the raw output in globs.dirRaw.
+        reduce - converts, dereddens and saves the stored raw output.
+        render - plots and saves the SEDs from the saved data.
+        export - writes the photometry archive as one table.
+
+    Only the fetch stage uses the network, the others run with globs.offline
+    set. Each stage stamps an object with a digest of its inputs, i.e. the
+    raw output and the [reduce] and [quality] sections of the configs for
+    reduce or the saved data and the [plot] sections for render, and skips
+    the objects whose inputs are unchanged. Changing a plot style re-runs
+    only the rendering and changing a zero point only the reduction.
+"""
+
+import configparser
+import hashlib
+import json
+import os
+import concurrent.futures as cf
+from . import globs
+
+stageNames = ['fetch', 'reduce', 'render', 'export']
+
+def fileName(name):
+    """
+        The name of an object as used in file names.
+    """
+    return name.replace(' ', '_')
+
+def digest(*parts):
+    """
+        The SHA-1 digest of strings, bytes and JSON serialisable values.
+    """
+    sha = hashlib.sha1()
+
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode('utf-8')
+        sha.update(part)
+        sha.update(b'\0')
+
+    return sha.hexdigest()
+
+def fileDigest(filename):
+    """
+        The digest of the contents of a file, None if it does not exist.
+    """
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, 'rb') as f:
+        return digest(f.read())
+
+def confSections(sections):
+    """
+        The given sections of the config of every source.
+    """
+    from . import coverage as cv
+
+    result = {}
+
+    for source in globs.phSources + globs.specSources:
+        conf = configparser.ConfigParser()
+        conf.read("{}{}.ini".format(globs.confPath, cv.confName(source)))
+        result[source] = dict((section, dict(conf[section])) for section in sections if conf.has_section(section))
+
+    return result
+
+def stampPath(stage, name):
+    """
+        The stamp file of an object for a stage.
+    """
+    return "{}{}/{}".format(globs.dirStamp, stage, fileName(name))
+
+def readStamp(stage, name):
+    """
+        Returns the stamp of an object for a stage, None if it has none.
+    """
+    path = stampPath(stage, name)
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+def writeStamp(stage, name, stamp):
+    """
+        Stamps an object for a stage.
+    """
+    from . import dataSave as ds
+
+    directory = os.path.dirname(stampPath(stage, name))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    ds.atomicWrite(stampPath(stage, name), lambda f: f.write(stamp))
+
+def rawPath(name):
+    """
+        The file of the raw output of an object.
+    """
+    return "{}{}.json".format(globs.dirRaw, fileName(name))
+
+def saveRaw(name, raw):
+    """
+        Stores the raw output of an object returned by pipeline.fetch.
+    """
+    from . import dataSave as ds
+
+    text = {}
+    for source, lines in raw.items():
+        text[source] = None if lines is None else [line.decode() if isinstance(line, bytes) else line for line in lines]
+
+    ds.atomicWrite(rawPath(name), lambda f: json.dump(text, f))
+
+def loadRaw(name):
+    """
+        Loads the stored raw output of an object.
+    """
+    with open(rawPath(name), 'r') as f:
+        return json.load(f)
+
+def fetchStamp(target):
+    """
+        The inputs of the fetch stage, the position and the queries.
+    """
+    return digest(str(target['ra']), str(target['dec']), confSections(['query']))
+
+def reduceStamp(target):
+    """
+        The inputs of the reduce stage, the raw output, the reduction configs
+        and the extinction.
+    """
+    ebv = target['ebv']
+    return digest(fileDigest(rawPath(target['name'])), confSections(['reduce', 'quality']), [ebv.n, ebv.s], globs.errMode, globs.mcSamples)
+
+def renderStamp(target):
+    """
+        The inputs of the render stage, the saved data and the plot configs
+        and settings.
+    """
+    name = fileName(target['name'])
+    data = [fileDigest("{}{}".format(globs.dirPh, name))]
+    data += [fileDigest("{}{}_{}".format(globs.dirSp, name, source)) for source in globs.specSources]
+
+    settings = [globs.plainAnns, globs.spColumns, globs.plotDpi]
+
+    return digest(data, confSections(['plot']), settings, target['l'], target['b'])
+
+def fetchOne(target, force=False, covered=None):
+    """
+        Runs the fetch stage for an object, covered is its coverage, see
+        pipeline.fetch.
+
+        Returns
+        ----------
+                status : string
+                'done' or 'skipped'.
+    """
+    from . import pipeline
+
+    stamp = fetchStamp(target)
+
+    if not force and readStamp('fetch', target['name']) == stamp and os.path.exists(rawPath(target['name'])):
+        return 'skipped'
+
+    saveRaw(target['name'], pipeline.fetch(target, covered))
+    writeStamp('fetch', target['name'], stamp)
+
+    return 'done'
+
+def reduceOne(target, force=False):
+    """
+        Runs the reduce stage for an object, run in a worker process.
+
+        Returns
+        ----------
+                status : string
+                'done', 'skipped' or 'missing' if it has no raw output.
+    """
+    from . import pipeline
+
+    globs.offline = True
+
+    if not os.path.exists(rawPath(target['name'])):
+        return 'missing'
+
+    stamp = reduceStamp(target)
+
+    if not force and readStamp('reduce', target['name']) == stamp:
+        return 'skipped'
+
+    pipeline.reduceRaw(target, loadRaw(target['name']))
+    writeStamp('reduce', target['name'], stamp)
+
+    return 'done'
+
+def renderOne(target, force=False):
+    """
+        Runs the render stage for an object, run in a worker process.
+
+        Returns
+        ----------
+                status : string
+                'done', 'skipped' or 'missing' if it has no saved data.
+    """
+    from . import pipeline
+
+    globs.offline = True
+
+    name = fileName(target['name'])
+    paths = ["{}{}".format(globs.dirPh, name)] + ["{}{}_{}".format(globs.dirSp, name, source) for source in globs.specSources]
+
+    if not all(os.path.exists(path) for path in paths):
+        return 'missing'
+
+    stamp = renderStamp(target)
+
+    if not force and readStamp('render', target['name']) == stamp:
+        return 'skipped'
+
+    pipeline.render(target)
+    writeStamp('render', target['name'], stamp)
+
+    return 'done'
+
+def runStage(stage, targets, jobs=1, force=False):
+    """
+        Runs the fetch, reduce or render stage over many objects.
+
+        Parameters
+        ----------
+                stage : string
+                'fetch', 'reduce' or 'render'.
+
+                targets : iterable of dictionaries
+                The objects, see makeSED.setGlobs.
+
+                jobs : int, optional
+                The number of threads (fetch) or processes (reduce and
+                render).
+
+                force : bool, optional
+                Run even if the inputs are unchanged.
+
+        Returns
+        ----------
+                results : generator
+                Yields a dictionary with the 'name' and 'status' of each
+                object, with the 'error' if it failed.
+    """
+    funcs = {'fetch': fetchOne, 'reduce': reduceOne, 'render': renderOne}
+
+    if stage not in funcs:
+        raise ValueError("Unknown stage '{}'.".format(stage))
+
+    if stage == 'fetch':
+        pool = cf.ThreadPoolExecutor(jobs)
+    else:
+        pool = cf.ProcessPoolExecutor(jobs)
+
+    counts = {}
+
+    try:
+        # the coverage of the targets is checked in chunks before the
+        # queries
+        if stage == 'fetch':
+            from . import coverage as cv
+            items = ((target, (covered,)) for target, covered in cv.coverTargets(targets))
+        else:
+            items = ((target, ()) for target in targets)
+
+        futures = dict((pool.submit(funcs[stage], target, force, *extra), target) for target, extra in items)
+
+        for future in cf.as_completed(futures):
+            result = {'name': futures[future]['name']}
+
+            try:
+                result['status'] = future.result()
+            except Exception as e:
+                globs.logger.error("{} stage failed for {}: {}".format(stage, result['name'], e))
+                result['status'], result['error'] = 'failed', str(e)
+
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+
+            yield result
+    finally:
+        pool.shutdown()
+
+    globs.logger.info("{} stage: {}.".format(stage, ', '.join("{} {}".format(n, status) for status, n in sorted(counts.items()))))
+
+def runExport(filename, fmt='csv', force=False):
+    """
+        Runs the export stage, skipped if the archive is unchanged.
+
+        Parameters
+        ----------
+                filename : string
+                The csv file or the directory of .npy columns.
+
+                fmt : string, optional
+                Either 'csv' or 'npy'.
+
+                force : bool, optional
+                Export even if the archive is unchanged.
+
+        Returns
+        ----------
+                status : string
+                'done' or 'skipped'.
+    """
+    from . import export
+
+    globs.offline = True
+
+    files = export.archiveFiles()
+    stamp = digest(fmt, files, [fileDigest(os.path.join(globs.dirPh, f)) for f in files], confSections(['reduce']))
+    key = "{}_{}".format(os.path.abspath(filename).strip('/').replace('/', '_'), fmt)
+
+    if not force and readStamp('export', key) == stamp and os.path.exists(filename):
+        return 'skipped'
+
+    export.export(filename, fmt)
+    writeStamp('export', key, stamp)
+
+    return 'done'
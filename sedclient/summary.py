@@ -0,0 +1,206 @@
+"""
+    This module keeps a summary index of the saved data in an SQLite database
+    at globs.summaryPath so the archive can be queried without loading the
+    data files. For each object and source it holds the number of points, the
+    wavelength range, the maximum flux and the time of the last update, and
+    for each object the same aggregated over its sources together with
+    whether a spectrum exists. The index is
+    kept up to date by dataSave and can be rebuilt from the data files. The
+    sources required by a query are looked up in the index of the sources
+    table, one indexed search per source. It is disabled when
+    globs.summaryPath is None.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from . import globs
+
+conn = {}
+lock = threading.Lock()
+
+def connect():
+    """
+        Opens the summary index, creating it if needed.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                conn : sqlite3 connection
+                The connection to the index.
+    """
+    key = (os.getpid(), globs.summaryPath)
+
+    if key not in conn:
+        db = sqlite3.connect(globs.summaryPath, timeout=60, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS sources (name TEXT, source TEXT, kind TEXT, npts INTEGER, wmin REAL, wmax REAL, fmax REAL, updated REAL, PRIMARY KEY (name, source))")
+        db.execute("CREATE TABLE IF NOT EXISTS objects (name TEXT PRIMARY KEY, npts INTEGER, wmin REAL, wmax REAL, fmax REAL, spectrum INTEGER, updated REAL)")
+        db.execute("CREATE INDEX IF NOT EXISTS objects_wmax ON objects (wmax)")
+        db.execute("CREATE INDEX IF NOT EXISTS sources_source ON sources (source, npts)")
+        db.commit()
+        conn[key] = db
+
+    return conn[key]
+
+def enabled():
+    """
+        Returns True if the summary index is in use.
+    """
+    return globs.summaryPath is not None
+
+def update(name, source, wave, flux, kind='ph', commit=True):
+    """
+        Updates the summary of one source of an object and the summary of the
+        object.
+
+        Parameters
+        ----------
+                name : string
+                The name of the object.
+
+                source : string
+                The cat/survey.
+
+                wave : list
+                The wavelengths of the data, may be None.
+
+                flux : list
+                The fluxes of the data, may be None.
+
+                kind : string, optional
+                'ph' for photometry or 'sp' for spectroscopy.
+
+                commit : bool, optional
+                If False the caller commits, i.e. when rebuilding.
+
+        Returns
+        ----------
+                None
+    """
+    wave = np.asarray(wave if wave else [], dtype=float)
+    flux = np.asarray(flux if flux else [], dtype=float)
+
+    if len(wave):
+        row = (name, source, kind, len(wave), wave.min(), wave.max(), np.nanmax(flux), time.time())
+    else:
+        row = (name, source, kind, 0, None, None, None, time.time())
+
+    with lock:
+        db = connect()
+        db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+        db.execute("""INSERT OR REPLACE INTO objects (name, npts, wmin, wmax, fmax, spectrum, updated)
+                      SELECT name, SUM(npts), MIN(wmin), MAX(wmax), MAX(fmax), MAX(kind = 'sp' AND npts > 0), MAX(updated)
+                      FROM sources WHERE name=? GROUP BY name""", (name,))
+
+        if commit:
+            db.commit()
+
+def query(sources=None, minWave=None, maxWave=None, spectrum=None, minFlux=None):
+    """
+        Finds the objects matching all of the given predicates.
+
+        Parameters
+        ----------
+                sources : list, optional
+                The cats/surveys that must all have data.
+
+                minWave : float, optional
+                The data must reach at least this wavelength in microns.
+
+                maxWave : float, optional
+                The data must start at or below this wavelength in microns.
+
+                spectrum : bool, optional
+                If given the object must (True) or must not (False) have a
+                spectrum.
+
+                minFlux : float, optional
+                The maximum flux must be at least this in erg/s/cm**2.
+
+        Returns
+        ----------
+                names : list
+                The names of the matching objects.
+    """
+    where, args = [], []
+
+    with lock:
+        db = connect()
+
+        for source in (sources or []):
+            where.append("name IN (SELECT name FROM sources WHERE source = ? AND npts > 0)")
+            args.append(source)
+
+        if minWave is not None:
+            where.append("wmax >= ?")
+            args.append(minWave)
+        if maxWave is not None:
+            where.append("wmin <= ?")
+            args.append(maxWave)
+        if spectrum is not None:
+            where.append("spectrum = ?")
+            args.append(int(spectrum))
+        if minFlux is not None:
+            where.append("fmax >= ?")
+            args.append(minFlux)
+
+        sql = "SELECT name FROM objects"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+
+        return [row[0] for row in db.execute(sql, args)]
+
+def rebuild():
+    """
+        Rebuilds the summary index from the photometry and spectroscopy files.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                None
+    """
+    from . import export
+    import csv
+
+    with lock:
+        db = connect()
+        for table in ['sources', 'objects']:
+            db.execute("DELETE FROM {}".format(table))
+        db.commit()
+
+    count = 0
+
+    for filename, conf in export.iterArchive():
+        for source in conf.sections():
+            if source == 'meta':
+                continue
+            if 'wave' in conf[source]:
+                wave = [float(w) for w in conf[source]['wave'].split()]
+                flux = [float(f) for f in conf[source]['fluxes'].split()][0::2]
+            else:
+                wave, flux = None, None
+            update(filename, source, wave, flux, 'ph', commit=False)
+        count += 1
+
+    for filename in os.listdir(globs.dirSp):
+        for source in globs.specSources:
+            if filename.endswith("_{}".format(source)):
+                with open(os.path.join(globs.dirSp, filename), 'r') as f:
+                    rows = [row for row in csv.reader(f) if row]
+                update(filename[:-len(source) - 1], source, [float(r[0]) for r in rows], [float(r[1]) for r in rows], 'sp', commit=False)
+
+    with lock:
+        connect().commit()
+
+    globs.logger.info("Rebuilt the summary index of {} objects.".format(count))
@@ -0,0 +1,355 @@
+"""
+    This module computes synthetic photometry from spectra, i.e. to fill in
+    a band that is missing or was removed by the quality checks when the
+    object has an ISO spectrum. The transmission curves of the bands are
+    given in a [synphot] section of each survey config, one file per
+    wavelength of the [reduce] section:
+
+        [synphot]
+        curves=data/filters/2mass_j.dat data/filters/2mass_h.dat data/filters/2mass_ks.dat
+        detector=photon
+
+    Each file has two columns, the wavelength in microns and the
+    transmission, and the detector is 'photon' (the default) or 'energy'
+    counting. The curves are turned into a matrix of weights on a wavelength
+    grid, cached for each grid, so many spectra are convolved through every
+    band with one matrix product. The fluxes are lambda F_lambda at the
+    wavelength of the band in erg/s/cm**2, as returned by unitConversion.
+"""
+
+import configparser
+import hashlib
+import numpy as np
+from . import globs
+
+curveCache = {}
+matrixCache = {}
+
+def filters():
+    """
+        Lists the bands with transmission curves.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                filters : dictionary
+                Maps (source, wavelength) to the (file, detector) of the
+                band.
+    """
+    result = {}
+
+    for source in globs.phSources:
+        conf = configparser.ConfigParser()
+        conf.read("{}{}.ini".format(globs.confPath, source))
+
+        if not conf.has_option('synphot', 'curves'):
+            continue
+
+        waves = [float(w) for w in conf['reduce']['wave'].split()]
+        curves = conf['synphot']['curves'].split()
+        detector = conf['synphot'].get('detector', 'photon')
+
+        if len(curves) != len(waves):
+            globs.logger.error("{} has {} transmission curves for {} bands.".format(source, len(curves), len(waves)))
+            continue
+
+        for wave, curve in zip(waves, curves):
+            result[(source, wave)] = (curve, detector)
+
+    return result
+
+def loadCurve(filename):
+    """
+        Loads and caches a transmission curve.
+
+        Parameters
+        ----------
+                filename : string
+                The file of the curve.
+
+        Returns
+        ----------
+                wave : numpy array
+                The sorted wavelengths in microns.
+
+                trans : numpy array
+                The transmission.
+    """
+    if filename not in curveCache:
+        data = np.loadtxt(filename, ndmin=2)
+        order = np.argsort(data[:, 0])
+        curveCache[filename] = (data[order, 0], np.clip(data[order, 1], 0, None))
+
+    return curveCache[filename]
+
+def bandWeights(wave, curve, detector, bandWave):
+    """
+        The weights of one band on a wavelength grid, the synthetic flux is
+        the dot product of the weights with lambda F_lambda on the grid. The
+        spectrum is interpolated linearly onto the wavelengths of the curve
+        and integrated with the trapezium rule there, so the grid may be
+        coarser than the curve.
+
+        Parameters
+        ----------
+                wave : numpy array
+                The sorted wavelengths of the grid in microns.
+
+                curve : tuple
+                The wavelengths and transmission of the curve.
+
+                detector : string
+                'photon' or 'energy'.
+
+                bandWave : float
+                The wavelength of the band in microns.
+
+        Returns
+        ----------
+                weights : numpy array
+                The weights, None if the curve is not inside the grid.
+    """
+    cWave, trans = curve
+
+    if cWave[0] < wave[0] or cWave[-1] > wave[-1] or len(cWave) < 2:
+        return None
+
+    # the trapezium rule on the sampling of the curve
+    dWave = np.zeros(len(cWave))
+    dWave[:-1] += 0.5 * np.diff(cWave)
+    dWave[1:] += 0.5 * np.diff(cWave)
+
+    response = trans * cWave if detector == 'photon' else trans
+    norm = (response * dWave).sum()
+
+    if norm <= 0:
+        return None
+
+    # F_lambda = lambda F_lambda / lambda on the curve
+    coeff = bandWave * response * dWave / cWave / norm
+
+    idx = np.clip(np.searchsorted(wave, cWave, 'right'), 1, len(wave) - 1)
+    frac = (cWave - wave[idx - 1]) / (wave[idx] - wave[idx - 1])
+
+    weights = np.zeros(len(wave))
+    np.add.at(weights, idx - 1, coeff * (1 - frac))
+    np.add.at(weights, idx, coeff * frac)
+
+    return weights
+
+def matrix(wave, bandList=None):
+    """
+        Builds, or returns from the cache, the matrix of weights of the bands
+        on a wavelength grid.
+
+        Parameters
+        ----------
+                wave : numpy array
+                The sorted wavelengths of the grid in microns.
+
+                bandList : list, optional
+                The (source, wavelength) of the bands, defaults to every band
+                with a transmission curve.
+
+        Returns
+        ----------
+                weights : numpy array
+                The weights, shape (len(bandList), len(wave)), rows of zeros
+                for unusable bands.
+
+                valid : numpy array
+                True for the bands with a curve inside the grid.
+
+                bandList : list
+                The bands of the rows.
+    """
+    wave = np.asarray(wave, dtype=float)
+    curves = filters()
+    bandList = sorted(curves, key=lambda band: band[1]) if bandList is None else list(bandList)
+
+    key = (hashlib.sha1(wave.tobytes()).hexdigest(), tuple(bandList))
+
+    if key not in matrixCache:
+        weights = np.zeros((len(bandList), len(wave)))
+        valid = np.zeros(len(bandList), dtype=bool)
+
+        for i, band in enumerate(bandList):
+            if band not in curves:
+                continue
+
+            filename, detector = curves[band]
+            row = bandWeights(wave, loadCurve(filename), detector, band[1])
+
+            if row is not None:
+                weights[i], valid[i] = row, True
+
+        matrixCache[key] = (weights, valid, bandList)
+
+    return matrixCache[key]
+
+def standardGrid():
+    """
+        The standard grid spectra are rebinned onto, globs.synBins bins over
+        the range globs.synRange in microns.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                edges : numpy array
+                The edges of the bins.
+
+                centres : numpy array
+                The centres of the bins.
+    """
+    from . import resample as rs
+
+    return rs.logGrid(globs.synRange[0], globs.synRange[1], globs.synBins)
+
+def synthesiseMany(flux, err=None, wave=None, bandList=None):
+    """
+        Convolves many spectra on a common grid through the bands.
+
+        Parameters
+        ----------
+                flux : numpy array or masked array
+                The spectra in lambda F_lambda, shape (nSpectra, nGrid), i.e.
+                a stack from resample.stack, masked where not covered.
+
+                err : numpy array or masked array, optional
+                The errors of the spectra.
+
+                wave : numpy array, optional
+                The wavelengths of the grid, defaults to the centres of the
+                standard grid.
+
+                bandList : list, optional
+                The bands, see matrix.
+
+        Returns
+        ----------
+                fluxes : numpy array
+                The synthetic fluxes, shape (nSpectra, nBands), nan where the
+                spectrum covers less than globs.synCoverage of the band.
+
+                errs : numpy array
+                The errors of the synthetic fluxes, None if err is None.
+
+                bandList : list
+                The bands of the columns.
+    """
+    if wave is None:
+        wave = standardGrid()[1]
+
+    weights, valid, bandList = matrix(wave, bandList)
+
+    mask = np.ma.getmaskarray(flux) | ~np.isfinite(np.ma.filled(flux, np.nan))
+    filled = np.where(mask, 0.0, np.ma.filled(flux, 0.0))
+
+    fluxes = filled.dot(weights.T)
+
+    total = weights.sum(axis=1)
+    covered = (~mask).astype(float).dot(weights.T) / np.where(total > 0, total, 1.0)
+    bad = (covered < globs.synCoverage) | ~valid[None, :]
+    fluxes[bad] = np.nan
+
+    errs = None
+    if err is not None:
+        sigma = np.where(mask, 0.0, np.nan_to_num(np.ma.filled(err, 0.0)))
+        errs = np.sqrt((sigma**2).dot((weights**2).T))
+        errs[bad] = np.nan
+
+    return fluxes, errs, bandList
+
+def synthesise(wave, flux, err=None, bandList=None):
+    """
+        Convolves one spectrum through the bands, rebinning it onto the
+        standard grid first.
+
+        Parameters
+        ----------
+                wave : array
+                The wavelengths of the spectrum in microns.
+
+                flux : array
+                The spectrum in lambda F_lambda.
+
+                err : array, optional
+                The errors of the spectrum.
+
+                bandList : list, optional
+                The bands, see matrix.
+
+        Returns
+        ----------
+                fluxes, errs, bandList : see synthesiseMany, for one spectrum.
+    """
+    from . import resample as rs
+
+    edges, centres = standardGrid()
+
+    wave = np.asarray(wave, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+    err = np.zeros(len(wave)) if err is None else np.asarray(err, dtype=float)
+
+    binFlux, binErr, mask = rs.rebin(wave, flux, err, edges)
+
+    fluxes, errs, bandList = synthesiseMany(np.ma.array(binFlux[None, :], mask=mask[None, :]), np.ma.array(binErr[None, :], mask=mask[None, :]), centres, bandList)
+
+    return fluxes[0], errs[0], bandList
+
+def fillGaps(photo, spec, specSource='iso'):
+    """
+        Synthesises the bands an object has no photometry in from its
+        spectrum.
+
+        Parameters
+        ----------
+                photo : dictionary
+                The photometry, see dataStruct.buildPhStruct.
+
+                spec : dictionary
+                The spectroscopy, see dataStruct.buildSpStruct.
+
+                specSource : string, optional
+                The spectroscopic source to use.
+
+        Returns
+        ----------
+                synth : dictionary
+                The 'wave' and 'flux' (astropy.units ufloats, as in the data
+                structure) of the synthesised bands of each source.
+    """
+    from uncertainties import ufloat
+    from astropy import units as u
+
+    if specSource not in spec or not spec[specSource]['flux']:
+        return {}
+
+    missing = []
+    for source, wave in sorted(filters(), key=lambda band: band[1]):
+        have = photo.get(source, {}).get('wave') or []
+        if not any(np.isclose(wave, w) for w in have):
+            missing.append((source, wave))
+
+    if not missing:
+        return {}
+
+    sp = spec[specSource]
+    fluxes, errs, bandList = synthesise(sp['wave'], [x.value.n for x in sp['flux']], [x.value.s for x in sp['flux']], missing)
+
+    synth = {}
+    for (source, wave), f, e in zip(bandList, fluxes, errs):
+        if np.isfinite(f):
+            entry = synth.setdefault(source, {'wave': [], 'flux': []})
+            entry['wave'].append(wave)
+            entry['flux'].append(ufloat(f, e) * (u.erg/u.s/u.cm**2))
+
+    globs.logger.info("Synthesised {} bands for {} from the {} spectrum.".format(sum(len(s['wave']) for s in synth.values()), globs.name, specSource))
+
+    return synth
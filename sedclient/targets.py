@@ -0,0 +1,280 @@
+"""
+    This module prepares whole target lists for the SED builders. The
+    positions are converted to Galactic coordinates with a single vectorised
+    transform and E(B-V) with its uncertainty is interpolated from a dust map
+    stored locally at globs.dustMap. The dust map is a .npy array of shape
+    (2, nb, nl) holding E(B-V) and its error on a grid of Galactic longitude
+    l = 360 * i / nl and latitude b = -90 + 180 * j / (nb - 1), which is
+    memory mapped so only the pixels needed are read.
+"""
+
+import csv
+import numpy as np
+from uncertainties import ufloat
+from . import globs
+
+mapCache = {}
+
+dtype = [('name', 'U64'), ('ra', 'f8'), ('dec', 'f8'), ('l', 'f8'), ('b', 'f8'), ('ebv', 'f8'), ('ebv_err', 'f8')]
+
+def parseSexagesimal(values, hours):
+    """
+        Parses sexagesimal strings i.e. '06 19 58.2' or '-10:38:14.69' into
+        degrees without building an astropy object per value.
+
+        Parameters
+        ----------
+                values : list
+                The strings.
+
+                hours : bool
+                True if the values are in hours i.e. right ascensions.
+
+        Returns
+        ----------
+                degrees : numpy array
+                The values in degrees.
+    """
+    fields = np.array([v.replace(':', ' ').split() for v in values], dtype=float)
+
+    if fields.ndim != 2 or fields.shape[1] != 3:
+        raise ValueError("Positions are not in 'd m s' format.")
+
+    sign = np.array([-1.0 if v.strip().startswith('-') else 1.0 for v in values])
+    degrees = sign * (np.abs(fields[:, 0]) + fields[:, 1] / 60.0 + fields[:, 2] / 3600.0)
+
+    return degrees * 15.0 if hours else degrees
+
+def toDegrees(ra, dec):
+    """
+        Converts positions in any format into degrees. Numbers, or strings of
+        numbers, are taken to be in degrees, other strings are parsed as
+        sexagesimal (hours for ra) and anything else is handed to astropy.
+
+        Parameters
+        ----------
+                ra : list or array
+                Right ascensions.
+
+                dec : list or array
+                Declinations.
+
+        Returns
+        ----------
+                ra : numpy array
+                Right ascensions in degrees.
+
+                dec : numpy array
+                Declinations in degrees.
+    """
+    ra = np.atleast_1d(np.asarray(ra))
+    dec = np.atleast_1d(np.asarray(dec))
+
+    if ra.dtype.kind in 'fiu':
+        return ra.astype(float), dec.astype(float)
+
+    try:
+        return ra.astype(float), dec.astype(float)
+    except ValueError:
+        pass
+
+    try:
+        return parseSexagesimal(list(ra), True), parseSexagesimal(list(dec), False)
+    except ValueError:
+        from astropy.coordinates import SkyCoord
+        from astropy import units as u
+
+        coords = SkyCoord(ra, dec, unit=(u.hourangle, u.deg))
+
+        return coords.ra.deg, coords.dec.deg
+
+def toGalactic(ra, dec):
+    """
+        Converts equatorial positions into Galactic coordinates with one
+        vectorised transform.
+
+        Parameters
+        ----------
+                ra : numpy array
+                Right ascensions in degrees.
+
+                dec : numpy array
+                Declinations in degrees.
+
+        Returns
+        ----------
+                l : numpy array
+                Galactic longitudes in degrees.
+
+                b : numpy array
+                Galactic latitudes in degrees.
+    """
+    from astropy.coordinates import SkyCoord
+    from astropy import units as u
+
+    gal = SkyCoord(ra=ra * u.deg, dec=dec * u.deg, frame='icrs').galactic
+
+    return gal.l.deg, gal.b.deg
+
+def loadDustMap():
+    """
+        Memory maps and caches the dust map at globs.dustMap.
+
+        Parameters
+        ----------
+                None
+
+        Returns
+        ----------
+                dust : numpy memmap
+                The dust map, shape (2, nb, nl).
+    """
+    if globs.dustMap not in mapCache:
+        mapCache[globs.dustMap] = np.load(globs.dustMap, mmap_mode='r')
+
+    return mapCache[globs.dustMap]
+
+def saveDustMap(ebv, ebvErr):
+    """
+        Writes a dust map to globs.dustMap.
+
+        Parameters
+        ----------
+                ebv : numpy array
+                E(B-V) on the (nb, nl) grid described in the module docstring.
+
+                ebvErr : numpy array
+                The error of E(B-V) on the same grid.
+
+        Returns
+        ----------
+                None
+    """
+    np.save(globs.dustMap, np.array([ebv, ebvErr], dtype='f4'))
+    mapCache.pop(globs.dustMap, None)
+
+def lookupEbv(l, b):
+    """
+        Bilinearly interpolates E(B-V) and its error from the dust map.
+
+        Parameters
+        ----------
+                l : numpy array
+                Galactic longitudes in degrees.
+
+                b : numpy array
+                Galactic latitudes in degrees.
+
+        Returns
+        ----------
+                ebv : numpy array
+                E(B-V) at each position.
+
+                ebvErr : numpy array
+                The error of E(B-V) at each position.
+    """
+    dust = loadDustMap()
+    nb, nl = dust.shape[1:]
+
+    x = np.mod(l, 360.0) * nl / 360.0
+    y = np.clip((np.asarray(b) + 90.0) * (nb - 1) / 180.0, 0, nb - 1)
+
+    i0 = np.floor(x).astype(int) % nl
+    i1 = (i0 + 1) % nl
+    j0 = np.minimum(np.floor(y).astype(int), nb - 2)
+    j1 = j0 + 1
+
+    fx = x - np.floor(x)
+    fy = y - j0
+
+    out = []
+    for layer in range(2):
+        grid = dust[layer]
+        out.append((1 - fx) * (1 - fy) * grid[j0, i0] + fx * (1 - fy) * grid[j0, i1] + (1 - fx) * fy * grid[j1, i0] + fx * fy * grid[j1, i1])
+
+    return out[0], out[1]
+
+def prepare(ra, dec, names=None):
+    """
+        Prepares a target table from a list of positions.
+
+        Parameters
+        ----------
+                ra : list or array
+                Right ascensions in any format, see toDegrees.
+
+                dec : list or array
+                Declinations in any format, see toDegrees.
+
+                names : list, optional
+                The names of the objects, defaults to the positions.
+
+        Returns
+        ----------
+                table : numpy structured array
+                The 'name', 'ra', 'dec', 'l', 'b', 'ebv' and 'ebv_err' of each
+                target, positions in degrees.
+    """
+    raDeg, decDeg = toDegrees(ra, dec)
+
+    table = np.zeros(len(raDeg), dtype=dtype)
+    table['ra'], table['dec'] = raDeg, decDeg
+    table['l'], table['b'] = toGalactic(raDeg, decDeg)
+    table['ebv'], table['ebv_err'] = lookupEbv(table['l'], table['b'])
+
+    if names is None:
+        table['name'] = ["J{:.5F}{:+.5F}".format(r, d) for r, d in zip(raDeg, decDeg)]
+    else:
+        table['name'] = names
+
+    globs.logger.info("Prepared {} targets.".format(len(table)))
+
+    return table
+
+def readTargets(filename):
+    """
+        Reads a csv target file with 'name', 'ra' and 'dec' columns and
+        prepares the target table. The duplicates are kept, see
+        dedup.dedupe.
+
+        Parameters
+        ----------
+                filename : string
+                The target file.
+
+        Returns
+        ----------
+                table : numpy structured array
+                The target table, see prepare.
+    """
+    with open(filename, 'r') as f:
+        rows = list(csv.DictReader(f))
+
+    ra = [row['ra'].strip() for row in rows]
+    dec = [row['dec'].strip() for row in rows]
+
+    return prepare(ra, dec, [row['name'].strip() for row in rows])
+
+def iterTargets(table):
+    """
+        Turns a target table into the dictionaries used by makeSED.setGlobs.
+
+        Parameters
+        ----------
+                table : numpy structured array
+                The target table.
+
+        Returns
+        ----------
+                targets : generator
+                Yields a dictionary per target.
+    """
+    for row in table:
+        target = {}
+        target['name'] = str(row['name'])
+        target['ra'] = float(row['ra'])
+        target['dec'] = float(row['dec'])
+        target['l'] = float(row['l'])
+        target['b'] = float(row['b'])
+        target['ebv'] = ufloat(float(row['ebv']), float(row['ebv_err']))
+        yield target
@@ -0,0 +1,133 @@
+"""
+    The client reads its survey configs and writes its logs relative to the
+    working directory when globs is imported, so the tests run in a
+    temporary directory holding two small survey configs, and every test
+    gets a fresh copy of it as its working directory.
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import pytest
+
+configs = {
+    'twomass': """[query]
+source=II/246
+radius=5
+max=1
+output=_r Jmag e_Jmag Hmag e_Hmag Kmag e_Kmag Qflg
+[reduce]
+wave=1.235 1.662 2.159
+zero=1594 1024 666.7
+units=u.mag
+types=float float float float float float float str
+exclude=_r arcmin
+[quality]
+qual=A B
+[plot]
+marker=o
+mfc=red
+mec=red
+label=2MASS
+""",
+    'iras': """[query]
+source=II/125
+radius=30
+max=1
+output=_r Fnu_12 Fnu_25 Fnu_60 Fnu_100
+[reduce]
+wave=12 25 60 100
+zero=0 0 0 0
+units=u.Jy
+types=float float float float float
+exclude=_r arcmin
+[quality]
+qual=3
+[plot]
+marker=s
+mfc=white
+mec=blue
+label=IRAS
+""",
+    'spec/iso': """[query]
+source=J/AJ/119/2114
+radius=10
+max=1
+output=_r TDT
+[plot]
+ls=-
+col=black
+lw=0.5
+label=ISO SWS
+""",
+}
+
+dataDirs = ['photometry', 'spectroscopy', 'sed', 'logfiles', 'grids', 'fits', 'raw', 'stamps', 'dust', 'iso']
+
+def makeWorkspace(root):
+    """
+        Builds the config and data directories the client expects.
+    """
+    os.makedirs(os.path.join(root, 'sedclient', 'config', 'spec'))
+    for source, text in configs.items():
+        with open(os.path.join(root, 'sedclient', 'config', '{}.ini'.format(source)), 'w') as f:
+            f.write(text)
+    for name in dataDirs:
+        os.makedirs(os.path.join(root, 'data', name))
+
+# globs is imported by the first test module, from this directory
+sessionDir = tempfile.mkdtemp(prefix='sedclient_')
+makeWorkspace(sessionDir)
+os.chdir(sessionDir)
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    """
+        Runs each test in a fresh workspace with the globs of the object
+        reset.
+    """
+    from sedclient import globs
+    from sedclient import targets
+
+    makeWorkspace(str(tmp_path))
+    targets.mapCache.clear()
+    monkeypatch.chdir(tmp_path)
+
+    for key in ['name', 'ra', 'dec', 'ebv', 'l', 'b']:
+        monkeypatch.setattr(globs, key, None)
+
+    yield tmp_path
+
+twomassResponse = """#
+#   VizieR Astronomical Server
+#RESOURCE=yCat_2246
+_r;Jmag;e_Jmag;Hmag;e_Hmag;Kmag;e_Kmag;Qflg
+arcmin;mag;mag;mag;mag;mag;mag;
+------;------;------;------;------;------;------;---
+0.020;9.50;0.02;9.10;0.03;8.90;0.02;AAA
+0.004;7.25;0.02;6.80;0.03;6.50;0.02;ABA
+"""
+
+@pytest.fixture
+def vizquery(workspace, monkeypatch):
+    """
+        Puts a vizquery on the path that prints a canned 2MASS response and
+        nothing for any other catalogue, returns the 2MASS response.
+    """
+    binDir = workspace / 'bin'
+    binDir.mkdir()
+
+    script = binDir / 'vizquery'
+    script.write_text("#! /bin/sh\ncase \"$*\" in\n*II/246*) cat <<'EOF'\n{}EOF\n;;\nesac\n".format(twomassResponse))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    monkeypatch.setenv('PATH', "{}{}{}".format(binDir, os.pathsep, os.environ['PATH']))
+
+    return twomassResponse
+
+def pytest_unconfigure(config):
+    """
+        Removes the session workspace.
+    """
+    shutil.rmtree(sessionDir, ignore_errors=True)
@@ -0,0 +1,64 @@
+"""
+    Tests of the bolometric flux integration.
+"""
+
+import os
+import numpy as np
+from sedclient import bolometric
+from sedclient import globs
+
+def planck(wave, temp):
+    """
+        lambda F_lambda of a blackbody, whose integral over ln(lambda) is
+        (pi**4 / 15) / a**4.
+    """
+    a = 14387.77 / temp
+    return wave**-4 / np.expm1(a / wave)
+
+def test_blackbody_with_tails():
+    temp = 5000.0
+    exact = np.pi**4 / 15 / (14387.77 / temp)**4
+
+    wave = np.logspace(np.log10(0.3), 1.5, 300)
+    fbol, fbolErr = bolometric.integrate(wave, planck(wave, temp), np.zeros(300), [0, 300], 'wien', 'rj')
+
+    assert abs(fbol[0] / exact - 1) < 0.01
+
+    bare, bareErr = bolometric.integrate(wave, planck(wave, temp), np.zeros(300), [0, 300], 'none', 'none')
+
+    assert bare[0] < fbol[0]
+
+def test_rayleigh_jeans_tail_is_exact():
+    wave = np.logspace(1, 2, 2000)
+
+    fbol, fbolErr = bolometric.integrate(wave, wave**-3.0, np.zeros(2000), [0, 2000], 'none', 'rj')
+
+    assert abs(fbol[0] * 3000 - 1) < 1e-5
+
+def test_ragged_objects():
+    # object 0 is shuffled, object 1 has one point, object 2 has none and
+    # object 3 has an unusable point
+    wave = np.array([np.e, 1.0, 5.0, 1.0, np.e, 2.0])
+    flux = np.array([4.0, 2.0, 1.0, 2.0, 4.0, -1.0])
+    err = np.array([0.4, 0.2, 0.1, 0.2, 0.4, 0.1])
+    offsets = np.array([0, 2, 3, 3, 6])
+
+    fbol, fbolErr = bolometric.integrate(wave, flux, err, offsets, 'none', 'none')
+
+    assert np.allclose(fbol[[0, 3]], 3.0)
+    assert np.allclose(fbolErr[[0, 3]], np.hypot(0.1, 0.2))
+    assert np.isnan(fbol[1]) and np.isnan(fbol[2])
+
+def test_segment_sum_of_empty_objects():
+    assert bolometric.segmentSum(np.array([1.0, 2.0, 3.0]), np.array([0, 0, 2, 2, 3])).tolist() == [0.0, 3.0, 0.0, 3.0]
+
+def test_archive():
+    for name, fluxes in [('obj_a', "2 0.2 4 0.4"), ('obj_b', "2 0.2 nan nan")]:
+        with open(os.path.join(globs.dirPh, name), 'w') as f:
+            f.write("[meta]\nname = {}\n[iras]\nwave = 12 25\nfluxes = {}\n".format(name, fluxes))
+
+    table = bolometric.archive(chunkSize=1, blue='none', red='none')
+
+    assert table['npts'].tolist() == [2, 1]
+    assert np.isclose(table['fbol'][0], 3.0 * np.log(25.0 / 12.0))
+    assert np.isnan(table['fbol'][1])
@@ -0,0 +1,85 @@
+"""
+    Tests of the survey coverage checks.
+"""
+
+import json
+import numpy as np
+import pytest
+from sedclient import coverage
+from sedclient import download
+from sedclient import globs
+from sedclient import pipeline
+
+@pytest.fixture(autouse=True)
+def clearMocs():
+    coverage.mocCache.clear()
+    yield
+    coverage.mocCache.clear()
+
+def test_base_pixels():
+    ra = np.array([45.0, 135.0, 225.0, 315.0, 0.0, 90.0, 180.0, 270.0, 45.0, 135.0, 225.0, 315.0])
+    dec = np.array([60.0] * 4 + [0.0] * 4 + [-60.0] * 4)
+
+    assert coverage.ang2pixNest(0, ra, dec).tolist() == list(range(12))
+
+def test_children_share_the_parent():
+    ra, dec = np.random.default_rng(1).uniform(0, 360, 1000), np.random.default_rng(2).uniform(-90, 90, 1000)
+
+    assert np.array_equal(coverage.ang2pixNest(6, ra, dec) >> 12, coverage.ang2pixNest(0, ra, dec))
+
+def test_contains_at_mixed_orders():
+    # face 4 at order 0 and the north pole cell of face 0 at order 1
+    moc = {0: np.array([4]), 1: np.array([3])}
+
+    inside = coverage.contains(moc, [0.0, 180.0, 45.0, 45.0], [0.0, 0.0, 89.0, 10.0])
+
+    assert inside.tolist() == [True, False, True, False]
+
+def test_empty_map_covers_nothing():
+    assert coverage.contains({}, [0.0, 10.0], [0.0, 5.0]).tolist() == [False, False]
+
+def writeMoc(cells):
+    with open('moc.json', 'w') as f:
+        json.dump(cells, f)
+
+    with open('{}twomass.ini'.format(globs.confPath), 'a') as f:
+        f.write("\n[coverage]\nmoc=moc.json\n")
+
+def test_empty_moc_file_covers_nothing():
+    writeMoc({'0': []})
+
+    assert coverage.covers('twomass', 10.0, 5.0).tolist() == [False]
+
+def test_cover_targets_in_chunks():
+    writeMoc({'0': [4]})
+    targets = [{'name': 'obj {}'.format(k), 'ra': ra, 'dec': 0.0} for k, ra in enumerate([0.0, 180.0, 10.0])]
+
+    covered = list(coverage.coverTargets(targets, chunkSize=2))
+
+    assert [target['name'] for target, cover in covered] == ['obj 0', 'obj 1', 'obj 2']
+    assert [cover['twomass'] for target, cover in covered] == [True, False, True]
+    assert all(cover['iras'] and cover['iso'] for target, cover in covered)
+
+def test_fetch_skips_uncovered_sources(monkeypatch):
+    queried = []
+    monkeypatch.setattr(download, 'query', lambda params, timeout=None: queried.append(params['source']) or ['row'])
+    monkeypatch.setattr(download, 'fetchSp', lambda source, ra=None, dec=None: 'spectrum')
+
+    target = {'name': 'obj a', 'ra': 10.0, 'dec': 5.0}
+    covered = dict((source, source != 'twomass') for source in globs.phSources + globs.specSources)
+
+    raw = pipeline.fetch(target, covered)
+
+    assert raw['twomass'] == []
+    assert raw['iras'] == ['row']
+    assert raw['iso'] == 'spectrum'
+    assert len(queried) == 1
+
+def test_covers_positions_in_any_format():
+    writeMoc({'0': [4]})
+
+    # numbers as strings are degrees, as for the targets
+    assert coverage.covers('twomass', ['180.0', '10.0'], ['0.0', '0.0']).tolist() == [False, True]
+    assert coverage.covers('twomass', '00 40 00', '+00 00 00').tolist() == [True]
+    assert coverage.coverageMask(['twomass'], ['180.0'], ['0.0'])['twomass'].tolist() == [False]
+
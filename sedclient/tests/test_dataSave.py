@@ -0,0 +1,85 @@
+"""
+    Tests of the saving of the reduced data.
+"""
+
+import configparser
+import os
+import pytest
+from uncertainties import ufloat
+from sedclient import dataSave
+from sedclient import globs
+from sedclient import load
+
+class Point:
+    """
+        class for a flux with the value attribute of an astropy quantity.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+@pytest.fixture(autouse=True)
+def target():
+    globs.name, globs.ra, globs.dec, globs.l, globs.b, globs.ebv = 'obj a', 10.0, 5.0, 120.0, -57.0, ufloat(0.1, 0.01)
+    dataSave.pending.clear()
+    yield
+    dataSave.pending.clear()
+
+def readFile():
+    conf = configparser.ConfigParser(strict=False)
+    conf.read(os.path.join(globs.dirPh, 'obj_a'))
+    return conf
+
+def test_resaving_replaces_the_section():
+    dataSave.savePh([Point(ufloat(1.0, 0.1)), Point(ufloat(2.0, 0.2))], [12.0, 25.0], 'iras')
+    dataSave.savePh([Point(ufloat(3.0, 0.3))], [1.235], 'twomass')
+    dataSave.savePh([Point(ufloat(5.0, 0.5))], [60.0], 'iras')
+
+    conf = readFile()
+
+    assert conf['iras']['wave'].split() == ['60.0']
+    assert conf['twomass']['wave'].split() == ['1.235']
+    assert conf['meta']['name'] == 'obj a'
+    assert conf['meta']['ebv_err'] == '0.01'
+
+def test_no_data_leaves_an_empty_section():
+    dataSave.savePh(None, None, 'iras')
+
+    assert readFile().has_section('iras')
+    assert not readFile().has_option('iras', 'wave')
+
+def test_batch_save_waits_for_flush(monkeypatch):
+    monkeypatch.setattr(globs, 'batchSave', True)
+    monkeypatch.setattr(globs, 'flushEvery', 2)
+
+    dataSave.savePh([Point(ufloat(1.0, 0.1))], [12.0], 'iras')
+    assert not os.path.exists(os.path.join(globs.dirPh, 'obj_a'))
+
+    globs.name = 'obj b'
+    dataSave.savePh([Point(ufloat(1.0, 0.1))], [12.0], 'iras')
+
+    assert sorted(os.listdir(globs.dirPh)) == ['obj_a', 'obj_b']
+    assert dataSave.pending == {}
+
+def test_failed_write_keeps_the_original():
+    filename = os.path.join(globs.dirPh, 'obj_a')
+    dataSave.atomicWrite(filename, lambda f: f.write("original\n"))
+
+    def fail(f):
+        f.write("partial")
+        raise IOError("disk full")
+
+    with pytest.raises(IOError):
+        dataSave.atomicWrite(filename, fail)
+
+    with open(filename) as f:
+        assert f.read() == "original\n"
+    assert os.listdir(globs.dirPh) == ['obj_a']
+
+def test_names_with_percent_signs():
+    globs.name = 'obj 50%'
+    dataSave.savePh([Point(ufloat(1.0, 0.1))], [12.0], 'iras')
+    dataSave.saveFlags({'obj_50%': {'iras': [12.0]}})
+
+    assert load.loadMeta('obj 50%')['name'] == 'obj 50%'
+    assert load.loadFlags('iras') == [12.0]
@@ -0,0 +1,71 @@
+"""
+    Tests of the de-duplication of target lists.
+"""
+
+import json
+import os
+import numpy as np
+from sedclient import dedup
+from sedclient import globs
+from sedclient import targets
+
+def makeTable(rows):
+    return np.array(rows, dtype=[('name', 'U64'), ('ra', 'f8'), ('dec', 'f8')])
+
+def test_neighbours_within_radius():
+    ra, dec = np.array([10.0, 10.0, 50.0]), np.array([5.0, 5.0 + 1.0 / 3600, 5.0])
+
+    i, j = dedup.neighbours(ra, dec, ra, dec, 2.0)
+    pairs = set(zip(i.tolist(), j.tolist()))
+
+    assert pairs == {(0, 0), (0, 1), (1, 0), (1, 1), (2, 2)}
+
+def test_name_reused_for_another_object():
+    # a and b are one object, the second a is a different one
+    table = makeTable([('a', 10.0, 5.0), ('b', 10.0, 5.0), ('c', 30.0, 5.0), ('a', 50.0, 5.0)])
+
+    out, aliases = dedup.dedupe(table, stored=False, radius=2.0)
+
+    assert out['name'].tolist() == ['a', 'c', 'a_2']
+    assert aliases == {'b': 'a'}
+    assert dedup.resolve('a') == 'a'
+    assert dedup.resolve('b') == 'a'
+
+def test_canonical_name_is_not_an_alias():
+    # y is merged into x but is also the name of a second object
+    table = makeTable([('x', 10.0, 5.0), ('y', 10.0, 5.0), ('y', 50.0, 5.0)])
+
+    out, aliases = dedup.dedupe(table, stored=False, radius=2.0)
+
+    assert out['name'].tolist() == ['x', 'y']
+    assert aliases == {}
+    assert dedup.resolve('y') == 'y'
+
+def test_stored_object_names_the_group(monkeypatch):
+    monkeypatch.setattr(dedup, 'storedObjects', lambda: (['obj_a', 'star'], np.array([10.0, 70.0]), np.array([5.0, 5.0])))
+    table = makeTable([('other name', 10.0, 5.0), ('obj a', 30.0, 5.0)])
+
+    out, aliases = dedup.dedupe(table, radius=2.0)
+
+    # obj a would share the file of the stored obj_a
+    assert out['name'].tolist() == ['obj_a', 'obj a_2']
+    assert aliases == {'other name': 'obj_a'}
+
+def test_earlier_alias_dropped_once_canonical():
+    with open(globs.aliasPath, 'w') as f:
+        json.dump({'y': 'x', 'z': 'x'}, f)
+
+    dedup.dedupe(makeTable([('y', 50.0, 5.0)]), stored=False, radius=2.0)
+
+    assert dedup.loadAliases() == {'z': 'x'}
+
+def test_reading_targets_has_no_side_effects():
+    targets.saveDustMap(np.full((19, 36), 0.1), np.full((19, 36), 0.01))
+
+    with open('targets.csv', 'w') as f:
+        f.write("name,ra,dec\nobj a,10.0,5.0\nobj b,10.0,5.0\n")
+
+    table = targets.readTargets('targets.csv')
+
+    assert table['name'].tolist() == ['obj a', 'obj b']
+    assert not os.path.exists(globs.aliasPath)
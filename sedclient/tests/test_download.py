@@ -0,0 +1,72 @@
+"""
+    Tests of the queries and the reduction of their output, vizquery is
+    replaced by a script printing a canned response, see conftest.
+"""
+
+import pytest
+from uncertainties import ufloat
+from sedclient import deredden
+from sedclient import download
+from sedclient import globs
+
+def test_query_returns_text_lines(vizquery):
+    lines = download.query(download.queryParams('twomass', '10.0 5.0'))
+
+    assert all(isinstance(line, str) for line in lines)
+    assert lines == vizquery.split('\n')
+    assert download.query(download.queryParams('iras', '10.0 5.0')) == ['']
+
+def test_reduction_types_the_nearest_row(vizquery):
+    conf = download.configparser.ConfigParser()
+    conf.read("{}twomass.ini".format(globs.confPath))
+
+    kwargs = download.build_kwargs(vizquery.split('\n'), conf)
+    kwargs = download.checkTypes(**download.reduction(**kwargs))
+
+    assert kwargs['fluxes'] == [0.004, 7.25, 0.02, 6.80, 0.03, 6.50, 0.02, 'ABA']
+    assert [type(f) for f in kwargs['fluxes']] == [float] * 7 + [str]
+
+def test_reduction_brightest_policy(vizquery):
+    conf = download.configparser.ConfigParser()
+    conf.read("{}twomass.ini".format(globs.confPath))
+    lines = vizquery.replace('0.004', '0.040').split('\n')
+
+    assert download.reduction(**download.build_kwargs(lines, conf))['fluxes'][1] == 9.50
+
+    conf['reduce']['select'] = 'brightest Jmag'
+
+    assert download.reduction(**download.build_kwargs(lines, conf))['fluxes'][1] == 7.25
+
+def test_reduction_without_rows(vizquery):
+    conf = download.configparser.ConfigParser()
+    conf.read("{}twomass.ini".format(globs.confPath))
+
+    kwargs = download.reduction(**download.build_kwargs(vizquery.split('\n')[:6], conf))
+
+    assert kwargs['fluxes'] is None
+
+def test_getTDT_keeps_sws01():
+    result = "AOT;TDT\n;\n---;---\nSWS06;11111111\nSWS01;22222222\nSWS01;33333333\n".split('\n')
+
+    assert download.getTDT(result) == '22222222'
+    assert download.getTDT(result[:4]) is None
+
+def test_fetchISO_refuses_offline(monkeypatch):
+    monkeypatch.setattr(globs, 'offline', True)
+
+    with pytest.raises(RuntimeError):
+        download.fetchISO('http://irsa.ipac.caltech.edu/data/SWS/spectra/sws/00000000_sws.txt')
+
+def test_extinction_curve():
+    ext = deredden.extinction([0.44, 0.55, 2.2, 12.0])
+
+    assert ext[1] == pytest.approx(globs.rv, abs=0.01)
+    assert ext[0] - ext[1] == pytest.approx(1.0, abs=0.05)
+    assert ext[1] > ext[2] > ext[3] > 0
+
+def test_dered_propagates_ebv():
+    flux = deredden.dered([0.55, 12.0], [1.0, 2.0], ufloat(0.5, 0.1))
+
+    assert flux[0].n == pytest.approx(10**(0.2 * deredden.extinction([0.55])[0]))
+    assert flux[0].s > 0
+    assert flux[1].n == pytest.approx(2.0, rel=0.05)
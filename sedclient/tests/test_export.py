@@ -0,0 +1,48 @@
+"""
+    Tests of the export of the photometry archive.
+"""
+
+import os
+import subprocess
+import sys
+from sedclient import export
+from sedclient import globs
+from sedclient import load
+
+bands = [('twomass', 1.235), ('twomass', 1.662), ('twomass', 2.159), ('iras', 12.0), ('iras', 25.0), ('iras', 60.0), ('iras', 100.0)]
+
+def test_bands_sorted_by_wavelength():
+    assert load.bands() == bands
+
+def test_columns_follow_the_bands():
+    dtype, bandCols = export.columns()
+    names = [name for name, kind in dtype]
+
+    assert names[:len(export.metaColumns)] == [name for name, kind in export.metaColumns]
+    for source, wave in bands:
+        assert names[bandCols[(source, wave)]] == "{}_{}".format(source, wave)
+        assert names[bandCols[(source, wave)] + 1] == "{}_{}_err".format(source, wave)
+
+def test_export_does_not_import_fit():
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    code = "import sys; sys.path.insert(0, {!r}); import sedclient.export; print('sedclient.fit' in sys.modules)".format(root)
+
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+
+    assert result.stdout.strip() == 'False', result.stderr
+
+def test_archive_to_csv():
+    with open(os.path.join(globs.dirPh, 'obj_a'), 'w') as f:
+        f.write("[meta]\nname = obj a\nra = 10.0\ndec = 5.0\nebv = 0.1\n[iras]\nwave = 12 25\nfluxes = 1e-12 1e-13 2e-12 2e-13\n")
+
+    export.export('archive.csv')
+
+    with open('archive.csv') as f:
+        header, row = [line.rstrip('\n').split(',') for line in f]
+
+    values = dict(zip(header, row))
+
+    assert values['name'] == 'obj a'
+    assert float(values['iras_25.0']) == 2e-12
+    assert float(values['iras_25.0_err']) == 2e-13
+    assert values['twomass_1.235'] in ('', 'nan')
@@ -0,0 +1,51 @@
+"""
+    Tests of the model grid fits.
+"""
+
+import numpy as np
+from uncertainties import ufloat
+from sedclient import fit
+
+class Point:
+    """
+        class for a flux with the value attribute of an astropy quantity.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+def makePhoto(flux):
+    photo = {}
+
+    for source, wave in [('twomass', [1.235, 1.662, 2.159]), ('iras', [12.0, 25.0, 60.0, 100.0])]:
+        photo[source] = {'wave': wave, 'flux': [Point(ufloat(f, 0.01 * f)) for f in flux(np.array(wave))]}
+
+    return photo
+
+def test_modified_blackbody_fit():
+    fit.buildModBB('mbb', [300.0, 500.0, 1000.0], [1.5, 2.0])
+
+    photo = makePhoto(lambda wave: 1e-3 * fit.modBlackbody(wave, 500.0, 2.0))
+    best = fit.fitSED(photo, ['mbb'])[0]
+
+    assert (best['params']['temp'], best['params']['beta']) == (500.0, 2.0)
+    assert best['chi2'] < 1e-3
+    # wave0 is fixed, only the temperature, beta and scale are fitted
+    assert best['dof'] == 7 - 3
+
+def test_fixed_parameters_are_not_counted():
+    params = np.zeros(4, dtype=[('temp', 'f8'), ('beta', 'f8'), ('wave0', 'f8')])
+    params['temp'], params['beta'], params['wave0'] = [10, 20, 10, 20], [1, 1, 2, 2], 100.0
+
+    assert fit.freeParams(params) == 2
+    assert fit.freeParams(params[:1]) == 0
+
+def test_chi_square_solves_the_scale():
+    models = np.array([[1.0, 2.0, 3.0], [3.0, 2.0, 1.0]])
+    flux = np.array([[2.0, 4.0, 6.0], [1.5, 1.0, 0.5]])
+
+    best, scale, chi2 = fit.chiSquare(models, flux, np.ones_like(flux))
+
+    assert best.tolist() == [0, 1]
+    assert np.allclose(scale, [2.0, 0.5])
+    assert np.allclose(chi2, 0.0)
@@ -0,0 +1,67 @@
+"""
+    Tests of the local index of the ISO SWS01 observations.
+"""
+
+import os
+import numpy as np
+from sedclient import isoIndex
+from sedclient import globs
+
+dump = """#RESOURCE=yCat_0000
+AOT;TDT;RAJ2000;DEJ2000
+---;---;---;---
+SWS01;12345678;10.0;-5.0
+SWS06;22222222;10.0;-5.0
+SWS01;2345;200.0;30.0
+SWS01;33333333;10.0;-4.999
+"""
+
+def buildIndex(tmp_path):
+    path = str(tmp_path / 'iso.csv')
+    with open(path, 'w') as f:
+        f.write(dump)
+    isoIndex.indexCache.clear()
+    isoIndex.build(path)
+
+def test_build_keeps_sws01_sorted(tmp_path):
+    buildIndex(tmp_path)
+
+    index = isoIndex.loadIndex()
+
+    assert isoIndex.available()
+    assert sorted(index['tdt'].tolist()) == ['00002345', '12345678', '33333333']
+    assert np.all(np.diff(index['dec']) >= 0)
+
+def test_lookup_nearest_within_radius(tmp_path):
+    buildIndex(tmp_path)
+
+    assert isoIndex.searchRadius() == 10.0
+    assert isoIndex.lookup(10.0, -5.0) == '12345678'
+    assert isoIndex.lookup(10.0, -4.9991) == '33333333'
+    assert isoIndex.lookup(200.0, 30.0) == '00002345'
+    assert isoIndex.lookup(50.0, 0.0) is None
+
+def test_lookup_many_matches_single(tmp_path):
+    buildIndex(tmp_path)
+
+    ra = np.array([10.0, 50.0, 200.0, 10.0])
+    dec = np.array([-5.0, 0.0, 30.0, -4.9991])
+
+    tdt = isoIndex.lookupMany(ra, dec, chunkSize=3)
+
+    assert tdt.tolist() == ['12345678', '', '00002345', '33333333']
+    assert tdt.tolist() == [isoIndex.lookup(r, d) or '' for r, d in zip(ra, dec)]
+
+def test_fetch_cached(tmp_path):
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        return [b'1.0 2.0\n', b'3.0 4.0\n']
+
+    first = isoIndex.fetchCached('12345678', fetch)
+    second = isoIndex.fetchCached('12345678', fetch)
+
+    assert first == second == ['1.0 2.0\n', '3.0 4.0\n']
+    assert len(calls) == 1 and calls[0].endswith('12345678_sws.txt')
+    assert os.path.exists("{}12345678_sws.txt".format(globs.dirIso))
@@ -0,0 +1,60 @@
+"""
+    Tests of the run journal.
+"""
+
+import multiprocessing
+import pytest
+from sedclient import dataStruct
+from sedclient import globs
+from sedclient import journal
+
+@pytest.fixture
+def journalPath(monkeypatch):
+    monkeypatch.setattr(globs, 'journalPath', 'journal.db')
+    yield 'journal.db'
+
+    for key in list(journal.conn):
+        journal.conn.pop(key).close()
+
+def markInChild(path):
+    globs.journalPath = path
+    journal.mark('obj b', journal.allSources, journal.sedStage, 'done')
+
+def test_forked_worker_opens_its_own_connection(journalPath):
+    journal.mark('obj a', journal.allSources, journal.sedStage, 'done')
+    parent = journal.connect()
+
+    child = multiprocessing.get_context('fork').Process(target=markInChild, args=(journalPath,))
+    child.start()
+    child.join(30)
+
+    assert child.exitcode == 0
+    assert journal.connect() is parent
+    assert journal.isDone('obj a')
+    assert journal.isDone('obj b')
+
+def test_connection_keyed_by_process(journalPath, monkeypatch):
+    parent = journal.connect()
+    monkeypatch.setattr(journal.os, 'getpid', lambda: -1)
+
+    assert journal.connect() is not parent
+
+def test_failed_source_is_recorded_and_raised(journalPath):
+    globs.name = 'obj a'
+
+    def fail(source):
+        raise IOError("no answer")
+
+    with pytest.raises(IOError):
+        dataStruct.downSource({}, fail, ['twomass'])
+
+    assert journal.status('obj a', 'twomass', 'reduce') == 'failed'
+
+def test_failed_source_raised_without_journal():
+    globs.name = 'obj a'
+
+    def fail(source):
+        raise IOError("no answer")
+
+    with pytest.raises(IOError):
+        dataStruct.downSource({}, fail, ['twomass'])
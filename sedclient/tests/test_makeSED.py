@@ -0,0 +1,40 @@
+"""
+    Tests of setting the object of a build.
+"""
+
+import importlib
+import sys
+from uncertainties import ufloat
+import sedclient
+from sedclient import dataSave
+from sedclient import dataStruct
+from sedclient import download
+from sedclient import globs
+from sedclient import journal
+from sedclient import load
+from sedclient import makeSED
+
+target = {'name': 'obj a', 'ra': 10.0, 'dec': 5.0, 'l': 120.0, 'b': -57.0, 'ebv': ufloat(0.1, 0.01)}
+
+def test_setGlobs_reaches_every_module():
+    makeSED.setGlobs(target)
+
+    for module in [dataSave, dataStruct, download, journal, load]:
+        assert module.globs is globs
+        assert module.globs.name == 'obj a'
+        assert module.globs.ra == 10.0
+
+def test_saved_meta_uses_the_object():
+    makeSED.setGlobs(target)
+
+    meta = dataSave.metaEntries()
+
+    assert meta['name'] == 'obj a'
+    assert meta['ra'] == '10.0'
+    assert meta['ebv_err'] == '0.01'
+
+def test_one_globs_module():
+    for name in sedclient.All + ['makeSED', 'unitConversion']:
+        importlib.import_module('sedclient.{}'.format(name))
+
+    assert 'globs' not in sys.modules
@@ -0,0 +1,93 @@
+"""
+    Tests of the merged photometry and spectra of the archive.
+"""
+
+import os
+import numpy as np
+from sedclient import globs
+from sedclient import merged
+
+def test_spectra_of_names_with_spaces():
+    with open(os.path.join(globs.dirPh, 'obj_a'), 'w') as f:
+        f.write("[meta]\nname = obj a\nra = 10.0\ndec = 5.0\n")
+
+    with open(os.path.join(globs.dirSp, 'obj_a_iso'), 'w') as f:
+        f.write("2.5,1e-12,1e-13\n3.5,2e-12,1e-13\n")
+
+    batch = merged.fromArchive()
+
+    assert batch.names == ['obj a']
+    assert np.allclose(batch.wave, [2.5, 3.5])
+    assert np.allclose(batch.flux, [1e-12, 2e-12])
+    assert [batch.sources[k] for k in batch.source] == ['iso', 'iso']
+    assert batch.offsets.tolist() == [0, 2]
+
+def test_photometry_only():
+    with open(os.path.join(globs.dirPh, 'obj_a'), 'w') as f:
+        f.write("[meta]\nname = obj a\n")
+
+    with open(os.path.join(globs.dirSp, 'obj_a_iso'), 'w') as f:
+        f.write("2.5,1e-12,1e-13\n")
+
+    assert len(merged.fromArchive(spectra=False).wave) == 0
+
+class Point:
+    """
+        class for a flux with the value attribute of an astropy quantity.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+def makeData(points):
+    from uncertainties import ufloat
+
+    return dict((source, {'wave': [w for w, f in rows], 'flux': [Point(ufloat(f, 0.1 * abs(f))) for w, f in rows]}) for source, rows in points.items())
+
+def test_merged_sed_range_and_interp():
+    photo = makeData({'twomass': [(2.159, 4.0), (1.235, 1.0)], 'iras': [(12.0, 8.0), (25.0, -1.0)]})
+    spec = makeData({'iso': [(5.0, 2.0), (8.0, 3.0)]})
+
+    sed = merged.MergedSED(photo, spec, name='obj a')
+
+    assert sed.wave.tolist() == [1.235, 2.159, 5.0, 8.0, 12.0]
+
+    points = sed.range(2.0, 10.0)
+    assert points['source'] == ['twomass', 'iso', 'iso']
+    assert sed.range(2.0, 10.0, ['iso'])['wave'].tolist() == [5.0, 8.0]
+
+    flux = sed.interp([1.235, np.sqrt(5.0 * 8.0), 0.5, 20.0])
+    assert np.allclose(flux[:2], [1.0, np.sqrt(6.0)])
+    assert np.isnan(flux[2:]).all()
+
+def test_batch_matches_each_object():
+    rng = np.random.default_rng(3)
+    counts = [5, 0, 1, 8]
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    wave = 10**rng.uniform(0, 2, offsets[-1])
+    flux = 10**rng.uniform(-1, 1, offsets[-1])
+
+    batch = merged.MergedBatch(['a', 'b', 'c', 'd'], wave, flux, 0.1 * flux, np.zeros(offsets[-1], dtype=int), offsets, ['twomass'])
+
+    stats = batch.rangeStats(['a', 'b', 'c', 'd'], 3.0, 30.0)
+
+    for i, name in enumerate('abcd'):
+        w, f = wave[offsets[i]:offsets[i + 1]], flux[offsets[i]:offsets[i + 1]]
+        inside = f[(w >= 3.0) & (w <= 30.0)]
+
+        assert stats['count'][i] == len(inside)
+        if len(inside):
+            assert np.isclose(stats['max'][i], inside.max())
+            assert np.isclose(stats['mean'][i], inside.mean())
+        else:
+            assert np.isnan(stats['mean'][i])
+
+    at = np.array([2.0, 10.0, 50.0])
+    flux = batch.interp(np.array([[0], [3]]), at[None, :])
+
+    for row, i in enumerate([0, 3]):
+        start, stop = batch.offsets[i], batch.offsets[i + 1]
+        sed = merged.MergedSED({}, name=str(i))
+        sed.setArrays(batch.wave[start:stop], batch.flux[start:stop], batch.err[start:stop], ['twomass'] * (stop - start))
+
+        assert np.allclose(flux[row * 3:row * 3 + 3], sed.interp(at), equal_nan=True)
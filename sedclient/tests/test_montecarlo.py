@@ -0,0 +1,54 @@
+"""
+    Tests of the Monte Carlo error propagation.
+"""
+
+import numpy as np
+import pytest
+from astropy import units as u
+from uncertainties import ufloat
+from sedclient import montecarlo
+
+@pytest.fixture
+def unitFactor(monkeypatch):
+    # the Jy to erg/s/cm**2 factor is checked with the unitConversion module
+    monkeypatch.setattr(montecarlo, 'cgsFactor', lambda unit, wave: 1.0)
+
+def test_magnitudes_without_zero_points_raise(unitFactor):
+    samples = np.zeros((2, 3))
+
+    with pytest.raises(ValueError):
+        montecarlo.toFlux(samples, [1.2, 2.2], [u.mag, u.mag])
+
+    with pytest.raises(ValueError):
+        montecarlo.toFlux(samples, [1.2, 2.2], [u.mag, u.mag], zero=[1594.0])
+
+def test_magnitudes_use_their_zero_points(unitFactor):
+    samples = np.array([[0.0, 2.5], [1.0, 1.0]])
+
+    flux = montecarlo.toFlux(samples, [1.2, 2.2], [u.mag, u.Jy], zero=[1594.0, 0.0])
+
+    assert np.allclose(flux, [[1594.0, 159.4], [1.0, 1.0]])
+
+def test_flux_densities_need_no_zero_points(unitFactor):
+    samples = np.ones((2, 3))
+
+    assert np.allclose(montecarlo.toFlux(samples, [1.2, 2.2], [u.Jy, u.Jy]), 1.0)
+
+def test_draw_and_summarise():
+    rng = np.random.default_rng(1)
+    samples = montecarlo.draw([10.0, 5.0], [1.0, 0.5], 200000, rng)
+
+    med, lo, hi = montecarlo.summarise(samples)
+
+    assert np.allclose(med, [10.0, 5.0], atol=0.01)
+    assert np.allclose(lo, [1.0, 0.5], rtol=0.02)
+    assert np.allclose(hi, [1.0, 0.5], rtol=0.02)
+
+def test_dered_shares_ebv_between_points(monkeypatch):
+    monkeypatch.setattr(montecarlo, 'extCurve', lambda wave: np.array([2.5, 0.0]))
+    samples = np.ones((2, 4))
+
+    out = montecarlo.dered(samples, [0.5, 20.0], ufloat(0.4, 0.0), np.random.default_rng(1))
+
+    assert np.allclose(out[0], 10**(0.4 * 2.5 * 0.4))
+    assert np.allclose(out[1], 1.0)
@@ -0,0 +1,85 @@
+"""
+    Tests of the cross-survey outlier check.
+"""
+
+import os
+import numpy as np
+from uncertainties import ufloat
+from sedclient import globs
+from sedclient import load
+from sedclient import outliers
+
+def smooth(wave):
+    """
+        A smooth SED, lambda F_lambda of a 3000 K blackbody.
+    """
+    return 1e-10 * (wave / 1.0)**-4 / np.expm1(4.8 / wave)
+
+def test_clean_sed_has_no_outliers():
+    wave = np.array([0.44, 0.55, 0.65, 0.8, 1.235, 1.662, 2.159, 3.4, 4.6, 12.0, 22.0])
+    flux = smooth(wave)
+
+    flags, z = outliers.detect(wave, flux, 0.05 * flux, np.array([0, len(wave)]))
+
+    assert not flags.any()
+
+def test_bad_point_flagged_not_its_neighbours():
+    wave = np.array([0.44, 0.55, 0.65, 0.8, 1.235, 1.662, 2.159, 3.4, 4.6, 12.0, 22.0])
+    flux = smooth(wave)
+    flux[5] *= 5.0
+
+    flags, z = outliers.detect(wave, flux, 0.05 * flux, np.array([0, len(wave)]))
+
+    assert np.flatnonzero(flags).tolist() == [5]
+    assert z[5] > globs.outlierSigma
+
+def test_objects_checked_independently():
+    wave = np.array([0.44, 0.55, 0.65, 0.8, 1.235, 1.662, 2.159])
+    flux = smooth(wave)
+    bad = flux.copy()
+    bad[3] /= 10.0
+
+    allWave = np.concatenate((wave, wave, wave[:2]))
+    allFlux = np.concatenate((flux, bad, flux[:2] * [1.0, 10.0]))
+    offsets = np.array([0, 7, 14, 16])
+
+    flags, z = outliers.detect(allWave, allFlux, 0.05 * allFlux, offsets)
+
+    assert np.flatnonzero(flags).tolist() == [10]
+    # too few points to judge
+    assert np.isnan(z[14:]).all()
+
+class Point:
+    """
+        class for a flux with the value attribute of an astropy quantity.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+def test_archive_flags_and_exclude():
+    waves = {'twomass': [1.235, 1.662, 2.159], 'iras': [12.0, 25.0, 60.0, 100.0]}
+    flux = dict((source, smooth(np.array(w))) for source, w in waves.items())
+    flux['iras'][1] *= 20.0
+
+    with open(os.path.join(globs.dirPh, 'obj_a'), 'w') as f:
+        f.write("[meta]\nname = obj a\n")
+        for source in waves:
+            f.write("[{}]\nwave = {}\nfluxes = {}\n".format(source, ' '.join(map(str, waves[source])), ' '.join("{} {}".format(v, 0.05 * v) for v in flux[source])))
+
+    table = outliers.archive()
+
+    assert table['name'].tolist() == ['obj a']
+    assert table['source'].tolist() == ['iras']
+    assert table['wave'].tolist() == [25.0]
+
+    globs.name = 'obj a'
+    assert load.loadFlags('iras') == [25.0]
+    assert load.loadFlags('twomass') == []
+
+    photo = dict((source, {'wave': waves[source], 'flux': [Point(ufloat(v, 0.05 * v)) for v in flux[source]]}) for source in waves)
+    kept = outliers.exclude(photo)
+
+    assert kept['iras']['wave'] == [12.0, 60.0, 100.0]
+    assert kept['twomass']['wave'] == waves['twomass']
+    assert len(photo['iras']['wave']) == 4
@@ -0,0 +1,55 @@
+"""
+    Tests of the parsing of the query output.
+"""
+
+import numpy as np
+import pytest
+from sedclient import parse
+
+output = """#
+# VizieR Astronomical Server
+#
+_r;Kmag;e_Kmag;Qflg
+arcmin;mag;mag;
+------;------;------;---
+0.05;8.1;0.02;AAA
+0.01;9.3;0.03;ABA
+
+#
+_r;Kmag;e_Kmag;Qflg
+arcmin;mag;mag;
+------;------;------;---
+0.20;;0.1;UUU
+0.30;7.0;0.02;AAA
+""".split('\n')
+
+types = [float, float, float, str]
+
+def test_parse_blocks_and_types():
+    table = parse.parse(output, types, ['arcmin'])
+
+    assert table.dtype.names == ('block', '_r', 'Kmag', 'e_Kmag', 'Qflg')
+    assert table['block'].tolist() == [0, 0, 1, 1]
+    assert np.isnan(table['Kmag'][2])
+    assert table['Qflg'].tolist() == ['AAA', 'ABA', 'UUU', 'AAA']
+
+def test_select_per_block():
+    table = parse.parse(output, types)
+
+    assert parse.select(table, 'nearest')['_r'].tolist() == [0.01, 0.20]
+    assert parse.select(table, 'brightest', 'Kmag')['Kmag'].tolist() == [8.1, 7.0]
+    assert parse.select(table, 'radius', radius=0.1)['_r'].tolist() == [0.05, 0.01]
+
+def test_select_guards_string_columns():
+    table = parse.parse(output, types)
+
+    with pytest.raises(ValueError):
+        parse.select(table, 'brightest', 'Qflg')
+
+    # without a numeric distance the first row of each block is nearest
+    table = parse.parse(output, [str, float, float, str])
+
+    assert parse.select(table, 'nearest')['_r'].tolist() == ['0.05', '0.20']
+
+    with pytest.raises(ValueError):
+        parse.select(table, 'radius', radius=0.1)
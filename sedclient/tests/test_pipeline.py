@@ -0,0 +1,139 @@
+"""
+    Tests of the streaming pipeline with the catalogue queries replaced, the
+    reduce and render stages are replaced by functions of this module so
+    they can be sent to the worker processes.
+"""
+
+import concurrent.futures as cf
+import os
+import threading
+import pytest
+from uncertainties import ufloat
+from sedclient import dataSave
+from sedclient import download as dw
+from sedclient import globs
+from sedclient import journal
+from sedclient import pipeline
+
+def target(name, ra=10.0, dec=-5.0):
+    return {'name': name, 'ra': ra, 'dec': dec}
+
+def reduceRaw(target, raw):
+    with open("{}.reduced".format(target['name']), 'w') as f:
+        f.write("{} {}".format(os.getpid(), ' '.join(sorted(raw))))
+
+def render(target):
+    if target['name'] == 'unplottable':
+        raise ValueError('no points')
+
+@pytest.fixture
+def queries(monkeypatch):
+    """
+        Replaces the catalogue queries and the ISO download, recording the
+        queried positions.
+    """
+    asked = []
+    release = threading.Event()
+    release.set()
+
+    def query(params, timeout=None):
+        asked.append(params['object'])
+        if params['object'] == '1.0 1.0':
+            release.wait(10)
+        if params['object'] == '2.0 2.0':
+            raise RuntimeError('VizieR is down')
+        return ['raw']
+
+    monkeypatch.setattr(dw, 'query', query)
+    monkeypatch.setattr(dw, 'fetchSp', lambda source, ra, dec: ['spectrum'])
+    monkeypatch.setattr(pipeline, 'reduceRaw', reduceRaw)
+    monkeypatch.setattr(pipeline, 'render', render)
+
+    return asked, release
+
+def test_fetch_skips_uncovered_sources(queries):
+    asked, release = queries
+    covered = dict((source, True) for source in globs.phSources + globs.specSources)
+    covered[globs.phSources[0]] = False
+
+    raw = pipeline.fetch(target('a'), covered)
+
+    assert raw[globs.phSources[0]] == []
+    assert all(raw[source] == ['raw'] for source in globs.phSources[1:])
+    assert raw['iso'] == ['spectrum']
+    assert asked == ['10.0 -5.0'] * (len(globs.phSources) - 1)
+
+def test_run_yields_every_object(queries):
+    names = ['a', 'b', 'c', 'd']
+
+    results = list(pipeline.run([target(name) for name in names], nFetch=2, nReduce=2, nRender=1, depth=2))
+
+    assert sorted(r['name'] for r in results) == names
+    assert all('error' not in r for r in results)
+
+    for name in names:
+        with open("{}.reduced".format(name), 'r') as f:
+            pid, sources = f.read().split(' ', 1)
+        assert int(pid) != os.getpid()
+        assert sources.split() == sorted(globs.phSources + globs.specSources)
+
+def test_run_reports_failed_stage(queries):
+    targets = [target('a'), target('offline', 2.0, 2.0), target('unplottable')]
+
+    results = dict((r['name'], r) for r in pipeline.run(targets, nFetch=2, nReduce=1, nRender=1))
+
+    assert set(results) == {'a', 'offline', 'unplottable'}
+    assert 'error' not in results['a']
+    assert results['offline']['stage'] == 'fetch'
+    assert isinstance(results['offline']['error'], RuntimeError)
+    assert not os.path.exists('offline.reduced')
+    assert results['unplottable']['stage'] == 'render'
+    assert isinstance(results['unplottable']['error'], ValueError)
+
+def test_run_streams_past_slow_object(queries):
+    asked, release = queries
+    release.clear()
+
+    results = pipeline.run([target('slow', 1.0, 1.0), target('fast')], nFetch=2, nReduce=1, nRender=1)
+
+    try:
+        assert next(results)['name'] == 'fast'
+    finally:
+        release.set()
+
+    assert [r['name'] for r in results] == ['slow']
+
+def test_batched_reduce_workers_flush(monkeypatch):
+    monkeypatch.setattr(globs, 'batchSave', True)
+    monkeypatch.setattr(globs, 'flushEvery', 100)
+
+    objs = [dict(target(name), l=120.0, b=-57.0, ebv=ufloat(0.1, 0.01)) for name in ['obj b', 'obj c']]
+    raw = dict((source, []) for source in globs.phSources + globs.specSources)
+
+    with cf.ProcessPoolExecutor(1) as pool:
+        for obj in objs:
+            pool.submit(pipeline.reduceRaw, obj, raw).result()
+
+    assert os.path.exists(os.path.join(globs.dirPh, 'obj_b'))
+    assert os.path.exists(os.path.join(globs.dirPh, 'obj_c'))
+
+def test_render_uses_saved_data_only(monkeypatch):
+    def refuse(source):
+        raise AssertionError("render downloaded {}".format(source))
+
+    monkeypatch.setattr(dw, 'downPh', refuse)
+    monkeypatch.setattr(dw, 'downSp', refuse)
+    monkeypatch.setattr(globs, 'journalPath', 'journal.db')
+
+    obj = dict(target('obj a'), l=120.0, b=-57.0, ebv=ufloat(0.1, 0.01))
+    globs.name = obj['name']
+    dataSave.savePh(None, None, 'twomass')
+
+    try:
+        pipeline.render(obj)
+
+        assert os.path.exists("{}obj_a.eps".format(globs.dirSed))
+        assert journal.isDone('obj a')
+    finally:
+        for key in list(journal.conn):
+            journal.conn.pop(key).close()
@@ -0,0 +1,88 @@
+"""
+    Tests of the population plots.
+"""
+
+import os
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from uncertainties import ufloat
+from sedclient import dataSave
+from sedclient import download
+from sedclient import globs
+from sedclient import makeSED
+from sedclient import population
+
+meta = "[meta]\nname = obj a\nra = 10.0\ndec = 5.0\nl = 120.0\nb = -57.0\nebv = 0.1\nebv_err = 0.01\n"
+
+def refuse(*args, **kwargs):
+    raise AssertionError("nothing should be downloaded")
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(download, 'query', refuse)
+    monkeypatch.setattr(download, 'fetchSp', refuse)
+
+class Point:
+    """
+        class for a flux with the value attribute of an astropy quantity.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+def saveObject(name, ebv, photo):
+    makeSED.setGlobs({'name': name, 'ra': 10.0, 'dec': 5.0, 'l': 120.0, 'b': -57.0, 'ebv': ufloat(ebv, 0.01)})
+
+    for source, (wave, flux) in photo.items():
+        dataSave.savePh([Point(ufloat(f, 0.1 * f)) for f in flux], wave, source)
+
+def binOf(pop, wave, flux):
+    return np.searchsorted(pop.waveEdges, wave, 'right') - 1, np.searchsorted(pop.fluxEdges, flux, 'right') - 1
+
+def test_streams_the_archive_into_histograms():
+    saveObject('obj a', 0.1, {'twomass': ([1.235, 1.662, 2.159], [1e-10, 2e-10, 3e-10])})
+    saveObject('obj b', 0.3, {'twomass': ([1.235, 1.662, 2.159], [1e-10, 5e-10, 5e-10]), 'iras': ([12, 25, 60, 100], [1e-11, 2e-11, 3e-11, 4e-11])})
+
+    pop = population.Population(colourBy='ebv')
+    pop.accumulate(chunkSize=1)
+
+    assert pop.objects == 2
+    assert (pop.counts['twomass'].sum(), pop.counts['iras'].sum()) == (6, 4)
+    assert pop.counts['twomass'][binOf(pop, 1.235, 1e-10)] == 2
+    assert pop.counts['twomass'][binOf(pop, 1.662, 2e-10)] == 1
+    assert pop.counts['iras'][binOf(pop, 12, 1e-11)] == 1
+
+    mean = pop.colourSum['twomass'] / np.maximum(pop.counts['twomass'], 1)
+
+    assert mean[binOf(pop, 1.235, 1e-10)] == pytest.approx(0.2)
+    assert mean[binOf(pop, 1.662, 5e-10)] == pytest.approx(0.3)
+    assert pop.colourSum['iras'].sum() == pytest.approx(4 * 0.3)
+
+    pop.plot()
+
+    drawn = pop.ax.collections[0].get_array().reshape(len(pop.fluxEdges) - 1, len(pop.waveEdges) - 1).T
+
+    assert drawn[binOf(pop, 12, 1e-11)] == pytest.approx(0.3)
+    assert drawn[binOf(pop, 1.235, 1e-10)] == pytest.approx(0.2)
+    assert drawn.count() == 9
+
+    plt.close(pop.fig)
+
+def test_overplot_uses_the_saved_object(offline):
+    with open(os.path.join(globs.dirPh, 'obj_a'), 'w') as f:
+        f.write(meta)
+
+    SED = population.Population().overplot('obj a')
+
+    assert SED.name == 'obj a'
+    assert (globs.ra, globs.dec, globs.l, globs.b) == (10.0, 5.0, 120.0, -57.0)
+    assert (globs.ebv.n, globs.ebv.s) == (0.1, 0.01)
+    assert all(SED.photo[source]['flux'] is None for source in globs.phSources)
+    assert SED.spec['iso']['flux'] is None
+
+def test_overplot_of_an_unknown_object_raises(offline):
+    with pytest.raises(ValueError):
+        population.Population().overplot('obj b')
@@ -0,0 +1,95 @@
+"""
+    Tests of the profiling of SED builds.
+"""
+
+import importlib.util
+import os
+import pstats
+import tracemalloc
+import numpy as np
+import pytest
+from sedclient import globs
+from sedclient import profiling
+from sedclient import stages
+from sedclient import targets
+
+def work(n):
+    return sum([list(range(100)) for i in range(n)], [])
+
+def test_run_returns_result_and_writes_dumps():
+    result = profiling.run(lambda: len(work(200)), 'IRAS 1')
+
+    base = "{}IRAS_1".format(globs.dirLog)
+
+    assert result == 20000
+    assert profiling.peakMemory("{}.mem".format(base)) > 0
+    assert 'work' in [func for (_, _, func) in pstats.Stats("{}.prof".format(base)).stats]
+
+def test_run_writes_dumps_when_build_fails():
+    def fail():
+        raise RuntimeError('no data')
+
+    with pytest.raises(RuntimeError):
+        profiling.run(fail, 'broken')
+
+    assert os.path.exists("{}broken.prof".format(globs.dirLog))
+    assert os.path.exists("{}broken.mem".format(globs.dirLog))
+
+def test_report_aggregates_objects():
+    profiling.run(lambda: work(50), 'small')
+    profiling.run(lambda: work(500), 'large')
+
+    profiling.report()
+
+    with open("{}profile_report.txt".format(globs.dirLog), 'r') as f:
+        text = f.read()
+
+    assert 'Aggregated profile of 2 objects' in text
+    peaks = text.split('Largest peak memory')[1]
+    assert peaks.index('large') < peaks.index('small')
+
+def test_report_without_profiles_writes_nothing():
+    profiling.report(['missing'])
+
+    assert not os.path.exists("{}profile_report.txt".format(globs.dirLog))
+
+def test_run_keeps_callers_tracing():
+    tracemalloc.start()
+    try:
+        profiling.run(lambda: work(10), 'traced')
+
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+def test_profiled_only_when_asked(monkeypatch):
+    assert profiling.profiled(lambda: 1, 'off') == 1
+    assert not os.path.exists("{}off.prof".format(globs.dirLog))
+
+    monkeypatch.setattr(globs, 'profile', True)
+
+    assert profiling.profiled(lambda: 2, 'on') == 2
+    assert os.path.exists("{}on.prof".format(globs.dirLog))
+
+def test_cli_profiles_the_batch(monkeypatch):
+    monkeypatch.setattr(globs, 'profile', False)
+    targets.saveDustMap(np.full((19, 36), 0.1), np.full((19, 36), 0.01))
+
+    with open('targets.csv', 'w') as f:
+        f.write("name,ra,dec\nobj a,10.0,5.0\nobj b,20.0,-5.0\n")
+
+    for name in ['obj a', 'obj b']:
+        stages.saveRaw(name, dict((source, []) for source in globs.phSources + globs.specSources))
+
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'sedclient.py')
+    spec = importlib.util.spec_from_file_location('sedclientCli', script)
+    cli = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cli)
+
+    assert cli.main(['reduce', 'targets.csv', '--jobs', '1', '--profile']) == 0
+
+    assert os.path.exists("{}obj_a_reduce.prof".format(globs.dirLog))
+    assert os.path.exists("{}obj_b_reduce.mem".format(globs.dirLog))
+
+    with open("{}profile_report.txt".format(globs.dirLog), 'r') as f:
+        assert 'Aggregated profile of 2 objects' in f.read()
@@ -0,0 +1,75 @@
+"""
+    Tests of the rebinning and stacking of spectra.
+"""
+
+import os
+import numpy as np
+from sedclient import globs
+from sedclient import resample
+
+def writeSpectrum(name, wave, flux, err):
+    np.savetxt(os.path.join(globs.dirSp, '{}_iso'.format(name)), np.column_stack((wave, flux, err)), delimiter=',')
+
+def test_log_grid():
+    edges, centres = resample.logGrid(1.0, 100.0, 2)
+
+    assert np.allclose(edges, [1.0, 10.0, 100.0])
+    assert np.allclose(centres, [np.sqrt(10.0), np.sqrt(1000.0)])
+
+def test_rebin_conserves_the_flux():
+    wave = np.logspace(0, 2, 2001)
+    flux = np.log(wave)
+    edges, centres = resample.logGrid(2.0, 50.0, 10)
+
+    binFlux, binErr, mask = resample.rebin(wave, flux, np.zeros_like(wave), edges)
+
+    # the mean of ln(lambda) over each bin in ln(lambda) is its centre
+    assert not mask.any()
+    assert np.allclose(binFlux, np.log(centres), rtol=1e-4)
+    assert np.allclose(binErr, 0.0)
+
+def test_rebin_errors_fall_with_more_points():
+    wave = np.logspace(0, 1, 101)
+    edges, centres = resample.logGrid(1.0, 10.0, 10)
+
+    binFlux, binErr, mask = resample.rebin(wave, np.ones_like(wave), np.ones_like(wave), edges)
+
+    # about ten independent points in each bin
+    assert np.allclose(binFlux, 1.0)
+    assert np.all((binErr > 0.25) & (binErr < 0.4))
+
+def test_rebin_masks_uncovered_bins():
+    edges, centres = resample.logGrid(1.0, 100.0, 4)
+
+    binFlux, binErr, mask = resample.rebin(np.array([2.0, 8.0]), np.ones(2), np.ones(2), edges)
+
+    assert mask.tolist() == [True, True, True, True]
+
+    binFlux, binErr, mask = resample.rebin(np.array([1.0, 30.0]), np.ones(2), np.ones(2), edges)
+
+    assert mask.tolist() == [False, False, True, True]
+    assert binFlux[2:].tolist() == [0.0, 0.0]
+
+def test_stack_normalise_and_composite():
+    wave = np.logspace(0, 1, 50)
+    writeSpectrum('obj_a', wave, np.ones(50), np.full(50, 0.1))
+    writeSpectrum('obj_b', wave, np.full(50, 3.0), np.full(50, 0.1))
+    writeSpectrum('obj_c', wave[:30], np.full(30, 2.0), np.full(30, 0.1))
+
+    names = resample.spectrumFiles()
+    edges, centres = resample.logGrid(1.0, 10.0, 4)
+
+    flux, err = resample.stack(names, edges, filename='stack')
+    assert names == ['obj_a', 'obj_b', 'obj_c']
+    assert flux.mask[2].tolist() == [False, False, True, True]
+
+    flux, err = resample.loadStack('stack')
+    comp = resample.composite(flux, err)
+
+    assert comp['count'].tolist() == [3, 3, 2, 2]
+    assert np.allclose(comp['median'], [2.0, 2.0, 2.0, 2.0])
+    assert np.allclose(comp['mean'][2:], 2.0)
+
+    scale = resample.normalise(flux, centres, 1.0, 3.0)
+    assert np.allclose(scale, [1.0, 3.0, 2.0])
+    assert np.allclose(resample.composite(flux, scale=scale)['median'], 1.0)
@@ -0,0 +1,139 @@
+"""
+    Tests of the scheduling of the queries of an object against a time
+    budget.
+"""
+
+import json
+import subprocess
+import threading
+import time
+import pytest
+from uncertainties import ufloat
+from sedclient import dataStruct
+from sedclient import download
+from sedclient import globs
+from sedclient import load
+from sedclient import makeSED
+from sedclient import scheduler
+
+@pytest.fixture(autouse=True)
+def freshHistory(monkeypatch):
+    scheduler.history.clear()
+    del scheduler.recorded[:]
+    monkeypatch.setattr(globs, 'queryTimeout', None)
+    monkeypatch.setattr(globs, 'objectBudget', None)
+    yield
+    scheduler.history.clear()
+    del scheduler.recorded[:]
+
+def reduce(source, raw):
+    return [1.0], [raw]
+
+def test_order_slowest_first_unknown_before_known():
+    scheduler.record('fast', 1.0, 'done')
+    scheduler.record('slow', 5.0, 'done')
+
+    assert scheduler.order(['fast', 'slow', 'new']) == ['new', 'slow', 'fast']
+
+def test_record_weights_timeouts_and_failures():
+    scheduler.record('twomass', 10.0, 'done')
+    scheduler.record('twomass', 20.0, 'timeout')
+    scheduler.record('twomass', None, 'failed')
+
+    entry = scheduler.history['twomass']
+
+    assert entry['mean'] == pytest.approx(10.0 + globs.latencyWeight * 10.0)
+    assert (entry['queries'], entry['timeouts'], entry['failures']) == (3, 1, 1)
+
+def test_run_collects_done_and_failed():
+    def fetch(source, timeout):
+        if source == 'bad':
+            raise RuntimeError('down')
+        return source
+
+    data, status = scheduler.run(['good', 'bad'], fetch, reduce)
+
+    assert status == {'good': 'done', 'bad': 'failed'}
+    assert data['good'] == {'wave': [1.0], 'flux': ['good']}
+    assert data['bad'] == {'wave': None, 'flux': None}
+
+    with open(globs.latencyPath, 'r') as f:
+        saved = json.load(f)
+    assert saved['good']['queries'] == 1 and saved['bad']['failures'] == 1
+
+def test_run_deadline_leaves_slow_sources_out():
+    release = threading.Event()
+
+    def fetch(source, timeout):
+        if source == 'slow':
+            release.wait(5)
+        return source
+
+    start = time.time()
+    data, status = scheduler.run(['slow', 'fast'], fetch, reduce, budget=0.3)
+    release.set()
+
+    assert time.time() - start < 2
+    assert status == {'slow': 'timeout', 'fast': 'done'}
+    assert data['slow'] == {'wave': None, 'flux': None}
+    assert scheduler.history['slow']['timeouts'] == 1
+
+def test_run_passes_query_timeout(monkeypatch):
+    monkeypatch.setattr(globs, 'queryTimeout', 2.0)
+    given = {}
+
+    def fetch(source, timeout):
+        given[source] = timeout
+        if source == 'slow':
+            raise subprocess.TimeoutExpired('vizquery', timeout)
+        return source
+
+    data, status = scheduler.run(['slow', 'fast'], fetch, reduce, budget=60)
+
+    assert given == {'slow': 2.0, 'fast': 2.0}
+    assert status == {'slow': 'timeout', 'fast': 'done'}
+    assert scheduler.history['slow']['timeouts'] == 1
+
+def test_save_merges_other_writers():
+    scheduler.record('twomass', 2.0, 'done')
+
+    # another process saved its queries meanwhile
+    with open(globs.latencyPath, 'w') as f:
+        json.dump({'twomass': {'mean': 4.0, 'queries': 5, 'failures': 1, 'timeouts': 0}, 'iras': {'mean': 1.0, 'queries': 1, 'failures': 0, 'timeouts': 0}}, f)
+
+    scheduler.saveHistory()
+    scheduler.saveHistory()
+
+    with open(globs.latencyPath, 'r') as f:
+        saved = json.load(f)
+
+    assert saved['twomass']['queries'] == 6 and saved['twomass']['failures'] == 1
+    assert saved['twomass']['mean'] == pytest.approx(4.0 + globs.latencyWeight * (2.0 - 4.0))
+    assert saved['iras']['queries'] == 1
+    assert scheduler.history == saved
+
+def test_timed_out_sources_are_queried_again(monkeypatch):
+    makeSED.setGlobs({'name': 'obj a', 'ra': 10.0, 'dec': 5.0, 'l': 120.0, 'b': -57.0, 'ebv': ufloat(0.1, 0.01)})
+    monkeypatch.setattr(globs, 'objectBudget', 60)
+
+    late = 'iras'
+    queried = []
+
+    def query(params, timeout=None):
+        queried.append(params['source'])
+        if params['source'] == 'II/125' and late:
+            raise subprocess.TimeoutExpired('vizquery', timeout)
+        return []
+
+    monkeypatch.setattr(download, 'query', query)
+
+    data = dataStruct.buildPhStruct()
+
+    assert data['iras'] == {'wave': None, 'flux': None}
+    assert load.timedOut() == ['iras']
+
+    late, queried[:] = None, []
+    dataStruct.buildPhStruct()
+
+    assert queried == ['II/125']
+    assert load.timedOut() == []
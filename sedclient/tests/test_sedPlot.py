@@ -0,0 +1,97 @@
+"""
+    Tests of the plotting of SEDs.
+"""
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from uncertainties import ufloat
+from sedclient import dataSave
+from sedclient import globs
+from sedclient import makeSED
+from sedclient import sedPlot
+
+@pytest.fixture
+def target():
+    makeSED.setGlobs({'name': 'obj a', 'ra': 10.0, 'dec': 5.0, 'l': 120.0, 'b': -57.0, 'ebv': ufloat(0.1, 0.01)})
+
+def test_cached_axes_are_cleared():
+    sedPlot.template.clear()
+
+    fig, ax = sedPlot.cachedAxes()
+    ax.plot([1, 10], [1, 10], label='data')
+    ax.text(0.5, 0.5, 'obj a')
+    ax.legend()
+
+    again, ax2 = sedPlot.cachedAxes()
+
+    assert again is fig and ax2 is ax
+    assert not ax.lines and not ax.texts and ax.get_legend() is None
+    assert ax.get_xlabel() and ax.get_xscale() == 'log'
+
+    plt.close(fig)
+    sedPlot.template.clear()
+
+def test_plain_annotations(target, monkeypatch):
+    monkeypatch.setattr(globs, 'plainAnns', True)
+
+    anns = makeSED.makeAnns()
+
+    assert anns == ['obj a', 'l=120.000°, b=-57.000°', 'E(B-V)=0.1±0.01 mag']
+    assert not any('$' in ann for ann in anns)
+
+def test_mathtext_annotations(target):
+    anns = makeSED.makeAnns()
+
+    assert all(ann.startswith('$') and ann.endswith('$') for ann in anns)
+
+def test_decimate_keeps_the_extremes_of_each_column():
+    wave = np.logspace(0, 2, 10000)
+    flux = np.ones(10000)
+    flux[5000] = 50.0
+    flux[7000] = -3.0
+
+    keep = sedPlot.decimate(wave, flux, 100)
+
+    assert len(keep) <= 200
+    assert np.all(np.diff(keep) > 0)
+    assert 5000 in keep and 7000 in keep
+    assert keep[0] == 0 and keep[-1] == 9999
+
+def test_decimate_short_or_disabled():
+    wave = np.array([1.0, 2.0, -1.0, 4.0])
+    flux = np.array([1.0, np.nan, 1.0, 2.0])
+
+    assert sedPlot.decimate(wave, flux, 10).tolist() == [0, 3]
+    assert sedPlot.decimate(np.logspace(0, 1, 50), np.ones(50), 0).tolist() == list(range(50))
+
+class Point:
+    """
+        class for a flux with the value attribute of an astropy quantity.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+def test_asymmetric_error_bars(target):
+    photo = [Point(ufloat(1e-10, 2e-11)), Point(ufloat(2e-10, 3e-11))]
+    dataSave.savePh(photo, [1.25, 2.2], 'twomass', [1e-11, 2e-11], [3e-11, 4e-11])
+    dataSave.savePh(photo, [12.0, 25.0], 'iras')
+
+    assert sedPlot.errorBars('twomass', [2.2], [0.5]) == [[2e-11], [4e-11]]
+    assert sedPlot.errorBars('twomass', [3.5], [0.5]) == [0.5]
+    assert sedPlot.errorBars('iras', [12.0], [0.5]) == [0.5]
+
+    SED = object.__new__(sedPlot.Plot)
+    SED.fig, SED.ax = sedPlot.newAxes()
+    SED.photo = {'twomass': {'wave': [1.25, 2.2], 'flux': photo}}
+
+    SED.plotPh()
+
+    bars = SED.ax.containers[0].lines[2][0].get_segments()
+    assert [y for bar in bars for y in (bar[0][1], bar[1][1])] == pytest.approx([0.9e-10, 1.3e-10, 1.8e-10, 2.4e-10])
+
+    plt.close(SED.fig)
@@ -0,0 +1,94 @@
+"""
+    Tests of the SED server without binding the worker pool to real builds.
+"""
+
+import concurrent.futures as cf
+import os
+import threading
+import pytest
+from uncertainties import ufloat
+from sedclient import download
+from sedclient import globs
+from sedclient import server
+
+target = {'name': 'obj a', 'ra': 10.0, 'dec': 5.0, 'l': 120.0, 'b': -57.0, 'ebv': ufloat(0.1, 0.01)}
+
+class DonePool:
+    """
+        class for a pool whose builds have finished by the time they are
+        returned.
+    """
+
+    def submit(self, fn, *args):
+        future = cf.Future()
+        future.set_result({'name': args[0]['name'], 'time': 0.0})
+        return future
+
+    def shutdown(self):
+        pass
+
+class PendingPool:
+    """
+        class for a pool whose builds are still running.
+    """
+
+    def __init__(self):
+        self.targets = []
+
+    def submit(self, fn, *args):
+        self.targets.append(args[0])
+        return cf.Future()
+
+    def shutdown(self):
+        pass
+
+@pytest.fixture
+def sedServer():
+    sedServer = server.Server('127.0.0.1', 0, 1)
+    sedServer.pool.shutdown()
+    sedServer.pool = DonePool()
+
+    yield sedServer
+
+    sedServer.server_close()
+
+def test_submit_of_a_finished_build_returns(sedServer):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(sedServer.submit(target, False).result()), daemon=True)
+    thread.start()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert results[0]['name'] == 'obj a'
+    assert sedServer.building == {}
+    assert sedServer.pending == 1
+
+def test_finished_keeps_a_newer_build(sedServer):
+    key = ('obj a', 10.0, 5.0, False)
+    old, new = cf.Future(), cf.Future()
+    sedServer.building[key] = new
+
+    sedServer.finished(key, old)
+
+    assert sedServer.building[key] is new
+
+def test_builds_are_shared_per_position(sedServer):
+    sedServer.pool = PendingPool()
+    moved = dict(target, ra=200.0, dec=-30.0)
+
+    first = sedServer.submit(target, False)
+
+    assert sedServer.submit(dict(target), False) is first
+    assert sedServer.submit(moved, False) is not first
+    assert sedServer.submit(target, True) is not first
+    assert [t['ra'] for t in sedServer.pool.targets] == [10.0, 200.0, 10.0]
+
+def test_build_writes_no_plot(monkeypatch):
+    monkeypatch.setattr(download, 'query', lambda params, timeout=None: [])
+    monkeypatch.setattr(download, 'fetchSp', lambda source, ra=None, dec=None: None)
+
+    result = server.buildOne(target, image=True)
+
+    assert result['name'] == 'obj a'
+    assert result['png'].startswith(b'\x89PNG')
+    assert os.listdir(globs.dirSed) == []
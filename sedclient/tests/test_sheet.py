@@ -0,0 +1,91 @@
+"""
+    Tests of the contact sheets of many SEDs.
+"""
+
+import csv
+import os
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pytest
+from uncertainties import ufloat
+from sedclient import globs
+from sedclient import makeSED
+from sedclient import sheet
+
+def readIndex(filename):
+    with open("{}.index".format(filename), 'r') as f:
+        return list(csv.reader(f))
+
+def test_tiles_fill_pages_in_order():
+    contact = sheet.Sheet('sheet', rows=2, cols=2, fmt='png')
+
+    axes = [contact.nextTile("obj {}".format(i)) for i in range(5)]
+    contact.close()
+
+    assert axes[4] is axes[0]
+    assert os.path.exists('sheet_0000.png') and os.path.exists('sheet_0001.png')
+    assert not os.path.exists('sheet_0002.png')
+    assert readIndex('sheet') == [['name', 'page', 'tile']] + [["obj {}".format(i), str(i // 4), str(i % 4)] for i in range(5)]
+
+def test_empty_tiles_of_last_page_hidden():
+    contact = sheet.Sheet('sheet', rows=1, cols=3, fmt='png')
+
+    contact.nextTile('a')
+    contact.writePage()
+    contact.nextTile('b')
+
+    assert contact.page == 1
+    assert [ax.get_visible() for ax in contact.axes] == [True, False, False]
+
+    contact.close()
+
+def test_pdf_pages():
+    contact = sheet.Sheet('sheet.pdf', rows=1, cols=2)
+
+    for name in 'abc':
+        contact.nextTile(name)
+
+    assert contact.pdf.get_pagecount() == 1
+
+    contact.close()
+
+    assert contact.page == 2
+    assert os.path.getsize('sheet.pdf') > 0
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        sheet.Sheet('sheet', fmt='svg')
+
+    assert not os.path.exists('sheet.index')
+
+class FailingPlot:
+    """
+        class for a plot of an object whose photometry cannot be plotted.
+    """
+
+    def __init__(self, ax):
+        self.ax = ax
+
+    def plotPh(self):
+        if globs.name == 'bad':
+            raise ValueError('no points')
+
+    def plotSp(self):
+        pass
+
+    def annotate(self, annotation):
+        pass
+
+def test_sheet_closed_when_an_object_fails(monkeypatch):
+    monkeypatch.setattr(makeSED.sedPlot, 'Plot', FailingPlot)
+
+    obj = {'ra': 10.0, 'dec': 5.0, 'l': 120.0, 'b': -57.0, 'ebv': ufloat(0.1, 0.01)}
+    plt.close('all')
+
+    with pytest.raises(ValueError):
+        makeSED.makeSheet([dict(obj, name='good'), dict(obj, name='bad')], 'sheet', rows=1, cols=2, fmt='png')
+
+    assert readIndex('sheet') == [['name', 'page', 'tile'], ['good', '0', '0'], ['bad', '0', '1']]
+    assert os.path.exists('sheet_0000.png')
+    assert plt.get_fignums() == []
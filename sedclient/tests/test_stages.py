@@ -0,0 +1,107 @@
+"""
+    Smoke tests of the command line interface, every stage run over a small
+    target file without the network.
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from uncertainties import ufloat
+from astropy import units as u
+from sedclient import download
+from sedclient import globs
+from sedclient import load
+from sedclient import makeSED
+from sedclient import stages
+from sedclient import targets
+
+try:
+    ufloat(1.0, 0.1) * u.Jy
+    ufloatQuantities = True
+except TypeError:
+    ufloatQuantities = False
+
+root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+script = os.path.join(root, 'sedclient.py')
+
+def loadCli():
+    """
+        Loads the command line script, whose name clashes with the package.
+    """
+    spec = importlib.util.spec_from_file_location('sedclientCli', script)
+    cli = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cli)
+    return cli
+
+@pytest.fixture
+def targetFile(workspace):
+    targets.saveDustMap(np.full((19, 36), 0.1), np.full((19, 36), 0.01))
+
+    with open('targets.csv', 'w') as f:
+        f.write("name,ra,dec\nobj a,10.0,5.0\nobj b,20.0,-5.0\n")
+
+    return 'targets.csv'
+
+def test_stages_run_in_order(targetFile, monkeypatch, capsys):
+    queries = []
+    monkeypatch.setattr(download, 'query', lambda params, timeout=None: queries.append(params) or [])
+    monkeypatch.setattr(download, 'fetchSp', lambda source, ra=None, dec=None: None)
+
+    cli = loadCli()
+
+    assert cli.main(['fetch', targetFile, '--jobs', '2']) == 0
+    assert len(queries) == 2 * len(globs.phSources)
+    assert sorted(os.listdir(globs.dirRaw)) == ['obj_a.json', 'obj_b.json']
+
+    # unchanged inputs are skipped
+    assert cli.main(['fetch', targetFile]) == 0
+    assert len(queries) == 2 * len(globs.phSources)
+
+    assert cli.main(['reduce', targetFile, '--jobs', '1']) == 0
+    assert cli.main(['render', targetFile, '--jobs', '1']) == 0
+    assert cli.main(['export', 'archive.csv']) == 0
+
+    out = capsys.readouterr().out
+    assert out.count('fetch: obj a done') == 1
+    assert 'fetch: obj a skipped' in out
+    assert 'reduce: obj a done' in out
+    assert 'render: obj a done' in out
+    assert 'export: done' in out
+    assert os.path.exists(os.path.join(globs.dirSed, 'obj_a.eps'))
+    assert os.path.exists('archive.csv')
+
+@pytest.mark.skipif(not ufloatQuantities, reason="this astropy does not hold ufloats in quantities")
+def test_reduce_stage_on_canned_response(targetFile, vizquery):
+    cli = loadCli()
+
+    assert cli.main(['fetch', targetFile]) == 0
+    assert cli.main(['reduce', targetFile, '--jobs', '1']) == 0
+
+    makeSED.setGlobs(next(targets.iterTargets(targets.readTargets(targetFile))))
+    wave, flux = load.loadPh('twomass')
+
+    assert wave == [1.235, 1.662, 2.159]
+    assert all(f.value.n > 0 for f in flux)
+    assert load.loadPh('iras') == (None, None)
+
+def test_script_runs_under_python3(targetFile):
+    for args in [['export', 'archive.csv'], ['reduce', targetFile], ['render', targetFile]]:
+        result = subprocess.run([sys.executable, script] + args, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert args[0] in result.stdout
+
+def test_offline_refuses_queries(monkeypatch):
+    monkeypatch.setattr(globs, 'offline', True)
+
+    with pytest.raises(RuntimeError):
+        download.query({'source': 'II/246', 'object': '10 5', 'radius': 5, 'max': 1, 'output': '_r'})
+
+def test_fetch_stamp_follows_position():
+    target = {'name': 'obj a', 'ra': 10.0, 'dec': 5.0}
+    moved = dict(target, ra=10.1)
+
+    assert stages.fetchStamp(target) == stages.fetchStamp(dict(target))
+    assert stages.fetchStamp(target) != stages.fetchStamp(moved)
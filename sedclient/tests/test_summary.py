@@ -0,0 +1,49 @@
+"""
+    Tests of the summary index of the saved data.
+"""
+
+import pytest
+from sedclient import globs
+from sedclient import summary
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(globs, 'summaryPath', 'summary.db')
+
+    summary.update('obj a', 'twomass', [1.2, 1.6, 2.2], [1e-12, 2e-12, 1.5e-12])
+    summary.update('obj a', 'iras', [12.0, 25.0], [1e-13, 5e-14])
+    summary.update('obj b', 'twomass', [1.2, 1.6, 2.2], [1e-10, 2e-10, 1e-10])
+    summary.update('obj b', 'iras', None, None)
+    summary.update('obj c', 'iso', [2.4, 45.0], [1e-12, 1e-12], 'sp')
+
+    yield summary.connect()
+
+    for key in list(summary.conn):
+        summary.conn.pop(key).close()
+
+def test_disabled_by_default():
+    assert globs.summaryPath is None
+    assert not summary.enabled()
+
+def test_query_by_sources(index):
+    assert sorted(summary.query(['twomass'])) == ['obj a', 'obj b']
+    assert summary.query(['twomass', 'iras']) == ['obj a']
+    assert summary.query(['wise']) == []
+
+def test_query_by_range_and_spectrum(index):
+    assert sorted(summary.query(minWave=20.0)) == ['obj a', 'obj c']
+    assert summary.query(spectrum=True) == ['obj c']
+    assert summary.query(['twomass'], minFlux=1e-11) == ['obj b']
+
+def test_source_query_uses_the_index(index):
+    plan = index.execute("EXPLAIN QUERY PLAN SELECT name FROM objects WHERE name IN (SELECT name FROM sources WHERE source = ? AND npts > 0)", ('twomass',)).fetchall()
+
+    assert any('sources_source' in row[-1] for row in plan)
+
+def test_object_rows(index):
+    tables = [row[0] for row in index.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+    row = index.execute("SELECT * FROM objects WHERE name = 'obj a'").fetchone()
+
+    assert tables == ['objects', 'sources']
+    assert row[:5] == ('obj a', 5, 1.2, 25.0, 2e-12)
+    assert row[5] == 0
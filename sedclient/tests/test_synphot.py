@@ -0,0 +1,79 @@
+"""
+    Tests of the synthetic photometry through transmission curves.
+"""
+
+import numpy as np
+import pytest
+from sedclient import globs
+from sedclient import synphot
+
+bands = [('twomass', 1.235), ('twomass', 1.662), ('twomass', 2.159)]
+
+@pytest.fixture(autouse=True)
+def curves():
+    synphot.curveCache.clear()
+    synphot.matrixCache.clear()
+
+    names = []
+    for k, (source, wave) in enumerate(bands):
+        names.append('band{}.dat'.format(k))
+        np.savetxt(names[-1], np.column_stack(([wave - 0.12, wave - 0.1, wave + 0.1, wave + 0.12], [0, 1, 1, 0])))
+
+    with open('{}twomass.ini'.format(globs.confPath), 'a') as f:
+        f.write("\n[synphot]\ncurves={}\n".format(' '.join(names)))
+
+    yield
+
+    synphot.curveCache.clear()
+    synphot.matrixCache.clear()
+
+def test_filters_from_the_configs():
+    assert sorted(synphot.filters()) == sorted(bands)
+    assert synphot.filters()[bands[0]] == ('band0.dat', 'photon')
+
+def test_flat_spectrum():
+    # a flat F_lambda gives lambda F_lambda = c * lambda in every band
+    wave = np.linspace(1.0, 2.5, 3001)
+
+    fluxes, errs, bandList = synphot.synthesise(wave, 2.0 * wave, 0.01 * wave)
+
+    assert bandList == bands
+    assert np.allclose(fluxes, [2.0 * w for s, w in bands], rtol=1e-3)
+    assert np.all(errs > 0)
+
+def test_photon_and_energy_weighting():
+    wave = np.linspace(1.0, 2.5, 3001)
+    # F_lambda = lambda
+    flux = wave**2
+
+    photon = synphot.synthesiseMany(flux[None, :], wave=wave)[0][0]
+
+    cWave, trans = synphot.loadCurve('band0.dat')
+    expected = 1.235 * np.trapezoid(trans * cWave**2, cWave) / np.trapezoid(trans * cWave, cWave)
+
+    assert np.isclose(photon[0], expected, rtol=1e-4)
+
+    weights = synphot.bandWeights(wave, (cWave, trans), 'energy', 1.235)
+    expected = 1.235 * np.trapezoid(trans * cWave, cWave) / np.trapezoid(trans, cWave)
+
+    assert np.isclose(weights.dot(flux), expected, rtol=1e-4)
+
+def test_partial_coverage_is_nan():
+    wave = np.linspace(1.0, 2.5, 3001)
+    flux = np.ma.array(np.tile(wave, (2, 1)), mask=np.zeros((2, 3001), dtype=bool))
+    flux.mask[1, wave > 1.6] = True
+
+    fluxes = synphot.synthesiseMany(flux, wave=wave)[0]
+
+    assert np.all(np.isfinite(fluxes[0]))
+    assert np.isfinite(fluxes[1][0])
+    assert np.isnan(fluxes[1][1:]).all()
+
+def test_bands_outside_the_grid():
+    wave = np.linspace(1.0, 2.0, 101)
+
+    weights, valid, bandList = synphot.matrix(wave)
+
+    assert valid.tolist() == [True, True, False]
+    assert not weights[2].any()
+    assert synphot.matrix(wave)[0] is weights
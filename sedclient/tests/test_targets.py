@@ -0,0 +1,51 @@
+"""
+    Tests of the preparation of target lists.
+"""
+
+import numpy as np
+import pytest
+from sedclient import targets
+
+def test_sexagesimal():
+    ra, dec = targets.toDegrees(['06 19 58.2', '00:00:00'], ['-10:38:14.69', '-00 30 00'])
+
+    assert np.allclose(ra, [94.9925, 0.0])
+    assert np.allclose(dec, [-(10 + 38 / 60.0 + 14.69 / 3600.0), -0.5])
+
+def test_numbers_are_degrees():
+    ra, dec = targets.toDegrees(['10.5', '20'], ['-5', '5.25'])
+
+    assert ra.tolist() == [10.5, 20.0]
+    assert dec.tolist() == [-5.0, 5.25]
+
+def test_bad_sexagesimal_raises():
+    with pytest.raises(ValueError):
+        targets.parseSexagesimal(['10 20'], True)
+
+def test_galactic_centre():
+    l, b = targets.toGalactic(np.array([266.40499]), np.array([-28.93617]))
+
+    assert np.allclose((l + 180.0) % 360.0 - 180.0, 0.0, atol=1e-3)
+    assert np.allclose(b, 0.0, atol=1e-3)
+
+def test_dust_map_interpolation():
+    # E(B-V) rises with longitude and wraps at 360 degrees
+    nb, nl = 19, 36
+    ebv = np.tile(np.arange(nl, dtype=float), (nb, 1))
+    targets.saveDustMap(ebv, np.full((nb, nl), 0.5))
+
+    value, err = targets.lookupEbv(np.array([0.0, 15.0, 355.0, 720.0]), np.array([0.0, 10.0, 90.0, -90.0]))
+
+    assert np.allclose(value, [0.0, 1.5, 17.5, 0.0])
+    assert np.allclose(err, 0.5)
+
+def test_prepare_and_iterate():
+    targets.saveDustMap(np.full((19, 36), 0.1), np.full((19, 36), 0.01))
+
+    table = targets.prepare([10.0, 20.0], [5.0, -5.0])
+    assert table['name'].tolist() == ['J10.00000+5.00000', 'J20.00000-5.00000']
+
+    target = next(targets.iterTargets(targets.prepare([10.0], [5.0], ['obj a'])))
+
+    assert target['name'] == 'obj a'
+    assert np.isclose(target['ebv'].n, 0.1) and np.isclose(target['ebv'].s, 0.01)
@@ -4,7 +4,7 @@
 """
 
 from astropy import units as u
-import globs
+from . import globs
 
 c = 2.9979246e10 * u.cm / u.s
 cgsBase = [u.g,u.cm,u.s]